@@ -1,6 +1,41 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException
+from llm.cache import embedding_cache
+from llm.embeddings import query_batcher
+from llm.answer_cache import answer_cache
+from vector.factory import move_tenant, rebuild_lexical, tenant_partition
+from core.config import settings
+from core.admission import llm_admission
+from core.metrics import counters, latency, stages
+from core.usage import tenant_usage
 router = APIRouter()
 
 @router.get("/stats")
-def stats():
-    return {"ok": True}
+async def stats():
+    return {
+        "ok": True,
+        "embedding_cache": embedding_cache().stats(),
+        "query_batcher": query_batcher().stats(),
+        "answer_cache": answer_cache().stats(),
+        "latency": latency.summary(),
+        "stages": stages.summary(),
+        "admission": llm_admission.stats(),
+        "counters": counters.summary(),
+        "usage": await tenant_usage(),
+    }
+
+@router.post("/lexical/rebuild")
+async def lexical_rebuild(tenant_id: str | None = None):
+    tenant = tenant_id or settings.DEFAULT_TENANT
+    return {"tenant": tenant, "indexed": await rebuild_lexical(tenant)}
+
+@router.get("/tenants/{tenant_id}/partition")
+async def get_partition(tenant_id: str):
+    return {"tenant": tenant_id, "partition": await tenant_partition(tenant_id)}
+
+@router.post("/tenants/{tenant_id}/partition")
+async def set_partition(tenant_id: str, mode: str):
+    try:
+        moved = await move_tenant(tenant_id, mode)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"tenant": tenant_id, "partition": mode, "moved": moved}
@@ -1,9 +1,21 @@
+import asyncio, json, logging, time
 from fastapi import APIRouter
-from pydantic import BaseModel
-from vector.factory import search_chunks
-from llm.embeddings import embed_chunks
-from llm.chat import answer_with_context
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+from vector.factory import lexical_search, search_chunks
+from vector.lexical import is_identifier_query
+from llm.embeddings import embed_query
+from llm.chat import answer_with_context, citations, estimate_stream_cost, stream_answer
+from llm.answer_cache import answer_cache, tenant_generation
+from llm.context import pack_context
+from core.admission import llm_admission
 from core.config import settings
+from core.ratelimit import TooManyRequests, enforce
+from core.tracing import span
+from core.usage import Usage, record_usage
+from ingest.chunk import count_tokens
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
@@ -11,17 +23,168 @@ class Q(BaseModel):
     question: str
     tenant_id: str | None = None
     k: int = 4
+    # diversification; None falls back to MMR_ENABLED / MMR_FETCH_MULTIPLIER / MMR_LAMBDA
+    mmr: bool | None = None
+    mmr_fetch: int | None = Field(None, ge=1, le=20)
+    mmr_lambda: float | None = Field(None, ge=0.0, le=1.0)
 
-@router.post("")
-async def ask(q: Q):
-    vec = (await embed_chunks([q.question]))[0]
-    tenant = q.tenant_id or settings.DEFAULT_TENANT
-    hits = search_chunks(vec, tenant, top_k=q.k)
+    def use_mmr(self) -> bool:
+        return settings.MMR_ENABLED if self.mmr is None else self.mmr
+
+    def variant(self) -> str:
+        """Answer-cache scope of the retrieval options (different options, different contexts)."""
+        if not self.use_mmr():
+            return ""
+        return f"mmr:{self.mmr_fetch or settings.MMR_FETCH_MULTIPLIER}:{settings.MMR_LAMBDA if self.mmr_lambda is None else self.mmr_lambda}"
+
+async def _embed(q: Q, usage: Usage) -> list[float]:
+    with span("ask.embed"):
+        return await embed_query(q.question, lambda cached: usage.add_embed(count_tokens(q.question), cached))
+
+async def _cached(q: Q, tenant: str, vec: list[float]):
+    """(generation, hit); a None generation means the answer must not be cached either."""
+    if not settings.ANSWER_CACHE_ENABLED:
+        return None, None
+    with span("ask.cache"):
+        gen = await tenant_generation(tenant)
+        if gen is None:
+            return None, None
+        return gen, answer_cache().get(tenant, q.k, vec, gen, q.variant())
+
+async def _lexical_hits(q: Q, tenant: str) -> list[dict]:
+    """Identifier-like questions (part numbers, clause IDs) are answered from BM25 alone, skipping the embedding."""
+    if not settings.LEXICAL_ENABLED or not is_identifier_query(q.question):
+        return []
+    with span("ask.lexical"):
+        return await lexical_search(tenant, q.question, top_k=q.k)
+
+def _pack(hits: list[dict]) -> tuple[list[dict], dict]:
     ctx = [{
         "file_id": h.get("file_id"),
         "page": h.get("page"),
+        "page_end": h.get("page_end"),
+        "char_start": h.get("char_start"),
+        "char_end": h.get("char_end"),
         "text": h.get("text"),
         "score": h.get("score", 0.0),
     } for h in hits]
-    ans, citations, cost = await answer_with_context(q.question, ctx)
-    return {"answer": ans, "sources": citations, "cost": cost}
+    with span("ask.pack"):
+        return pack_context(ctx, settings.CONTEXT_TOKEN_BUDGET, settings.CONTEXT_DEDUP_JACCARD)
+
+async def _context(q: Q, tenant: str, vec: list[float]) -> tuple[list[dict], dict]:
+    with span("ask.search"):
+        hits = await search_chunks(vec, tenant, top_k=q.k, query_text=q.question,
+                                   mmr=q.use_mmr(), mmr_fetch=q.mmr_fetch, mmr_lambda=q.mmr_lambda)
+    return _pack(hits)
+
+async def _answer(q: Q, ctx: list[dict], usage: Usage) -> tuple[str, list[dict], dict]:
+    async with llm_admission.slot():
+        with span("ask.llm"):
+            ans, cites, cost = await answer_with_context(q.question, ctx)
+    usage.add_chat(cost)
+    return ans, cites, cost
+
+@router.post("")
+async def ask(q: Q):
+    tenant = q.tenant_id or settings.DEFAULT_TENANT
+    await enforce(tenant, "ask")
+    usage = Usage(requests=1)
+    if lex := await _lexical_hits(q, tenant):
+        ctx, packing = _pack(lex)
+        ans, cites, cost = await _answer(q, ctx, usage)
+        await record_usage(tenant, usage)
+        return {"answer": ans, "sources": cites, "cost": {**cost, **packing}, "cached": False}
+    vec = await _embed(q, usage)
+    gen, hit = await _cached(q, tenant, vec)
+    if hit:
+        usage.add_answer_cache_hit(hit.cost)
+        await record_usage(tenant, usage)
+        return {"answer": hit.answer, "sources": hit.sources, "cost": hit.cost, "cached": True}
+    ctx, packing = await _context(q, tenant, vec)
+    ans, cites, cost = await _answer(q, ctx, usage)
+    cost = {**cost, **packing}
+    if gen is not None:
+        answer_cache().put(tenant, q.k, vec, gen, ans, cites, cost, q.variant())
+    await record_usage(tenant, usage)
+    return {"answer": ans, "sources": cites, "cost": cost, "cached": False}
+
+_recording: set[asyncio.Task] = set()
+
+async def _record_usage_shielded(tenant: str, usage: Usage) -> None:
+    """record_usage that still completes when the caller is cancelled (a client leaving mid-stream)."""
+    task = asyncio.ensure_future(record_usage(tenant, usage))
+    _recording.add(task)
+    task.add_done_callback(_recording.discard)
+    await asyncio.shield(task)
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@router.post("/stream")
+async def ask_stream(q: Q):
+    """Server-sent events: ``sources`` after retrieval, ``token`` per completion delta, then ``done`` with cost.
+
+    Overload is refused with 429 before the stream starts; if the completion
+    slot still cannot be had after retrieval, an ``error`` event carries the
+    Retry-After hint instead. An upstream failure mid-answer ends the stream
+    with an ``error`` event (status 502) and nothing is cached.
+    """
+    tenant = q.tenant_id or settings.DEFAULT_TENANT
+    await enforce(tenant, "ask")
+    llm_admission.check()
+
+    async def events():
+        usage = Usage(requests=1)
+        try:
+            vec = None
+            if lex := await _lexical_hits(q, tenant):
+                ctx, packing = _pack(lex)
+            else:
+                vec = await _embed(q, usage)
+                gen, hit = await _cached(q, tenant, vec)
+                if hit:
+                    usage.add_answer_cache_hit(hit.cost)
+                    yield _sse("sources", hit.sources)
+                    yield _sse("token", {"text": hit.answer})
+                    yield _sse("done", {"cost": hit.cost, "cached": True})
+                    return
+                ctx, packing = await _context(q, tenant, vec)
+            cites = citations(ctx)
+            yield _sse("sources", cites)
+            parts = []
+            try:
+                await llm_admission.acquire()
+            except TooManyRequests as e:
+                yield _sse("error", {"status": 429, "detail": e.reason, "retry_after_s": e.retry_after_s})
+                return
+            t0 = time.perf_counter()
+            failed = cost = None
+            try:
+                # a client disconnect cancels this generator, which closes the upstream stream
+                with span("ask.llm"):
+                    async for kind, val in stream_answer(q.question, ctx):
+                        if kind == "token":
+                            parts.append(val)
+                            yield _sse("token", {"text": val})
+                        else:
+                            usage.add_chat(val)
+                            cost = {**val, **packing}
+            except Exception as e:
+                logger.warning(f"Streaming answer failed after {len(parts)} tokens: {e}")
+                failed = f"{type(e).__name__}: {e}"
+            finally:
+                llm_admission.release((time.perf_counter() - t0) * 1000)
+                if cost is None:
+                    # cut short (upstream failure or client disconnect): the prompt and streamed tokens are still billed
+                    usage.add_chat(estimate_stream_cost(q.question, ctx, "".join(parts)))
+            if failed is not None:
+                yield _sse("error", {"status": 502, "detail": f"upstream error: {failed}"})
+                return
+            if vec is not None and gen is not None:
+                answer_cache().put(tenant, q.k, vec, gen, "".join(parts), cites, cost, q.variant())
+            yield _sse("done", {"cost": cost, "cached": False})
+        finally:
+            await _record_usage_shielded(tenant, usage)
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
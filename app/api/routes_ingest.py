@@ -1,35 +1,38 @@
+from typing import List
 from fastapi import APIRouter, UploadFile, File
-from ingest.extract import extract_text
-from ingest.normalize import normalize
-from ingest.chunk import chunk_text
-from ingest.dedupe import chunk_hash
-from llm.embeddings import embed_chunks
-from vector.factory import upsert_chunks
+from ingest.bulk import iter_sources, run_bulk_ingest
+from ingest.pipeline import run_ingest
+from llm.answer_cache import bump_generation
 from core.config import settings
-import uuid
+from core.ratelimit import enforce
 
 router = APIRouter()
 
 @router.post("")
 async def ingest(file: UploadFile = File(...), tenant_id: str | None = None):
-    data = await file.read()
-    text = normalize(extract_text(data, file.filename))
-    chunks = chunk_text(text)
-    ids = [str(uuid.uuid4()) for _ in chunks]
-    vecs = await embed_chunks(chunks)
-    items = []
     tenant = tenant_id or settings.DEFAULT_TENANT
-    for i, ch, v in zip(ids, chunks, vecs):
-        items.append({
-            "id": i,
-            "tenant_id": tenant,
-            "file_id": file.filename,
-            "page": None,
-            "section": None,
-            "text": ch,
-            "vector": v,
-            "source": file.filename,
-            "hash": chunk_hash(ch)
-        })
-    upsert_chunks(items)
-    return {"tenant": tenant, "file_id": file.filename, "chunks": len(chunks)}
+    await enforce(tenant, "ingest")
+    # UploadFile is already spooled to disk past 1 MB; stream from it instead of read()-ing it all
+    res = await run_ingest(file.file, file.filename, tenant,
+                           batch_size=settings.INGEST_BATCH_CHUNKS, queue_depth=settings.INGEST_QUEUE_DEPTH)
+    if res["added"] or res["removed"]:
+        await bump_generation(tenant)
+    return {"tenant": tenant, "file_id": file.filename, **res}
+
+@router.post("/bulk")
+async def ingest_bulk(files: List[UploadFile] = File(...), tenant_id: str | None = None):
+    """Many documents in one request; zip/tar uploads are expanded. Failures are reported per file.
+
+    The request takes one ingest rate-limit token, plus one per further BULK_FILES_PER_TOKEN documents.
+    """
+    tenant = tenant_id or settings.DEFAULT_TENANT
+    await enforce(tenant, "ingest")
+    sources = iter_sources(((f.filename, f.file) for f in files), settings.BULK_MAX_MEMBER_MB << 20)
+    res = await run_bulk_ingest(sources, tenant, batch_size=settings.BULK_BATCH_CHUNKS,
+                                file_concurrency=settings.BULK_FILE_CONCURRENCY,
+                                queue_depth=settings.INGEST_QUEUE_DEPTH, linger_ms=settings.BULK_LINGER_MS,
+                                embed_concurrency=settings.EMBED_CONCURRENCY,
+                                files_per_token=settings.BULK_FILES_PER_TOKEN)
+    if res["totals"]["added"] or res["totals"]["removed"]:
+        await bump_generation(tenant)
+    return {"tenant": tenant, **res}
@@ -0,0 +1,108 @@
+"""
+End-to-end throughput of /ingest and /ask against offline stand-ins.
+
+The real FastAPI app (middlewares, routes, ingest pipeline, caches, Qdrant
+client code) is driven in-process over ASGI, with the external services
+replaced by bench/fakes.py: a fake Azure OpenAI with configurable latency and
+429 injection, fakeredis and an in-memory Qdrant. Every concurrency level
+ingests its own documents and asks its own (distinct) questions, so caches
+warmed by one level do not flatter the next. Per-tenant rate limits are off
+unless --rate-limit is given; admission control stays on.
+
+    python -m bench.bench_api --concurrency 1,8,32 --docs 16 --questions 64 \
+        --embed-latency-ms 30 --chat-latency-ms 300 --p429 0.02 --out bench-api.json
+"""
+import argparse
+import asyncio
+import tempfile
+import time
+from collections import Counter
+from typing import Awaitable, Callable, List, Tuple
+import httpx
+from bench.corpus import make_text
+from bench.fakes import FakeOpenAI, install
+from bench.report import emit, summarize
+from core.config import settings
+
+
+async def _run(n: int, concurrency: int, call: Callable[[int], Awaitable[int]]) -> Tuple[List[float], Counter, float]:
+    lat: List[float] = []
+    statuses: Counter = Counter()
+    next_i = 0
+
+    async def worker():
+        nonlocal next_i
+        while next_i < n:
+            i, next_i = next_i, next_i + 1
+            t0 = time.perf_counter()
+            statuses[await call(i)] += 1
+            lat.append((time.perf_counter() - t0) * 1000)
+
+    t = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return lat, statuses, time.perf_counter() - t
+
+
+async def bench(args: argparse.Namespace) -> Tuple[List[dict], dict]:
+    fake = FakeOpenAI(args.embed_latency_ms, args.chat_latency_ms, args.token_latency_ms, args.p429,
+                      args.retry_after_ms, seed=args.seed)
+    install(fake)
+    from main import app
+    from vector.factory import ensure_schema
+    await ensure_schema()
+    results = []
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=None) as cli:
+        for c in args.concurrency:
+            async def ingest(i: int) -> int:
+                body = make_text(args.doc_words, seed=args.seed + c * 10_000 + i).encode()
+                r = await cli.post("/ingest", params={"tenant_id": args.tenant},
+                                   files={"file": (f"c{c}-doc{i}.txt", body, "text/plain")})
+                return r.status_code
+
+            async def ask(i: int) -> int:
+                q = f"{make_text(12, seed=args.seed + c * 10_000 + i)} ?"
+                path = "/ask/stream" if args.stream else "/ask"
+                r = await cli.post(path, json={"question": q, "tenant_id": args.tenant, "k": args.k})
+                return r.status_code
+
+            for phase, n, call in (("ingest", args.docs, ingest), ("ask", args.questions, ask)):
+                lat, statuses, secs = await _run(n, c, call)
+                results.append(summarize(lat, secs, phase=phase, concurrency=c,
+                                         status={str(k): v for k, v in sorted(statuses.items())}))
+        stats = (await cli.get("/admin/stats")).json()
+    return results, {"upstream": fake.stats(), "stages": stats.get("stages", {})}
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--concurrency", type=lambda s: [int(x) for x in s.split(",")], default=[1, 8, 32])
+    ap.add_argument("--docs", type=int, default=16, help="documents ingested per concurrency level")
+    ap.add_argument("--doc-words", type=int, default=3000)
+    ap.add_argument("--questions", type=int, default=64, help="questions asked per concurrency level")
+    ap.add_argument("--k", type=int, default=4)
+    ap.add_argument("--stream", action="store_true", help="use /ask/stream instead of /ask")
+    ap.add_argument("--tenant", default="bench")
+    ap.add_argument("--dim", type=int, default=256, help="embedding dimension (EMBED_DIM)")
+    ap.add_argument("--embed-latency-ms", type=float, default=20)
+    ap.add_argument("--chat-latency-ms", type=float, default=200)
+    ap.add_argument("--token-latency-ms", type=float, default=0)
+    ap.add_argument("--p429", type=float, default=0.0, help="share of upstream calls rejected with 429")
+    ap.add_argument("--retry-after-ms", type=int, default=50)
+    ap.add_argument("--rate-limit", action="store_true", help="keep the per-tenant Redis rate limits on")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--out", help="also write the JSON report here")
+    args = ap.parse_args()
+
+    settings.EMBED_DIM = args.dim
+    settings.ACCESS_LOG = False  # the report goes to stdout
+    settings.LEXICAL_INDEX_DIR = tempfile.mkdtemp(prefix="bench-lexical-")
+    # retries back off by the upstream's retry-after-ms, not by the production base delay
+    settings.EMBED_BACKOFF_BASE_S = 0.01
+    if not args.rate_limit:
+        settings.RATE_LIMIT_RPS = settings.INGEST_RATE_LIMIT_RPS = 0
+    results, extra = asyncio.run(bench(args))
+    emit("api", vars(args), results, args.out, **extra)
+
+
+if __name__ == "__main__":
+    main()
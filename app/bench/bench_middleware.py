@@ -0,0 +1,94 @@
+"""
+Per-request overhead of the request-id + metrics middleware pair.
+
+Drives the ASGI app in-process (no server, no HTTP client) with a trivial
+JSON route and compares no middleware, the previous BaseHTTPMiddleware
+implementation and the current pure-ASGI one. The access log is off, so only
+the middleware itself is measured and stdout holds just the report.
+
+    python -m bench.bench_middleware --requests 20000 --out bench-middleware.json
+"""
+import argparse
+import asyncio
+import time
+import uuid
+from collections import deque
+from fastapi import FastAPI
+from starlette.middleware.base import BaseHTTPMiddleware
+from bench.report import emit
+from core.config import settings
+from core.middleware import MetricsMiddleware, RequestIdMiddleware
+
+_lat = deque(maxlen=500)
+
+
+class LegacyRequestId(BaseHTTPMiddleware):
+    async def dispatch(self, request, call_next):
+        rid = request.headers.get("X-Request-ID", str(uuid.uuid4()))
+        request.state.request_id = rid
+        resp = await call_next(request)
+        resp.headers["X-Request-ID"] = rid
+        return resp
+
+
+class LegacyMetrics(BaseHTTPMiddleware):
+    async def dispatch(self, request, call_next):
+        t0 = time.perf_counter()
+        resp = await call_next(request)
+        dur = (time.perf_counter() - t0) * 1000
+        _lat.append(dur)
+        n = len(_lat)
+        if n >= 20 and n % 20 == 0:
+            sorted(_lat)[max(int(0.95 * n) - 1, 0)]
+        resp.headers["X-Response-Time-ms"] = f"{dur:.2f}"
+        return resp
+
+
+def _app(middlewares) -> FastAPI:
+    app = FastAPI()
+    for m in middlewares:
+        app.add_middleware(m)
+
+    @app.get("/items/{item_id}")
+    async def item(item_id: int):
+        return {"id": item_id}
+
+    return app
+
+
+async def _drive(app, n: int) -> float:
+    scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+             "path": "/items/1", "raw_path": b"/items/1", "root_path": "", "query_string": b"", "headers": [],
+             "client": ("127.0.0.1", 1), "server": ("test", 80)}
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    for _ in range(200):
+        await app(dict(scope), receive, send)
+    t = time.perf_counter()
+    for _ in range(n):
+        await app(dict(scope), receive, send)
+    return (time.perf_counter() - t) / n * 1e6
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--requests", type=int, default=20000)
+    ap.add_argument("--out", help="also write the JSON report here")
+    args = ap.parse_args()
+    settings.ACCESS_LOG = False
+    base = asyncio.run(_drive(_app([]), args.requests))
+    results = [{"case": "no middleware", "us_per_request": round(base, 1), "added_us": 0.0}]
+    for name, mws in (("BaseHTTPMiddleware (old)", [LegacyRequestId, LegacyMetrics]),
+                      ("pure ASGI (new)", [RequestIdMiddleware, MetricsMiddleware])):
+        us = asyncio.run(_drive(_app(mws), args.requests))
+        results.append({"case": name, "us_per_request": round(us, 1), "added_us": round(us - base, 1)})
+    emit("middleware", vars(args), results, args.out)
+
+
+if __name__ == "__main__":
+    main()
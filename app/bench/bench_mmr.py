@@ -0,0 +1,68 @@
+"""
+Added latency of the MMR diversification stage.
+
+Measures the NumPy MMR step alone and the full local-store retrieval with and
+without it (over-fetch m*k candidates with vectors, then select k).
+
+    python -m bench.bench_mmr --m 5 --k 8 --dim 3072 --rows 20000 --out bench-mmr.json
+"""
+import argparse
+import tempfile
+import time
+from typing import List
+import numpy as np
+from bench.report import emit, percentile, summarize
+from vector.local_store import TenantStore
+from vector.mmr import diversify, mmr
+
+
+def _timed(fn, runs: int) -> List[float]:
+    fn()
+    out = []
+    for _ in range(runs):
+        t = time.perf_counter()
+        fn()
+        out.append((time.perf_counter() - t) * 1000)
+    return out
+
+
+def _row(case: str, ms: List[float], **fields) -> dict:
+    return summarize(ms, sum(ms) / 1000, case=case, **fields)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--m", type=int, default=5)
+    ap.add_argument("--k", type=int, default=8)
+    ap.add_argument("--dim", type=int, default=3072)
+    ap.add_argument("--rows", type=int, default=20000)
+    ap.add_argument("--runs", type=int, default=200)
+    ap.add_argument("--lam", type=float, default=0.5)
+    ap.add_argument("--out", help="also write the JSON report here")
+    args = ap.parse_args()
+
+    rng = np.random.default_rng(0)
+    n = args.m * args.k
+    q = rng.normal(size=args.dim).astype(np.float32)
+    cands = rng.normal(size=(n, args.dim)).astype(np.float32)
+    results = [_row("mmr() on candidate matrix", _timed(lambda: mmr(q, cands, args.k, args.lam), args.runs),
+                    candidates=n)]
+
+    with tempfile.TemporaryDirectory() as d:
+        store = TenantStore(d)
+        for s in range(0, args.rows, 5000):
+            vecs = rng.normal(size=(min(5000, args.rows - s), args.dim)).astype(np.float32)
+            store.upsert([{"id": f"{s + i}", "file_id": "f", "text": "x", "vector": v} for i, v in enumerate(vecs)])
+        plain = _timed(lambda: store.search(q, args.k), args.runs)
+        div = _timed(lambda: diversify(q, store.search(q, n, with_vectors=True), args.k, args.lam), args.runs)
+        store.close()
+    results += [
+        _row(f"local search top-{args.k}", plain),
+        _row(f"local search top-{n} + MMR to {args.k}", div,
+             added_p50_ms=round(percentile(div, 0.5) - percentile(plain, 0.5), 3)),
+    ]
+    emit("mmr", vars(args), results, args.out)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Micro-benchmarks of the ingest stages: extract_text (txt/html/docx/pdf),
+normalize, chunk_text and embed_chunks.
+
+embed_chunks runs against the fake Azure OpenAI from bench/fakes.py (with
+--embed-latency-ms of upstream latency per call) and fakeredis, once with a
+cold embedding cache and once fully warm.
+
+    python -m bench.bench_stages --pages 40 --repeat 5 --out bench-stages.json
+"""
+import argparse
+import asyncio
+import time
+from typing import Callable, List
+from bench.corpus import make_docx, make_html, make_pages, make_pdf
+from bench.fakes import FakeOpenAI, install
+from bench.report import emit, summarize
+from core.config import settings
+from ingest.chunk import chunk_text
+from ingest.extract import extract_text
+from ingest.normalize import normalize
+
+
+def _time(fn: Callable[[], object], repeat: int) -> List[float]:
+    fn()  # warm-up (imports, tokenizer tables)
+    lat = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        lat.append((time.perf_counter() - t0) * 1000)
+    return lat
+
+
+def _row(stage: str, lat: List[float], mb: float, **fields) -> dict:
+    row = summarize(lat, sum(lat) / 1000, stage=stage, input_mb=round(mb, 3), **fields)
+    row["mb_per_s"] = round(mb * len(lat) / row["seconds"], 2) if row["seconds"] else 0.0
+    return row
+
+
+async def _embed_rows(texts: List[str], args: argparse.Namespace) -> List[dict]:
+    from llm.embeddings import embed_chunks
+    fake = FakeOpenAI(embed_latency_ms=args.embed_latency_ms)
+    install(fake)
+    mb = sum(len(t.encode()) for t in texts) / 1e6
+    rows = []
+    for label in ("cold", "warm"):
+        t0 = time.perf_counter()
+        await embed_chunks(texts)
+        ms = (time.perf_counter() - t0) * 1000
+        rows.append({**_row(f"embed_chunks[{label}]", [ms], mb), "chunks": len(texts),
+                     "chunks_per_s": round(len(texts) / (ms / 1000), 1), "upstream": fake.stats()})
+    return rows
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--pages", type=int, default=40)
+    ap.add_argument("--words-per-page", type=int, default=450)
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--dim", type=int, default=1536, help="embedding dimension (EMBED_DIM)")
+    ap.add_argument("--embed-latency-ms", type=float, default=20)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--out", help="also write the JSON report here")
+    args = ap.parse_args()
+    settings.EMBED_DIM = args.dim
+
+    pages = make_pages(args.pages, args.words_per_page, args.seed)
+    docs = {
+        "txt": "\n\n".join(pages).encode(),
+        "html": make_html(pages),
+        "docx": make_docx(pages),
+        "pdf": make_pdf(pages),
+    }
+    results = []
+    for ext, data in docs.items():
+        lat = _time(lambda: extract_text(data, f"bench.{ext}"), args.repeat)
+        results.append(_row(f"extract_text[{ext}]", lat, len(data) / 1e6, pages=args.pages))
+    raw = extract_text(docs["pdf"], "bench.pdf")
+    results.append(_row("normalize", _time(lambda: normalize(raw), args.repeat), len(raw.encode()) / 1e6))
+    text = normalize(raw)
+    chunks = chunk_text(text)
+    results.append(_row("chunk_text", _time(lambda: chunk_text(text), args.repeat), len(text.encode()) / 1e6,
+                        chunks=len(chunks)))
+    results += asyncio.run(_embed_rows(chunks, args))
+    emit("stages", vars(args), results, args.out)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Startup profile: import time of the app and time from lifespan start to ready.
+
+Each sample runs in a fresh interpreter. ``python -X importtime -c "import main"``
+gives the total import time and the modules that dominate it; a second child
+imports the app, swaps in the offline stand-ins (bench/fakes.py) and measures
+how long the lifespan warm-up takes until /readyz would pass.
+
+    python -m bench.bench_startup --repeat 5 --top 15 --max-import-ms 1500 --out startup.json
+
+With --max-import-ms the exit status is 1 when the median import time exceeds
+the budget. CI (.github/workflows/test.yml) runs it for pull requests and
+branch pushes and keeps startup.json as the ``startup-report`` artifact, so
+startup time can be compared across runs.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from typing import Dict, List, Tuple
+from bench.report import emit
+
+_APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _importtime() -> Tuple[float, Dict[str, Tuple[int, int]]]:
+    """(wall ms of the child, {module: (self us, cumulative us)})."""
+    t0 = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"], cwd=_APP_DIR,
+                          capture_output=True, text=True, check=True)
+    wall = (time.perf_counter() - t0) * 1000
+    mods: Dict[str, Tuple[int, int]] = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cum_us, name = (p.strip() for p in line[len("import time:"):].split("|"))
+        mods[name.strip()] = (int(self_us), int(cum_us))
+    return wall, mods
+
+
+def _child_ready() -> None:
+    t0 = time.perf_counter()
+    import main  # noqa: F401
+    t_import = time.perf_counter()
+    from bench.fakes import FakeOpenAI, install
+    from core.resources import resources
+    from core.warmup import readiness
+    install(FakeOpenAI())
+
+    async def run() -> float:
+        t = time.perf_counter()
+        await resources.startup()
+        while not readiness.ready:
+            await asyncio.sleep(0.001)
+        ms = (time.perf_counter() - t) * 1000
+        await resources.aclose()
+        return ms
+
+    ready_ms = asyncio.run(run())
+    print(json.dumps({"import_ms": (t_import - t0) * 1000, "warmup_ms": ready_ms, "steps": readiness.steps}))
+
+
+def _ready() -> dict:
+    proc = subprocess.run([sys.executable, "-m", "bench.bench_startup", "--child-ready"], cwd=_APP_DIR,
+                          capture_output=True, text=True, check=True)
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--top", type=int, default=15, help="modules to list by self and cumulative import time")
+    ap.add_argument("--max-import-ms", type=float, help="fail when the median import time exceeds this")
+    ap.add_argument("--child-ready", action="store_true", help=argparse.SUPPRESS)
+    ap.add_argument("--out", help="also write the JSON report here")
+    args = ap.parse_args()
+    if args.child_ready:
+        _child_ready()
+        return
+
+    walls: List[float] = []
+    imports: List[float] = []
+    self_us: Dict[str, List[int]] = defaultdict(list)
+    cum_us: Dict[str, List[int]] = defaultdict(list)
+    for _ in range(args.repeat):
+        wall, mods = _importtime()
+        walls.append(wall)
+        imports.append(mods["main"][1] / 1000)
+        for name, (s, c) in mods.items():
+            self_us[name].append(s)
+            cum_us[name].append(c)
+    ready = [_ready() for _ in range(args.repeat)]
+
+    def top(d: Dict[str, List[int]]) -> List[dict]:
+        med = sorted(((statistics.median(v) / 1000, k) for k, v in d.items()), reverse=True)[:args.top]
+        return [{"module": k, "ms": round(ms, 2)} for ms, k in med]
+
+    results = [
+        {"case": "import main", "median_ms": round(statistics.median(imports), 1), "max_ms": round(max(imports), 1)},
+        {"case": "interpreter + import main (wall)", "median_ms": round(statistics.median(walls), 1),
+         "max_ms": round(max(walls), 1)},
+        {"case": "lifespan start -> ready", "median_ms": round(statistics.median(r["warmup_ms"] for r in ready), 1),
+         "max_ms": round(max(r["warmup_ms"] for r in ready), 1), "steps": ready[-1]["steps"]},
+    ]
+    emit("startup", vars(args), results, args.out,
+         top_self_import=top(self_us), top_cumulative_import=top(cum_us))
+    if args.max_import_ms is not None and results[0]["median_ms"] > args.max_import_ms:
+        print(f"import main: median {results[0]['median_ms']} ms exceeds budget {args.max_import_ms} ms",
+              file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Deterministic synthetic documents for benchmarks (text, HTML, DOCX, PDF).
+"""
+import io
+import random
+from typing import List
+
+_WORDS = (
+    "the of and to in a is that for it as was with be by on not he this are or his from at which but have an they "
+    "contract clause invoice payment supplier warranty liability audit report revenue quarter delivery schedule "
+    "umowa faktura dostawca płatność gwarancja zażółć gęślą jaźń ID-4711 SKU-0042 §12.3 2024-03-31"
+).split()
+
+
+def make_text(n_words: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    out: List[str] = []
+    for i in range(n_words):
+        out.append(rng.choice(_WORDS))
+        if i % 17 == 16:
+            out[-1] += "."
+        if i % 180 == 179:
+            out[-1] += "\n\n"
+    return " ".join(out)
+
+
+def make_pages(n_pages: int, words_per_page: int, seed: int = 0) -> List[str]:
+    return [make_text(words_per_page, seed * 100_003 + p) for p in range(n_pages)]
+
+
+def make_html(pages: List[str]) -> bytes:
+    body = "".join(f"<section><h2>Page {i}</h2><p>{p}</p></section>" for i, p in enumerate(pages, 1))
+    return f"<html><head><title>bench</title></head><body>{body}</body></html>".encode()
+
+
+def make_docx(pages: List[str]) -> bytes:
+    import docx
+    d = docx.Document()
+    for p in pages:
+        for para in p.split("\n\n"):
+            d.add_paragraph(para)
+    buf = io.BytesIO()
+    d.save(buf)
+    return buf.getvalue()
+
+
+def make_pdf(pages: List[str], line_chars: int = 90) -> bytes:
+    """Minimal text-only PDF (Helvetica, one content stream per page); non-latin-1 characters become '?'."""
+    objs: List[bytes] = []
+
+    def add(obj: bytes) -> int:
+        objs.append(obj)
+        return len(objs)
+
+    font = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    page_ids, contents = [], []
+    for text in pages:
+        words, lines, cur = text.split(), [], ""
+        for w in words:
+            if len(cur) + len(w) + 1 > line_chars:
+                lines.append(cur)
+                cur = ""
+            cur = f"{cur} {w}" if cur else w
+        lines.append(cur)
+        esc = [ln.encode("latin-1", "replace").replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)")
+               for ln in lines]
+        stream = b"BT /F1 10 Tf 40 800 Td 12 TL " + b" ".join(b"(" + ln + b") '" for ln in esc) + b" ET"
+        contents.append(add(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream"))
+        page_ids.append(add(b""))
+    pages_id = add(b"")
+    for pid, cid in zip(page_ids, contents):
+        objs[pid - 1] = (b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 595 842] /Contents %d 0 R "
+                         b"/Resources << /Font << /F1 %d 0 R >> >> >>" % (pages_id, cid, font))
+    objs[pages_id - 1] = (b"<< /Type /Pages /Kids [" + b" ".join(b"%d 0 R" % p for p in page_ids)
+                          + b"] /Count %d >>" % len(page_ids))
+    catalog = add(b"<< /Type /Catalog /Pages %d 0 R >>" % pages_id)
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for i, obj in enumerate(objs, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % i + obj + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objs) + 1)
+    out += b"".join(b"%010d 00000 n \n" % o for o in offsets)
+    out += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objs) + 1, catalog, xref)
+    return bytes(out)
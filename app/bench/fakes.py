@@ -0,0 +1,126 @@
+"""
+Offline stand-ins for the services the API talks to.
+
+``FakeOpenAI`` is an httpx transport that answers the Azure OpenAI embeddings
+and chat completions routes (streamed or not) with deterministic output after
+a configurable latency, and rejects a configurable share of calls with 429 +
+``retry-after-ms`` so the retry paths are exercised too. ``install()`` puts
+it, fakeredis and an in-memory Qdrant into ``core.resources`` so the real
+app code runs unchanged against them.
+"""
+import asyncio
+import base64
+import hashlib
+import json
+import random
+from collections import Counter
+from typing import AsyncIterator, List, Optional
+import fakeredis
+import httpx
+import numpy as np
+from openai import AsyncAzureOpenAI
+from qdrant_client import AsyncQdrantClient
+from core.config import settings
+from core.resources import resources
+
+FAKE_ENDPOINT = "https://fake-openai.local"
+
+
+def fake_vector(text: str, dim: int) -> np.ndarray:
+    """Unit vector seeded by the text, so equal texts embed equally across runs."""
+    seed = int.from_bytes(hashlib.blake2b(text.encode(), digest_size=8).digest(), "little")
+    v = np.random.default_rng(seed).standard_normal(dim).astype(np.float32)
+    return v / np.linalg.norm(v)
+
+
+class FakeOpenAI(httpx.AsyncBaseTransport):
+    def __init__(self, embed_latency_ms: float = 0.0, chat_latency_ms: float = 0.0, token_latency_ms: float = 0.0,
+                 p429: float = 0.0, retry_after_ms: int = 50, answer_tokens: int = 40, seed: int = 0,
+                 stream_usage: bool = True, fail_after_tokens: Optional[int] = None):
+        self.embed_latency_s = embed_latency_ms / 1000
+        self.chat_latency_s = chat_latency_ms / 1000
+        self.token_latency_s = token_latency_ms / 1000
+        self.p429 = p429
+        self.retry_after_ms = retry_after_ms
+        self.answer_tokens = answer_tokens
+        self.stream_usage = stream_usage  # False: omit the usage chunk, as some deployments do
+        self.fail_after_tokens = fail_after_tokens  # drop the connection mid-stream after this many tokens
+        self._rng = random.Random(seed)
+        self.calls: Counter = Counter()
+        self.rejected: Counter = Counter()
+        self.embedded_texts = 0
+
+    def stats(self) -> dict:
+        return {"calls": dict(self.calls), "rejected_429": dict(self.rejected), "embedded_texts": self.embedded_texts}
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        kind = "embeddings" if request.url.path.endswith("/embeddings") else "chat"
+        self.calls[kind] += 1
+        body = json.loads(request.content)
+        if self.p429 and self._rng.random() < self.p429:
+            self.rejected[kind] += 1
+            return httpx.Response(429, headers={"retry-after-ms": str(self.retry_after_ms)},
+                                  json={"error": {"code": "429", "message": "Rate limit is exceeded."}})
+        if kind == "embeddings":
+            await asyncio.sleep(self.embed_latency_s)
+            return httpx.Response(200, json=self._embeddings(body))
+        await asyncio.sleep(self.chat_latency_s)
+        if body.get("stream"):
+            return httpx.Response(200, headers={"content-type": "text/event-stream"}, content=self._chat_stream(body))
+        return httpx.Response(200, json=self._chat(body))
+
+    def _embeddings(self, body: dict) -> dict:
+        texts: List[str] = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        dim = body.get("dimensions") or settings.EMBED_DIM
+        self.embedded_texts += len(texts)
+        data = []
+        for i, t in enumerate(texts):
+            v = fake_vector(t, dim)
+            emb = base64.b64encode(v.tobytes()).decode() if body.get("encoding_format") == "base64" else v.tolist()
+            data.append({"object": "embedding", "index": i, "embedding": emb})
+        n = sum(len(t.split()) for t in texts)
+        return {"object": "list", "data": data, "model": body["model"],
+                "usage": {"prompt_tokens": n, "total_tokens": n}}
+
+    def _answer(self, body: dict) -> List[str]:
+        question = body["messages"][-1]["content"]
+        words = question.split() or ["ok"]
+        return [f"{words[i % len(words)]} " for i in range(self.answer_tokens)]
+
+    def _usage(self, body: dict) -> dict:
+        n_in = sum(len(m["content"].split()) for m in body["messages"])
+        return {"prompt_tokens": n_in, "completion_tokens": self.answer_tokens, "total_tokens": n_in + self.answer_tokens}
+
+    def _chat(self, body: dict) -> dict:
+        return {"id": "fake", "object": "chat.completion", "created": 0, "model": body["model"],
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": "".join(self._answer(body))}}],
+                "usage": self._usage(body)}
+
+    async def _chat_stream(self, body: dict) -> AsyncIterator[bytes]:
+        def event(payload: dict) -> bytes:
+            return f"data: {json.dumps(payload)}\n\n".encode()
+        base = {"id": "fake", "object": "chat.completion.chunk", "created": 0, "model": body["model"]}
+        for i, tok in enumerate(self._answer(body)):
+            if i == self.fail_after_tokens:
+                raise httpx.ReadError("connection reset by upstream")
+            if self.token_latency_s:
+                await asyncio.sleep(self.token_latency_s)
+            yield event({**base, "choices": [{"index": 0, "delta": {"content": tok}, "finish_reason": None}]})
+        if self.stream_usage:
+            yield event({**base, "choices": [], "usage": self._usage(body)})
+        yield b"data: [DONE]\n\n"
+
+
+def install(openai: FakeOpenAI) -> None:
+    """Point core.resources at the fakes (call before the first request)."""
+    settings.VECTOR_STORE = "qdrant"
+    settings.AZURE_OPENAI_ENDPOINT = FAKE_ENDPOINT
+    resources._openai = AsyncAzureOpenAI(
+        azure_endpoint=FAKE_ENDPOINT,
+        api_key="offline",
+        api_version="2024-07-01-preview",
+        http_client=httpx.AsyncClient(transport=openai),
+    )
+    resources._redis = fakeredis.FakeAsyncRedis()
+    resources._qdrant = AsyncQdrantClient(location=":memory:")
@@ -0,0 +1,62 @@
+"""
+Shared timing/report helpers: percentiles, peak RSS and the JSON report envelope.
+
+Reports are one JSON object with ``meta`` (what ran, with which knobs) and
+``results`` (one row per measured case), so two runs can be diffed or loaded
+into a dataframe directly.
+"""
+import json
+import math
+import platform
+import resource
+import sys
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+
+def percentile(values: Sequence[float], q: float) -> float:
+    """Nearest-rank percentile; 0.0 for no values."""
+    if not values:
+        return 0.0
+    s = sorted(values)
+    return s[max(0, math.ceil(q * len(s)) - 1)]
+
+
+def summarize(latencies_ms: Sequence[float], seconds: float, **fields: Any) -> Dict[str, Any]:
+    return {
+        **fields,
+        "n": len(latencies_ms),
+        "seconds": round(seconds, 4),
+        "throughput_per_s": round(len(latencies_ms) / seconds, 2) if seconds > 0 else 0.0,
+        "p50_ms": round(percentile(latencies_ms, 0.50), 3),
+        "p99_ms": round(percentile(latencies_ms, 0.99), 3),
+        "max_ms": round(max(latencies_ms), 3) if latencies_ms else 0.0,
+    }
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process (ru_maxrss is KiB on Linux, bytes on macOS)."""
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def emit(bench: str, args: Dict[str, Any], results: List[Dict[str, Any]], out: Optional[str] = None,
+         **extra: Any) -> Dict[str, Any]:
+    report = {
+        "meta": {
+            "bench": bench,
+            "args": args,
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "unix_time": int(time.time()),
+        },
+        "results": results,
+        **extra,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if out:
+        with open(out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    print(text)
+    return report
@@ -0,0 +1,113 @@
+"""
+Admission control for chat completions.
+
+At most ``max_inflight`` completions run per worker; the rest wait in FIFO
+order. A request is shed with TooManyRequests (429 + Retry-After) instead of
+queued when its expected wait - queue position times the moving average of
+completion time, spread over the slots - exceeds ``max_wait_ms``, or when it
+has actually waited that long. Failing fast keeps the admitted requests inside
+the latency SLO instead of letting every request's tail grow under overload.
+"""
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Deque
+from core.config import settings
+from core.metrics import counters, stages
+from core.ratelimit import TooManyRequests
+
+counters.describe("admission_decisions_total", "LLM admission decisions (admitted, queued, shed).")
+
+_EWMA_ALPHA = 0.2
+
+
+class AdmissionController:
+    def __init__(self, max_inflight: int, max_wait_ms: float, initial_service_ms: float = 1000.0):
+        self.max_inflight = max(1, max_inflight)
+        self.max_wait_ms = max_wait_ms
+        self.service_ms = initial_service_ms
+        self.inflight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    def expected_wait_ms(self) -> float:
+        if self.inflight < self.max_inflight and not self._waiters:
+            return 0.0
+        return (len(self._waiters) + 1) * self.service_ms / self.max_inflight
+
+    def _shed(self, wait_ms: float) -> TooManyRequests:
+        counters.inc("admission_decisions_total", decision="shed")
+        return TooManyRequests("overloaded, retry later", max(wait_ms, self.service_ms) / 1000)
+
+    def check(self) -> None:
+        """Raise TooManyRequests if a request arriving now would be shed (does not take a slot)."""
+        if (wait := self.expected_wait_ms()) > self.max_wait_ms:
+            raise self._shed(wait)
+
+    async def acquire(self) -> None:
+        if self.inflight < self.max_inflight and not self._waiters:
+            self.inflight += 1
+            counters.inc("admission_decisions_total", decision="admitted")
+            return
+        self.check()
+        counters.inc("admission_decisions_total", decision="queued")
+        fut = asyncio.get_running_loop().create_future()
+        self._waiters.append(fut)
+        t0 = time.perf_counter()
+        try:
+            async with asyncio.timeout(self.max_wait_ms / 1000):
+                await fut
+        except BaseException as e:
+            if fut.done() and not fut.cancelled():
+                # the slot was handed over just as we gave up
+                self.release()
+            else:
+                fut.cancel()
+                if fut in self._waiters:  # release() may already have popped and skipped it
+                    self._waiters.remove(fut)
+            if isinstance(e, TimeoutError):
+                raise self._shed(self.expected_wait_ms()) from None
+            raise
+        finally:
+            stages.record("admission.wait", (time.perf_counter() - t0) * 1000)
+
+    def release(self, service_ms: float | None = None) -> None:
+        if service_ms is not None:
+            self.service_ms += _EWMA_ALPHA * (service_ms - self.service_ms)
+        while self._waiters:
+            fut = self._waiters.popleft()
+            if not fut.done():
+                # hand the slot over directly; inflight stays the same
+                fut.set_result(None)
+                return
+        self.inflight -= 1
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        await self.acquire()
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.release((time.perf_counter() - t0) * 1000)
+
+    def stats(self) -> dict:
+        return {
+            "inflight": self.inflight,
+            "queued": len(self._waiters),
+            "max_inflight": self.max_inflight,
+            "avg_service_ms": round(self.service_ms, 1),
+            "expected_wait_ms": round(self.expected_wait_ms(), 1),
+        }
+
+    def prometheus(self) -> str:
+        return "".join(
+            f"# HELP {name} {help_text}\n# TYPE {name} gauge\n{name} {v}\n"
+            for name, help_text, v in (
+                ("llm_inflight", "Chat completions running in this worker.", self.inflight),
+                ("llm_queued", "Requests waiting for a chat completion slot.", len(self._waiters)),
+            )
+        )
+
+
+llm_admission = AdmissionController(settings.LLM_MAX_INFLIGHT, settings.ADMISSION_MAX_WAIT_MS)
@@ -12,10 +12,82 @@ class Settings(BaseModel):
     AZURE_SEARCH_API_KEY: str | None = getenv("AZURE_SEARCH_API_KEY")
     AZURE_SEARCH_USE_MSI: bool = getenv("AZURE_SEARCH_USE_MSI", "false").lower()=="true"
 
+    EMBED_DIM: int = int(getenv("EMBED_DIM", "3072"))
+    VECTOR_QUANTIZATION: str = getenv("VECTOR_QUANTIZATION", "none")
+    QUANT_OVERSAMPLING: float = float(getenv("QUANT_OVERSAMPLING", "4"))
+    UPSERT_BATCH_MAX_ITEMS: int = int(getenv("UPSERT_BATCH_MAX_ITEMS", "256"))
+    UPSERT_BATCH_MAX_BYTES: int = int(getenv("UPSERT_BATCH_MAX_BYTES", str(8 * 1024 * 1024)))
+    UPSERT_CONCURRENCY: int = int(getenv("UPSERT_CONCURRENCY", "4"))
+    UPSERT_MAX_RETRIES: int = int(getenv("UPSERT_MAX_RETRIES", "3"))
+    VECTOR_STORE: str = getenv("VECTOR_STORE", "auto")
+    QDRANT_HOST: str = getenv("QDRANT_HOST", "qdrant")
+    QDRANT_PORT: int = int(getenv("QDRANT_PORT", "6333"))
+    QDRANT_COLLECTION: str = getenv("QDRANT_COLLECTION", "chunks")
+    QDRANT_TENANT_MODE: str = getenv("QDRANT_TENANT_MODE", "shared")
+    QDRANT_ROUTE_CACHE_S: float = float(getenv("QDRANT_ROUTE_CACHE_S", "10"))
+    LOCAL_STORE_DIR: str = getenv("LOCAL_STORE_DIR", "/data/vectors")
+    LOCAL_IVF_MIN_ROWS: int = int(getenv("LOCAL_IVF_MIN_ROWS", "0"))
+    LOCAL_IVF_NPROBE: int = int(getenv("LOCAL_IVF_NPROBE", "8"))
+
     REDIS_URL: str = getenv("REDIS_URL", "redis://redis:6379/0")
+    REDIS_MAX_CONNECTIONS: int = int(getenv("REDIS_MAX_CONNECTIONS", "50"))
+    OPENAI_MAX_CONNECTIONS: int = int(getenv("OPENAI_MAX_CONNECTIONS", "100"))
+    OPENAI_MAX_KEEPALIVE: int = int(getenv("OPENAI_MAX_KEEPALIVE", "20"))
+    OPENAI_TIMEOUT_S: float = float(getenv("OPENAI_TIMEOUT_S", "60"))
+    HTTP_KEEPALIVE_EXPIRY_S: float = float(getenv("HTTP_KEEPALIVE_EXPIRY_S", "30"))
+    SEARCH_POOL_MAXSIZE: int = int(getenv("SEARCH_POOL_MAXSIZE", "20"))
+    EMBED_CACHE_TTL_S: int = int(getenv("EMBED_CACHE_TTL_S", str(60*60*24*7)))
+    EMBED_CACHE_DTYPE: str = getenv("EMBED_CACHE_DTYPE", "float32")
+    EMBED_BATCH_MAX_ITEMS: int = int(getenv("EMBED_BATCH_MAX_ITEMS", "256"))
+    EMBED_BATCH_MAX_TOKENS: int = int(getenv("EMBED_BATCH_MAX_TOKENS", "100000"))
+    EMBED_CONCURRENCY: int = int(getenv("EMBED_CONCURRENCY", "4"))
+    EMBED_MAX_RETRIES: int = int(getenv("EMBED_MAX_RETRIES", "6"))
+    EMBED_BACKOFF_BASE_S: float = float(getenv("EMBED_BACKOFF_BASE_S", "1.0"))
+    EMBED_BACKOFF_MAX_S: float = float(getenv("EMBED_BACKOFF_MAX_S", "60"))
+    QUERY_BATCH_WINDOW_MS: float = float(getenv("QUERY_BATCH_WINDOW_MS", "5"))
+    QUERY_BATCH_MAX: int = int(getenv("QUERY_BATCH_MAX", "32"))
+    LEXICAL_ENABLED: bool = getenv("LEXICAL_ENABLED", "false").lower()=="true"
+    LEXICAL_INDEX_DIR: str = getenv("LEXICAL_INDEX_DIR", "/data/lexical")
+    LEXICAL_MAX_DF_RATIO: float = float(getenv("LEXICAL_MAX_DF_RATIO", "0.2"))
+    HYBRID_FETCH_MULTIPLIER: int = int(getenv("HYBRID_FETCH_MULTIPLIER", "3"))
+    RRF_K: int = int(getenv("RRF_K", "60"))
+    MMR_ENABLED: bool = getenv("MMR_ENABLED", "false").lower()=="true"
+    MMR_FETCH_MULTIPLIER: int = int(getenv("MMR_FETCH_MULTIPLIER", "5"))
+    MMR_LAMBDA: float = float(getenv("MMR_LAMBDA", "0.5"))
+    CONTEXT_TOKEN_BUDGET: int = int(getenv("CONTEXT_TOKEN_BUDGET", "6000"))
+    CONTEXT_DEDUP_JACCARD: float = float(getenv("CONTEXT_DEDUP_JACCARD", "0.8"))
+    ANSWER_CACHE_ENABLED: bool = getenv("ANSWER_CACHE_ENABLED", "true").lower()=="true"
+    ANSWER_CACHE_THRESHOLD: float = float(getenv("ANSWER_CACHE_THRESHOLD", "0.95"))
+    ANSWER_CACHE_MAX_ENTRIES: int = int(getenv("ANSWER_CACHE_MAX_ENTRIES", "5000"))
+    ANSWER_CACHE_TTL_S: float = float(getenv("ANSWER_CACHE_TTL_S", "3600"))
+    INGEST_BATCH_CHUNKS: int = int(getenv("INGEST_BATCH_CHUNKS", "64"))
+    INGEST_QUEUE_DEPTH: int = int(getenv("INGEST_QUEUE_DEPTH", "2"))
+    BULK_FILE_CONCURRENCY: int = int(getenv("BULK_FILE_CONCURRENCY", "8"))
+    BULK_BATCH_CHUNKS: int = int(getenv("BULK_BATCH_CHUNKS", "256"))
+    BULK_LINGER_MS: float = float(getenv("BULK_LINGER_MS", "50"))
+    BULK_MAX_MEMBER_MB: int = int(getenv("BULK_MAX_MEMBER_MB", "200"))
+    BULK_FILES_PER_TOKEN: int = int(getenv("BULK_FILES_PER_TOKEN", "50"))
+    BOILERPLATE_ENABLED: bool = getenv("BOILERPLATE_ENABLED", "true").lower()=="true"
+    BOILERPLATE_LINE_SHARE: float = float(getenv("BOILERPLATE_LINE_SHARE", "0.5"))
+    BOILERPLATE_MIN_PAGES: int = int(getenv("BOILERPLATE_MIN_PAGES", "3"))
+    BOILERPLATE_WINDOW_PAGES: int = int(getenv("BOILERPLATE_WINDOW_PAGES", "16"))
+    BOILERPLATE_MIN_FILES: int = int(getenv("BOILERPLATE_MIN_FILES", "5"))
+    BOILERPLATE_INDEX_MAX_BANDS: int = int(getenv("BOILERPLATE_INDEX_MAX_BANDS", "200000"))
+    BOILERPLATE_INDEX_TTL_DAYS: float = float(getenv("BOILERPLATE_INDEX_TTL_DAYS", "30"))
+    EXTRACT_WORKERS: int = int(getenv("EXTRACT_WORKERS", "0"))
+    EXTRACT_PAGES_PER_TASK: int = int(getenv("EXTRACT_PAGES_PER_TASK", "16"))
+    EXTRACT_PAGE_TIMEOUT_S: float = float(getenv("EXTRACT_PAGE_TIMEOUT_S", "30"))
     APP_PORT: int = int(getenv("APP_PORT", "8000"))
     ALLOWED_ORIGINS: str = getenv("ALLOWED_ORIGINS", "*")
-    RATE_LIMIT_RPS: int = int(getenv("RATE_LIMIT_RPS", "5"))
+    RATE_LIMIT_RPS: float = float(getenv("RATE_LIMIT_RPS", "5"))
+    RATE_LIMIT_BURST: int = int(getenv("RATE_LIMIT_BURST", "10"))
+    INGEST_RATE_LIMIT_RPS: float = float(getenv("INGEST_RATE_LIMIT_RPS", "0.5"))
+    INGEST_RATE_LIMIT_BURST: int = int(getenv("INGEST_RATE_LIMIT_BURST", "5"))
+    LLM_MAX_INFLIGHT: int = int(getenv("LLM_MAX_INFLIGHT", "32"))
+    ADMISSION_MAX_WAIT_MS: float = float(getenv("ADMISSION_MAX_WAIT_MS", "2000"))
     DEFAULT_TENANT: str = getenv("DEFAULT_TENANT", "demo")
+    PREWARM: bool = getenv("PREWARM", "true").lower()=="true"
+    SLOW_SPAN_MS: float = float(getenv("SLOW_SPAN_MS", "1000"))
+    ACCESS_LOG: bool = getenv("ACCESS_LOG", "true").lower()=="true"
 
 settings = Settings()
@@ -0,0 +1,179 @@
+"""
+Fixed-memory latency histograms per (method, route, status) and per pipeline
+stage, plain counters, and their Prometheus text exposition.
+
+Buckets grow geometrically (8 per doubling, i.e. <= ~9% relative error) from
+MIN_MS to MAX_MS, so one series costs a few hundred ints regardless of traffic
+and quantiles need no sorting. Values are per process.
+"""
+import math
+import threading
+from typing import Dict, List, Tuple
+
+MIN_MS = 0.05
+MAX_MS = 120_000.0
+_PER_DOUBLING = 8
+_N = int(math.ceil(math.log2(MAX_MS / MIN_MS) * _PER_DOUBLING)) + 2  # + underflow / overflow
+# upper bound (ms) of each bucket; the last one is +Inf
+UPPER_MS = [MIN_MS * 2 ** (i / _PER_DOUBLING) for i in range(_N - 1)] + [math.inf]
+# coarse `le` boundaries exported to Prometheus (seconds)
+EXPORT_LE_S = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _bucket(ms: float) -> int:
+    if ms <= MIN_MS:
+        return 0
+    return min(_N - 1, int(math.ceil(math.log2(ms / MIN_MS) * _PER_DOUBLING)))
+
+
+class LogHistogram:
+    __slots__ = ("counts", "count", "sum_ms")
+
+    def __init__(self):
+        self.counts = [0] * _N
+        self.count = 0
+        self.sum_ms = 0.0
+
+    def record(self, ms: float) -> None:
+        self.counts[_bucket(ms)] += 1
+        self.count += 1
+        self.sum_ms += ms
+
+    def quantile(self, q: float) -> float:
+        """Upper bound (ms) of the bucket holding the q-quantile; 0.0 when empty."""
+        if not self.count:
+            return 0.0
+        rank = max(1, math.ceil(q * self.count))
+        seen = 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if seen >= rank:
+                return UPPER_MS[i] if i < _N - 1 else MAX_MS
+        return MAX_MS
+
+    def merge(self, other: "LogHistogram") -> None:
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.count += other.count
+        self.sum_ms += other.sum_ms
+
+    def summary(self) -> dict:
+        return {
+            "count": self.count,
+            "p50_ms": round(self.quantile(0.50), 2),
+            "p95_ms": round(self.quantile(0.95), 2),
+            "p99_ms": round(self.quantile(0.99), 2),
+        }
+
+    def cumulative_le(self, bounds_ms: List[float]) -> List[int]:
+        """Observations at or below each bound, counted at bucket granularity."""
+        out, seen, i = [], 0, 0
+        for b in bounds_ms:
+            while i < _N - 1 and UPPER_MS[i] <= b * (1 + 1e-9):
+                seen += self.counts[i]
+                i += 1
+            out.append(seen)
+        return out
+
+
+Key = Tuple[str, str, int]  # (method, route template, status)
+
+
+class LatencyRegistry:
+    def __init__(self):
+        self._hists: Dict[Key, LogHistogram] = {}
+        self._lock = threading.Lock()
+
+    def record(self, method: str, route: str, status: int, ms: float) -> None:
+        key = (method, route, status)
+        h = self._hists.get(key)
+        if h is None:
+            with self._lock:
+                h = self._hists.setdefault(key, LogHistogram())
+        h.record(ms)
+
+    def summary(self) -> Dict[str, dict]:
+        """p50/p95/p99 per "METHOD route" (all statuses merged)."""
+        merged: Dict[str, LogHistogram] = {}
+        for (method, route, _), h in list(self._hists.items()):
+            merged.setdefault(f"{method} {route}", LogHistogram()).merge(h)
+        return {name: h.summary() for name, h in sorted(merged.items())}
+
+    def prometheus(self) -> str:
+        series = [(f'method="{m}",route="{_esc(r)}",status="{s}"', h) for (m, r, s), h in sorted(self._hists.items())]
+        return _render("http_request_duration_seconds", "HTTP request latency by route template and status.", series)
+
+
+class StageRegistry:
+    """Latency of named pipeline stages (see core/tracing.py)."""
+
+    def __init__(self):
+        self._hists: Dict[str, LogHistogram] = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage: str, ms: float) -> None:
+        h = self._hists.get(stage)
+        if h is None:
+            with self._lock:
+                h = self._hists.setdefault(stage, LogHistogram())
+        h.record(ms)
+
+    def summary(self) -> Dict[str, dict]:
+        return {stage: h.summary() for stage, h in sorted(self._hists.items())}
+
+    def prometheus(self) -> str:
+        series = [(f'stage="{_esc(s)}"', h) for s, h in sorted(self._hists.items())]
+        return _render("stage_duration_seconds", "Latency of ask/ingest pipeline stages.", series)
+
+
+class CounterRegistry:
+    """Monotonic counters keyed by metric name and a (small, bounded) label set."""
+
+    def __init__(self):
+        self._help: Dict[str, str] = {}
+        self._values: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], float] = {}
+        self._lock = threading.Lock()
+
+    def describe(self, name: str, help_text: str) -> None:
+        self._help[name] = help_text
+
+    def inc(self, name: str, value: float = 1.0, **labels: str) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + value
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        out: Dict[str, Dict[str, float]] = {}
+        for (name, labels), v in sorted(self._values.items()):
+            out.setdefault(name, {})[",".join(f"{k}={lv}" for k, lv in labels) or "total"] = v
+        return out
+
+    def prometheus(self) -> str:
+        lines, last = [], None
+        for (name, labels), v in sorted(self._values.items()):
+            if name != last:
+                lines += [f"# HELP {name} {self._help.get(name, name)}", f"# TYPE {name} counter"]
+                last = name
+            lbl = ",".join(f'{k}="{_esc(lv)}"' for k, lv in labels)
+            lines.append(f"{name}{{{lbl}}} {v:g}" if lbl else f"{name} {v:g}")
+        return "\n".join(lines) + "\n" if lines else ""
+
+
+def _render(name: str, help_text: str, series: List[Tuple[str, LogHistogram]]) -> str:
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+    bounds_ms = [b * 1000 for b in EXPORT_LE_S]
+    for labels, h in series:
+        for le, c in zip(EXPORT_LE_S, h.cumulative_le(bounds_ms)):
+            lines.append(f'{name}_bucket{{{labels},le="{le}"}} {c}')
+        lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {h.count}')
+        lines.append(f"{name}_sum{{{labels}}} {h.sum_ms / 1000:.6f}")
+        lines.append(f"{name}_count{{{labels}}} {h.count}")
+    return "\n".join(lines) + "\n"
+
+
+def _esc(v: str) -> str:
+    return v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+latency = LatencyRegistry()
+stages = StageRegistry()
+counters = CounterRegistry()
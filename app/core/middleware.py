@@ -1,30 +1,77 @@
+"""
+Plain ASGI middlewares: no per-request task or response buffering, so
+streaming responses pass through untouched.
+
+RequestIdMiddleware also writes the access log (ACCESS_LOG): one ``request``
+event per request with its ID, route template, status and duration, so it can
+be joined with the ``slow_span`` events and stdlib log lines of the same request.
+"""
 import time, uuid
-from collections import deque
 import structlog
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.requests import Request
-from starlette.responses import Response
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from core.config import settings
+from core.metrics import latency
+from core.tracing import request_id_var
 
 _logger = structlog.get_logger()
-_lat = deque(maxlen=500)
-
-class RequestIdMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        rid = request.headers.get("X-Request-ID", str(uuid.uuid4()))
-        request.state.request_id = rid
-        resp: Response = await call_next(request)
-        resp.headers["X-Request-ID"] = rid
-        return resp
-
-class MetricsMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
+
+class RequestIdMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        rid = next((v.decode("latin-1") for k, v in scope["headers"] if k == b"x-request-id"), None) or str(uuid.uuid4())
+        scope.setdefault("state", {})["request_id"] = rid
         t0 = time.perf_counter()
-        resp: Response = await call_next(request)
-        dur = (time.perf_counter() - t0) * 1000
-        _lat.append(dur)
-        n = len(_lat)
-        if n >= 20 and n % 20 == 0:
-            p95 = sorted(_lat)[max(int(0.95*n)-1, 0)]
-            _logger.info("api_latency", p95_ms=round(p95,2), count=n)
-        resp.headers["X-Response-Time-ms"] = f"{dur:.2f}"
-        return resp
+        status = 500
+
+        async def send_with_id(message: Message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                MutableHeaders(scope=message)["X-Request-ID"] = rid
+            await send(message)
+
+        token = request_id_var.set(rid)
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            if settings.ACCESS_LOG:
+                route = getattr(scope.get("route"), "path", None) or "<unmatched>"
+                _logger.info("request", method=scope["method"], route=route, status=status,
+                             ms=round((time.perf_counter() - t0) * 1000, 2), request_id=rid)
+            request_id_var.reset(token)
+
+
+class MetricsMiddleware:
+    """Records the full request duration (including a streamed body) per route template and status.
+
+    ``X-Response-Time-ms`` is the time to the response headers.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        t0 = time.perf_counter()
+        status = 500
+
+        async def send_timed(message: Message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                MutableHeaders(scope=message)["X-Response-Time-ms"] = f"{(time.perf_counter() - t0) * 1000:.2f}"
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_timed)
+        finally:
+            route = scope.get("route")
+            # templates, not raw paths, keep the number of series bounded
+            name = getattr(route, "path", None) or "<unmatched>"
+            latency.record(scope["method"], name, status, (time.perf_counter() - t0) * 1000)
@@ -0,0 +1,100 @@
+"""
+Per-tenant, per-route token buckets in Redis.
+
+The bucket (tokens, last refill time) lives in one hash and is refilled and
+debited by a Lua script, so the check is atomic and shared by every worker.
+Decisions are counted in ``ratelimit_decisions_total``. If Redis is down the
+limiter fails open: an outage of the limiter should not become an outage of
+the API.
+"""
+import logging
+import time
+from dataclasses import dataclass
+from typing import Dict, Tuple
+import redis.asyncio as aioredis
+from redis.exceptions import RedisError
+from core.config import settings
+from core.metrics import counters
+from core.resources import resources
+
+logger = logging.getLogger(__name__)
+
+counters.describe("ratelimit_decisions_total", "Rate limiter decisions by route.")
+
+# KEYS[1] bucket; ARGV rate (tokens/s), burst, now (ms), cost -> {allowed, retry_after_ms}
+_BUCKET_LUA = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local cost = tonumber(ARGV[4])
+local b = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(b[1]) or burst
+local ts = tonumber(b[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate / 1000)
+local allowed, wait = 0, 0
+if tokens >= cost then
+  tokens = tokens - cost
+  allowed = 1
+else
+  wait = math.ceil((cost - tokens) * 1000 / rate)
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst * 1000 / rate) + 1000)
+return {allowed, wait}
+"""
+
+_script = None
+
+
+class TooManyRequests(Exception):
+    """Rejected by the rate limiter or admission control; main.py turns it into 429 + Retry-After."""
+
+    def __init__(self, reason: str, retry_after_s: float):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after_s = retry_after_s
+
+
+@dataclass(frozen=True)
+class Decision:
+    allowed: bool
+    retry_after_s: float = 0.0
+
+
+def limits(route: str) -> Tuple[float, int]:
+    """(tokens per second, burst) for a route; a rate of 0 disables limiting."""
+    table: Dict[str, Tuple[float, int]] = {
+        "ask": (settings.RATE_LIMIT_RPS, settings.RATE_LIMIT_BURST),
+        "ingest": (settings.INGEST_RATE_LIMIT_RPS, settings.INGEST_RATE_LIMIT_BURST),
+    }
+    return table.get(route, (settings.RATE_LIMIT_RPS, settings.RATE_LIMIT_BURST))
+
+
+def _bucket_script(r: aioredis.Redis):
+    global _script
+    if _script is None or _script.registered_client is not r:
+        # EVALSHA, falling back to loading the script once per server
+        _script = r.register_script(_BUCKET_LUA)
+    return _script
+
+
+async def take(tenant: str, route: str, cost: int = 1) -> Decision:
+    rate, burst = limits(route)
+    if rate <= 0:
+        return Decision(True)
+    try:
+        allowed, wait_ms = await _bucket_script(resources.redis())(
+            keys=[f"rl:{route}:{tenant}"], args=[rate, max(burst, cost), int(time.time() * 1000), cost])
+    except RedisError as e:
+        logger.warning(f"Rate limiter unavailable, allowing request: {e}")
+        counters.inc("ratelimit_decisions_total", route=route, decision="error")
+        return Decision(True)
+    counters.inc("ratelimit_decisions_total", route=route, decision="allowed" if allowed else "limited")
+    return Decision(bool(allowed), int(wait_ms) / 1000)
+
+
+async def enforce(tenant: str, route: str, cost: int = 1) -> None:
+    """Take ``cost`` tokens from the tenant's bucket for ``route`` or raise TooManyRequests."""
+    d = await take(tenant, route, cost)
+    if not d.allowed:
+        raise TooManyRequests(f"rate limit exceeded for tenant {tenant!r}", d.retry_after_s)
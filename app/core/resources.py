@@ -0,0 +1,148 @@
+"""
+Process-wide registry of long-lived, pooled clients.
+
+Clients are created lazily on first use, so scripts and tests work without
+the app lifespan. Creation is guarded by a lock, so a worker thread and the
+event loop racing on first use still share one client. In the API, ``startup()`` schedules the background warm-up
+(core/warmup.py) that opens and checks them, and ``aclose()`` closes them;
+both are called from the FastAPI lifespan handler in main.py.
+"""
+import asyncio
+import logging
+import threading
+from typing import TYPE_CHECKING
+import httpx
+import redis.asyncio as aioredis
+from core.config import settings
+
+if TYPE_CHECKING:
+    from openai import AsyncAzureOpenAI
+
+logger = logging.getLogger(__name__)
+
+
+class Resources:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self) -> None:
+        self._openai: "AsyncAzureOpenAI | None" = None
+        self._redis: aioredis.Redis | None = None
+        self._search_client = None
+        self._index_client = None
+        self._credential = None
+        self._qdrant = None
+        self._warmup: asyncio.Task | None = None
+
+    def openai(self) -> "AsyncAzureOpenAI":
+        if self._openai is None:
+            with self._lock:
+                if self._openai is None:
+                    self._openai = self._new_openai()
+        return self._openai
+
+    def _new_openai(self) -> "AsyncAzureOpenAI":
+        from openai import AsyncAzureOpenAI
+        http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=settings.OPENAI_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.OPENAI_MAX_KEEPALIVE,
+                keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY_S,
+            ),
+            timeout=settings.OPENAI_TIMEOUT_S,
+        )
+        return AsyncAzureOpenAI(
+            azure_endpoint=settings.AZURE_OPENAI_ENDPOINT,
+            api_key=settings.AZURE_OPENAI_API_KEY,
+            api_version="2024-07-01-preview",
+            http_client=http_client,
+        )
+
+    def redis(self) -> aioredis.Redis:
+        if self._redis is None:
+            with self._lock:
+                if self._redis is None:
+                    pool = aioredis.ConnectionPool.from_url(settings.REDIS_URL, max_connections=settings.REDIS_MAX_CONNECTIONS)
+                    self._redis = aioredis.Redis(connection_pool=pool)
+        return self._redis
+
+    def _search_transport(self):
+        import aiohttp
+        from azure.core.pipeline.transport import AioHttpTransport
+        session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=settings.SEARCH_POOL_MAXSIZE))
+        return AioHttpTransport(session=session)
+
+    def _search_credential(self):
+        with self._lock:
+            if self._credential is None:
+                from vector.azure_search_client import get_credential
+                self._credential = get_credential()
+        return self._credential
+
+    def search_client(self):
+        if self._search_client is None:
+            from azure.search.documents.aio import SearchClient
+            with self._lock:
+                if self._search_client is None:
+                    self._search_client = SearchClient(
+                        endpoint=settings.AZURE_SEARCH_ENDPOINT,
+                        index_name=settings.AZURE_SEARCH_INDEX,
+                        credential=self._search_credential(),
+                        transport=self._search_transport(),
+                    )
+        return self._search_client
+
+    def index_client(self):
+        if self._index_client is None:
+            from azure.search.documents.indexes.aio import SearchIndexClient
+            with self._lock:
+                if self._index_client is None:
+                    self._index_client = SearchIndexClient(
+                        endpoint=settings.AZURE_SEARCH_ENDPOINT,
+                        credential=self._search_credential(),
+                        transport=self._search_transport(),
+                    )
+        return self._index_client
+
+    def qdrant(self):
+        if self._qdrant is None:
+            from qdrant_client import AsyncQdrantClient
+            with self._lock:
+                if self._qdrant is None:
+                    self._qdrant = AsyncQdrantClient(host=settings.QDRANT_HOST, port=settings.QDRANT_PORT)
+        return self._qdrant
+
+    async def startup(self) -> None:
+        """Start warming up in the background; /readyz passes once it is done.
+
+        Requests arriving earlier are still served; they just open what they need themselves
+        (and ensure_schema() is retried on the first upsert).
+        """
+        from core.warmup import warm_up
+        self.redis()
+        self._warmup = asyncio.create_task(warm_up())
+
+    async def aclose(self) -> None:
+        if self._warmup is not None and not self._warmup.done():
+            self._warmup.cancel()
+        if self._openai is not None:
+            await self._openai.close()
+        if self._redis is not None:
+            await self._redis.aclose()
+        for c in (self._search_client, self._index_client, self._qdrant):
+            if c is not None:
+                await c.close()
+        from vector import lexical, local_store
+        lexical.close_all()
+        local_store.close_all()
+        if settings.EXTRACT_WORKERS > 0:
+            from ingest.extract import shutdown_pool
+            shutdown_pool()
+        # async identity credentials hold their own HTTP session
+        if self._credential is not None and hasattr(self._credential, "close"):
+            await self._credential.close()
+        self._reset()
+
+
+resources = Resources()
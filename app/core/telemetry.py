@@ -1,4 +1,24 @@
+import logging
 import structlog
+from core.tracing import request_id_var
+
+LOG_FORMAT = "%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s"
+
+
+def _with_request_id(factory):
+    def make(*args, **kwargs):
+        record = factory(*args, **kwargs)
+        record.request_id = request_id_var.get() or "-"
+        return record
+    return make
+
 
 def setup_logging():
+    """structlog at INFO; stdlib records carry the current request ID (``%(request_id)s``)."""
     structlog.configure(wrapper_class=structlog.make_filtering_bound_logger(20))
+    factory = logging.getLogRecordFactory()
+    if not getattr(factory, "request_id", False):
+        factory = _with_request_id(factory)
+        factory.request_id = True
+        logging.setLogRecordFactory(factory)
+    logging.basicConfig(format=LOG_FORMAT)
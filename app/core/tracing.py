@@ -0,0 +1,32 @@
+"""
+Lightweight per-stage spans.
+
+``span("ask.search")`` times a block, records it in the per-stage histograms
+(core/metrics.py) and logs stages slower than SLOW_SPAN_MS together with the
+request ID that RequestIdMiddleware put in ``request_id_var``. Context
+variables are copied into tasks, so spans in ingest stages keep the ID. The
+same ID is on the access log (core/middleware.py) and on every stdlib log
+record (core/telemetry.py).
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+import structlog
+from core.config import settings
+from core.metrics import stages
+
+_logger = structlog.get_logger()
+request_id_var: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+
+@contextmanager
+def span(stage: str, **fields) -> Iterator[None]:
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        ms = (time.perf_counter() - t0) * 1000
+        stages.record(stage, ms)
+        if ms >= settings.SLOW_SPAN_MS:
+            _logger.info("slow_span", stage=stage, ms=round(ms, 2), request_id=request_id_var.get(), **fields)
@@ -0,0 +1,94 @@
+"""
+Per-tenant token and spend accounting.
+
+A request fills a ``Usage`` as it goes; ``record_usage`` then adds it to the
+tenant's Redis hash ``usage:<tenant>`` in one pipelined round trip, so the
+totals are shared by all workers. "saved" fields count what caches avoided:
+embedding-cache hits and answer-cache hits (priced at the cached answer's cost);
+``boilerplate_tokens`` counts tokens stripped before chunking (never embedded).
+Like the rate limiter, recording fails open: a Redis error is logged and the
+request's usage is dropped rather than failing a request that already succeeded.
+"""
+import logging
+from dataclasses import dataclass, fields
+from typing import Dict, List
+from redis.exceptions import RedisError
+from core.config import settings
+from core.costs import estimate_cost
+from core.resources import resources
+
+logger = logging.getLogger(__name__)
+
+TENANTS_KEY = "usage:tenants"
+
+
+def _key(tenant: str) -> str:
+    return f"usage:{tenant}"
+
+
+@dataclass
+class Usage:
+    requests: int = 0
+    embed_tokens: int = 0
+    embed_tokens_cached: int = 0
+    chat_input_tokens: int = 0
+    chat_output_tokens: int = 0
+    answer_cache_hits: int = 0
+    boilerplate_tokens: int = 0
+    usd: float = 0.0
+    usd_saved: float = 0.0
+
+    def add_embed(self, tokens: int, cached: bool) -> None:
+        usd = estimate_cost(settings.AZURE_OPENAI_DEPLOYMENT_EMBED, tokens).usd
+        if cached:
+            self.embed_tokens_cached += tokens
+            self.usd_saved += usd
+        else:
+            self.embed_tokens += tokens
+            self.usd += usd
+
+    def add_chat(self, cost: dict) -> None:
+        self.chat_input_tokens += cost.get("input_tokens", 0)
+        self.chat_output_tokens += cost.get("output_tokens", 0)
+        self.usd += cost.get("usd", 0.0)
+
+    def add_answer_cache_hit(self, cost: dict) -> None:
+        self.answer_cache_hits += 1
+        self.usd_saved += cost.get("usd", 0.0)
+
+
+async def record_usage(tenant: str, usage: Usage) -> None:
+    pipe = resources.redis().pipeline(transaction=False)
+    key = _key(tenant)
+    for f in fields(Usage):
+        v = getattr(usage, f.name)
+        if not v:
+            continue
+        if isinstance(v, float):
+            pipe.hincrbyfloat(key, f.name, v)
+        else:
+            pipe.hincrby(key, f.name, v)
+    pipe.sadd(TENANTS_KEY, tenant)
+    try:
+        await pipe.execute()
+    except RedisError as e:
+        logger.warning(f"Usage of tenant {tenant!r} not recorded: {e} ({usage})")
+
+
+async def tenant_usage() -> Dict[str, dict]:
+    r = resources.redis()
+    tenants: List[str] = sorted(t.decode() if isinstance(t, bytes) else t for t in await r.smembers(TENANTS_KEY))
+    if not tenants:
+        return {}
+    pipe = r.pipeline(transaction=False)
+    for t in tenants:
+        pipe.hgetall(_key(t))
+    out = {}
+    floats = {f.name for f in fields(Usage) if f.type is float}
+    for t, raw in zip(tenants, await pipe.execute()):
+        row = {}
+        for k, v in raw.items():
+            name = k.decode() if isinstance(k, bytes) else k
+            row[name] = round(float(v), 6) if name in floats else int(v)
+        out[t] = row
+    return out
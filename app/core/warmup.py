@@ -0,0 +1,94 @@
+"""
+Background warm-up and readiness.
+
+The lifespan hook only schedules ``warm_up()``, so the process starts serving
+(and /healthz answers) right away. Warm-up then checks the dependencies
+(Redis, the vector index schema) - retrying with backoff until they answer -
+and, with PREWARM, loads the tokenizer and the document format libraries and
+opens the OpenAI client, so the first real requests do not pay for any of it.
+/readyz reports ready only once every step has passed.
+"""
+import asyncio
+import importlib
+import logging
+import time
+from typing import Awaitable, Callable, Dict, List, Tuple
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_BACKOFF_BASE_S = 1.0
+_MAX_BACKOFF_S = 30.0
+
+
+class Readiness:
+    def __init__(self):
+        self.steps: Dict[str, dict] = {}
+        self.ready = False
+
+    def report(self) -> dict:
+        return {"ready": self.ready, "steps": self.steps}
+
+
+readiness = Readiness()
+
+
+async def _redis() -> None:
+    from core.resources import resources
+    await resources.redis().ping()
+
+
+async def _vector_schema() -> None:
+    from vector.factory import ensure_schema
+    await ensure_schema()
+
+
+async def _tokenizer() -> None:
+    from ingest.chunk import prewarm
+    await asyncio.to_thread(prewarm)
+
+
+async def _extractors() -> None:
+    from ingest.extract import prewarm
+    await asyncio.to_thread(prewarm)
+
+
+async def _openai() -> None:
+    from core.resources import resources
+    if settings.AZURE_OPENAI_ENDPOINT:
+        # the slow part is importing the SDK; the client itself is created on the loop
+        await asyncio.to_thread(importlib.import_module, "openai")
+        resources.openai()
+
+
+def steps() -> List[Tuple[str, Callable[[], Awaitable[None]]]]:
+    out = [("redis", _redis), ("vector_schema", _vector_schema)]
+    if settings.PREWARM:
+        out += [("tokenizer", _tokenizer), ("extractors", _extractors), ("openai", _openai)]
+    return out
+
+
+async def _run_step(name: str, fn: Callable[[], Awaitable[None]]) -> None:
+    attempt = 0
+    while True:
+        t0 = time.perf_counter()
+        try:
+            await fn()
+            readiness.steps[name] = {"ok": True, "ms": round((time.perf_counter() - t0) * 1000, 1)}
+            return
+        except Exception as e:
+            readiness.steps[name] = {"ok": False, "error": f"{type(e).__name__}: {e}", "attempts": attempt + 1}
+            logger.warning(f"Warm-up step {name} failed (attempt {attempt + 1}): {e}")
+        await asyncio.sleep(min(_MAX_BACKOFF_S, _BACKOFF_BASE_S * 2 ** attempt))
+        attempt += 1
+
+
+async def warm_up() -> None:
+    """Run all steps concurrently; readiness flips to True when the last one passes."""
+    plan = steps()
+    readiness.ready = False
+    readiness.steps = {name: {"ok": False} for name, _ in plan}
+    t0 = time.perf_counter()
+    await asyncio.gather(*(_run_step(name, fn) for name, fn in plan))
+    readiness.ready = True
+    logger.info(f"Warm-up done in {(time.perf_counter() - t0) * 1000:.0f} ms")
@@ -0,0 +1,243 @@
+"""
+Boilerplate stripping before chunking.
+
+Two kinds of text are dropped before a document is chunked and embedded:
+
+- Repeated page furniture within a paged document (PDF letterheads,
+  confidentiality notices, "Page 3 of 40" footers): only the first and last
+  EDGE_LINES lines of a page are candidates. One that appears at the edge of
+  at least BOILERPLATE_LINE_SHARE of the pages seen so far (and of at least
+  two) is removed. Lines are compared lowercased; digit runs are masked only
+  in page numbers ("12", "- 12 -", "Page 3 of 40", "... page 3 ..."), and a
+  line of only numbers and punctuation is otherwise never boilerplate, so
+  table figures, totals and numbered headings survive. The first
+  BOILERPLATE_WINDOW_PAGES pages are read ahead before anything is emitted,
+  so the header is known before page 1 is chunked; only that window is held.
+- Paragraphs repeated across a tenant's corpus (standard disclaimers, terms
+  pages): each paragraph gets a MinHash signature of its hashed 5-word
+  shingles, split into LSH bands. After a document is stored, its band keys
+  are counted per tenant in Redis; a band seen in BOILERPLATE_MIN_FILES files
+  marks paragraphs sharing it as boilerplate for the documents ingested after
+  that. Files ingested before a paragraph crossed the threshold keep it until
+  they are re-ingested.
+
+The corpus index stays bounded: a file counts once (``docs``, one field per
+file; re-ingesting it adds nothing), a band's first sighting only sets two
+bits in a fixed-size bitmap (``bits``, 2 MiB per tenant), so only bands
+already seen in another file get a counter (``files``, capped at
+BOILERPLATE_INDEX_MAX_BANDS), and every key expires BOILERPLATE_INDEX_TTL_DAYS
+after the tenant's last ingest. Bitmap collisions can only make a band's
+count start one file early.
+
+Paragraphs are blank-line separated blocks, one line per paragraph for .docx.
+PDF text has no blank lines, so a page is split after lines that end a
+sentence and stop short of the page's line width. Blocks longer than
+MAX_PARAGRAPH_WORDS (a page that could not be split) are never signed or
+removed.
+"""
+import hashlib
+import logging
+import re
+import zlib
+from collections import Counter
+from itertools import islice
+from typing import FrozenSet, Iterable, Iterator, List, Set, Tuple
+import numpy as np
+from redis.exceptions import RedisError
+from core.config import settings
+from core.resources import resources
+from ingest.chunk import count_tokens
+from ingest.extract import is_paged
+
+logger = logging.getLogger(__name__)
+
+SHINGLE_WORDS = 5
+MIN_PARAGRAPH_WORDS = 8
+MAX_PARAGRAPH_WORDS = 200
+BITMAP_BITS = 1 << 24
+EDGE_LINES = 2
+PAGE_NUMBER = re.compile(r"^\W*(?:page\s*)?\d{1,4}(?:\s*(?:of|/)\s*\d{1,4})?\W*$")
+PAGE_REF = re.compile(r"\bpage\s+\d{1,4}(?:\s+of\s+\d{1,4})?\b")
+BANDS, ROWS = 4, 4
+_PRIME = (1 << 32) + 15
+_rng = np.random.default_rng(0x5EED)
+_A = _rng.integers(1, 1 << 32, BANDS * ROWS, dtype=np.uint64)
+_B = _rng.integers(0, 1 << 32, BANDS * ROWS, dtype=np.uint64)
+
+
+def _key(tenant: str, kind: str) -> str:
+    return f"boilerplate:{tenant}:{kind}"
+
+
+def line_key(line: str) -> str:
+    """Comparison key of a page line; "" for lines that must never count as boilerplate."""
+    key = " ".join(line.lower().split())
+    if PAGE_NUMBER.match(key) or PAGE_REF.search(key):
+        return re.sub(r"\d+", "#", key)
+    if not re.search(r"[^\W\d_]", key):  # only numbers and punctuation
+        return ""
+    return key
+
+
+def _edge_lines(page: str) -> Iterator[Tuple[int, str]]:
+    """(index in page.splitlines(), line) of the first and last EDGE_LINES non-blank lines."""
+    lines = [(i, ln) for i, ln in enumerate(page.splitlines()) if ln.strip()]
+    if len(lines) > 2 * EDGE_LINES:
+        lines = lines[:EDGE_LINES] + lines[-EDGE_LINES:]
+    return iter(lines)
+
+
+def pdf_paragraphs(page: str) -> List[str]:
+    """Split a PDF page at blank lines and after short lines ending a sentence."""
+    lines = page.splitlines()
+    width = max((len(ln.rstrip()) for ln in lines), default=0)
+    paras, cur = [], []
+    for ln in lines:
+        if not ln.strip():
+            if cur:
+                paras.append("\n".join(cur))
+            cur = []
+            continue
+        cur.append(ln)
+        end = ln.rstrip()
+        if end.endswith((".", "!", "?", ":")) and len(end) < 0.85 * width:
+            paras.append("\n".join(cur))
+            cur = []
+    if cur:
+        paras.append("\n".join(cur))
+    return paras
+
+
+def band_keys(paragraph: str) -> List[str]:
+    """LSH band keys of the paragraph's MinHash; near-identical paragraphs share at least one."""
+    words = re.findall(r"\w+", re.sub(r"\d+", "#", paragraph.lower()))
+    if not MIN_PARAGRAPH_WORDS <= len(words) <= MAX_PARAGRAPH_WORDS:
+        return []
+    shingles = {" ".join(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)}
+    x = np.fromiter((zlib.crc32(s.encode()) for s in shingles), dtype=np.uint64, count=len(shingles))
+    sig = ((np.outer(x, _A) + _B) % _PRIME).min(axis=0)
+    return [f"{b}{hashlib.blake2b(sig[b * ROWS:(b + 1) * ROWS].tobytes(), digest_size=8).hexdigest()}"
+            for b in range(BANDS)]
+
+
+class Stripper:
+    """Strips one document's pages; counts what it removed and collects its band keys."""
+
+    def __init__(self, filename: str, known: FrozenSet[str] = frozenset(), corpus: bool = False):
+        self.lines = settings.BOILERPLATE_ENABLED and is_paged(filename)
+        self.corpus = corpus
+        self.known = known
+        fn = filename.lower()
+        self.pdf = fn.endswith(".pdf")
+        self.para_sep = "\n" if fn.endswith(".docx") else r"\n\s*\n"
+        self.line_pages: Counter = Counter()
+        self.n_pages = 0
+        self.bands: Set[str] = set()
+        self.tokens_removed = 0
+        self.lines_removed = 0
+        self.paragraphs_removed = 0
+
+    def pages(self, pages: Iterable[str]) -> Iterator[str]:
+        it = iter(pages)
+        head = list(islice(it, max(1, settings.BOILERPLATE_WINDOW_PAGES)))
+        for p in head:
+            self._count(p)
+        for p in head:
+            yield self.strip(p)
+        for p in it:
+            self._count(p)
+            yield self.strip(p)
+
+    def _count(self, page: str) -> None:
+        self.n_pages += 1
+        if self.lines:
+            self.line_pages.update({line_key(ln) for _, ln in _edge_lines(page)} - {""})
+
+    def _repeated(self, line: str) -> bool:
+        if self.n_pages < settings.BOILERPLATE_MIN_PAGES:
+            return False
+        k = line_key(line)
+        return bool(k) and self.line_pages[k] >= max(2, settings.BOILERPLATE_LINE_SHARE * self.n_pages)
+
+    def strip(self, page: str) -> str:
+        if self.lines:
+            drop = {i for i, ln in _edge_lines(page) if self._repeated(ln)}
+            if drop:
+                lines = page.splitlines()
+                for i in drop:
+                    self.lines_removed += 1
+                    self.tokens_removed += count_tokens(lines[i])
+                page = "\n".join(ln for i, ln in enumerate(lines) if i not in drop)
+        if not self.corpus:
+            return page
+        paras = []
+        for para in pdf_paragraphs(page) if self.pdf else re.split(self.para_sep, page):
+            keys = band_keys(para)
+            if self.known.intersection(keys):
+                self.paragraphs_removed += 1
+                self.tokens_removed += count_tokens(para)
+                continue
+            self.bands.update(keys)
+            paras.append(para)
+        return "\n\n".join(paras)
+
+
+async def load_stripper(tenant: str, filename: str) -> Stripper:
+    """A Stripper for one document, knowing the tenant's corpus-wide boilerplate paragraphs."""
+    if not settings.BOILERPLATE_ENABLED or settings.BOILERPLATE_MIN_FILES <= 0:
+        return Stripper(filename)
+    try:
+        raw = await resources.redis().smembers(_key(tenant, "known"))
+    except RedisError as e:
+        logger.warning(f"Boilerplate index unavailable, keeping repeated paragraphs: {e}")
+        return Stripper(filename)
+    known = frozenset(k.decode() if isinstance(k, bytes) else k for k in raw)
+    return Stripper(filename, known, corpus=True)
+
+
+def _bits(band: str) -> Tuple[int, int]:
+    h = int(band[1:], 16)
+    return h % BITMAP_BITS, (h >> 32) % BITMAP_BITS
+
+
+async def observe(tenant: str, file_id: str, stripper: Stripper) -> None:
+    """Count the document's band keys towards the tenant's corpus, once per file."""
+    if not stripper.corpus or not stripper.bands:
+        return
+    keys = {kind: _key(tenant, kind) for kind in ("docs", "bits", "files", "known")}
+    ttl_s = int(settings.BOILERPLATE_INDEX_TTL_DAYS * 86400)
+    file_key = hashlib.blake2b(file_id.encode(), digest_size=6).hexdigest()
+    r = resources.redis()
+    try:
+        if not await r.hsetnx(keys["docs"], file_key, 1):
+            return
+        bands = sorted(stripper.bands)
+        pipe = r.pipeline(transaction=False)
+        for b in bands:
+            for off in _bits(b):
+                pipe.setbit(keys["bits"], off, 1)
+        pipe.hlen(keys["files"])
+        *old, n_tracked = await pipe.execute()
+        repeated = [b for i, b in enumerate(bands) if old[2 * i] and old[2 * i + 1]]
+        pipe = r.pipeline(transaction=False)
+        for b in repeated:
+            pipe.hexists(keys["files"], b)
+        tracked = await pipe.execute() if repeated else []
+        room = max(0, settings.BOILERPLATE_INDEX_MAX_BANDS - n_tracked)
+        counted = []
+        for b, exists in zip(repeated, tracked):
+            if exists or room > 0:
+                counted.append(b)
+                room -= not exists
+        pipe = r.pipeline(transaction=False)
+        for b in counted:
+            pipe.hincrby(keys["files"], b, 1)
+        for k in keys.values():
+            pipe.expire(k, ttl_s)
+        counts = (await pipe.execute())[:len(counted)]
+        # the counter starts at the second file, so it holds files - 1
+        known = [b for b, n in zip(counted, counts) if n + 1 >= settings.BOILERPLATE_MIN_FILES]
+        if known:
+            await r.sadd(keys["known"], *known)
+    except RedisError as e:
+        logger.warning(f"Could not record boilerplate signatures for {file_id}: {e}")
@@ -0,0 +1,305 @@
+"""
+Bulk ingest: many documents (plain uploads or zip/tar archives) in one request.
+
+    sources -> per-file extract/chunk/diff (file_concurrency files at a time)
+            -> shared embed batches -> shared upsert batches -> per-file stale delete
+
+Files are processed like in ingest/pipeline.py (content-addressed chunk IDs,
+only new chunks embedded, stale ones deleted), but new chunks from all files
+go through one embed stage and one upsert stage, so a thousand small files
+make a few full-size embedding and upsert calls rather than a thousand small
+ones. A batch is sent once ``batch_size`` chunks are waiting or nothing new
+arrived for ``linger_ms``.
+
+A file that fails (unreadable, too large, or its chunks' batch failed) is
+reported with its error; the rest of the request carries on. A failed file
+keeps its previously stored chunks, since its stale chunks are not deleted.
+
+With ``files_per_token``, the tenant's ingest rate-limit bucket is charged one
+more token for every further ``files_per_token`` documents (the request itself
+paid for the first batch). Archive members are only known while streaming, so
+the charge is taken as they arrive; once the bucket runs dry no further files
+are started, and the response is marked ``rate_limited`` with the Retry-After.
+Re-sending the archive later only embeds what has not been stored yet.
+"""
+import asyncio
+import logging
+import tarfile
+import tempfile
+import zipfile
+import zlib
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from core.ratelimit import take
+from core.tracing import span
+from core.usage import Usage, record_usage
+from ingest.boilerplate import Stripper, load_stripper, observe
+from ingest.chunk import Chunk
+from ingest.dedupe import chunk_hash, chunk_id
+from ingest.pipeline import iter_chunk_batches, make_items
+from llm.embeddings import embed_chunks
+from vector.factory import DeleteFailed, delete_ids, list_ids, upsert_chunks
+
+logger = logging.getLogger(__name__)
+
+SUPPORTED = (".pdf", ".docx", ".html", ".htm", ".txt", ".md")
+ARCHIVES = (".zip", ".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tar.xz")
+SPOOL_BYTES = 8 << 20
+_DONE = object()
+
+Source = Tuple[str, Optional[BinaryIO], Optional[str]]  # (file_id, file or None, error)
+
+
+def is_archive(filename: str) -> bool:
+    return filename.lower().endswith(ARCHIVES)
+
+
+def _skip(name: str) -> bool:
+    base = name.rsplit("/", 1)[-1]
+    return not base or base.startswith(".") or name.startswith("__MACOSX/")
+
+
+def _spool(src: BinaryIO) -> BinaryIO:
+    out = tempfile.SpooledTemporaryFile(max_size=SPOOL_BYTES)
+    while block := src.read(1 << 20):
+        out.write(block)
+    out.seek(0)
+    return out
+
+
+def iter_archive(f: BinaryIO, filename: str, max_member_bytes: int) -> Iterator[Source]:
+    """Yield the documents of a zip or tar archive, one spooled member at a time.
+
+    Tar archives are read as a stream (members in order, nothing seeks back), so only
+    the current member is buffered.
+    """
+    if filename.lower().endswith(".zip"):
+        with zipfile.ZipFile(f) as z:
+            for info in z.infolist():
+                if info.is_dir() or _skip(info.filename):
+                    continue
+                yield _member(info.filename, info.file_size, max_member_bytes, lambda: z.open(info))
+        return
+    with tarfile.open(fileobj=f, mode="r|*") as t:
+        for m in t:
+            if not m.isfile() or _skip(m.name):
+                continue
+            yield _member(m.name, m.size, max_member_bytes, lambda: t.extractfile(m))
+
+
+def _member(name: str, size: int, max_bytes: int, open_fn) -> Source:
+    if not name.lower().endswith(SUPPORTED):
+        return name, None, "unsupported file type"
+    if size > max_bytes:
+        return name, None, f"larger than {max_bytes} bytes"
+    try:
+        with open_fn() as src:
+            return name, _spool(src), None
+    # encrypted (RuntimeError), unsupported compression (NotImplementedError), corrupt data
+    except (RuntimeError, NotImplementedError, zipfile.BadZipFile, tarfile.TarError, EOFError, OSError, zlib.error) as e:
+        return name, None, f"unreadable archive member: {e}"
+
+
+def iter_sources(uploads: Iterable[Tuple[str, BinaryIO]], max_member_bytes: int) -> Iterator[Source]:
+    """Expand uploads into documents: archives into their members, other files as they are."""
+    for name, f in uploads:
+        if not is_archive(name):
+            yield name, f, None
+            continue
+        try:
+            yield from iter_archive(f, name, max_member_bytes)
+        except (zipfile.BadZipFile, tarfile.TarError, EOFError) as e:
+            yield name, None, f"unreadable archive: {e}"
+
+
+@dataclass
+class FileResult:
+    file_id: str
+    chunks: int = 0
+    added: int = 0
+    unchanged: int = 0
+    removed: int = 0
+    boilerplate_tokens: int = 0
+    error: Optional[str] = None
+    # bookkeeping, not reported
+    stripper: Optional[Stripper] = field(default=None, repr=False)
+    existing: Set[str] = field(default_factory=set, repr=False)
+    seen: Set[str] = field(default_factory=set, repr=False)
+    pending: int = field(default=0, repr=False)
+    chunked: bool = field(default=False, repr=False)
+    stored: asyncio.Event = field(default_factory=asyncio.Event, repr=False)
+
+    def fail(self, error: str) -> None:
+        if self.error is None:
+            self.error = error
+
+    def settle(self, n: int) -> None:
+        self.pending -= n
+        if self.chunked and self.pending == 0:
+            self.stored.set()
+
+    def report(self) -> dict:
+        return {k: getattr(self, k) for k in ("file_id", "chunks", "added", "unchanged", "removed",
+                                               "boilerplate_tokens", "error")}
+
+
+Piece = Tuple[FileResult, Chunk, str]  # (file, chunk, hash)
+
+
+async def run_bulk_ingest(sources: Iterator[Source], tenant: str, batch_size: int = 256,
+                          file_concurrency: int = 8, queue_depth: int = 4, linger_ms: float = 50,
+                          embed_concurrency: int = 4, files_per_token: int = 0) -> dict:
+    """Ingest every document from ``sources``; returns per-file results and totals.
+
+    Up to ``embed_concurrency`` shared batches are being embedded at once.
+    """
+    to_embed: asyncio.Queue = asyncio.Queue(maxsize=queue_depth * file_concurrency)
+    to_upsert: asyncio.Queue = asyncio.Queue(maxsize=queue_depth)
+    slots = asyncio.Semaphore(max(1, file_concurrency))
+    results: List[FileResult] = []
+    usage = Usage(requests=1)
+    retry_after_s: Optional[float] = None
+
+    async def process(res: FileResult, f: BinaryIO) -> None:
+        try:
+            with span("ingest.list_ids"):
+                res.existing = await list_ids(tenant, res.file_id)
+            with span("ingest.boilerplate"):
+                res.stripper = await load_stripper(tenant, res.file_id)
+            it = iter_chunk_batches(f, res.file_id, batch_size, res.stripper)
+            while True:
+                with span("ingest.chunk"):
+                    batch = await asyncio.to_thread(next, it, _DONE)
+                if batch is _DONE:
+                    break
+                res.chunks += len(batch)
+                pieces: List[Piece] = []
+                for ch in batch:
+                    h = chunk_hash(ch.text)
+                    cid = chunk_id(tenant, res.file_id, h)
+                    if cid in res.seen:
+                        continue
+                    res.seen.add(cid)
+                    if cid in res.existing:
+                        res.unchanged += 1
+                    else:
+                        pieces.append((res, ch, h))
+                if pieces:
+                    res.pending += len(pieces)
+                    await to_embed.put(pieces)
+        except Exception as e:
+            logger.warning(f"Bulk ingest of {res.file_id} failed: {e}")
+            res.fail(f"{type(e).__name__}: {e}")
+        finally:
+            f.close()
+            res.chunked = True
+            res.settle(0)
+            # the slot bounds extraction; waiting for the shared batches must not hold it,
+            # or batches could never fill beyond file_concurrency files' worth of chunks
+            slots.release()
+        await res.stored.wait()
+        if res.error is None:
+            stale = list(res.existing - res.seen)
+            try:
+                with span("ingest.delete"):
+                    await delete_ids(tenant, stale)
+                res.removed = len(stale)
+            except DeleteFailed as e:
+                # the new chunks are stored; leftovers are retried on the next re-ingest
+                logger.warning(f"Stale chunks of {res.file_id} kept: {e}")
+                res.removed = len(stale) - len(e.failed)
+            except Exception as e:
+                res.fail(f"{type(e).__name__}: {e}")
+        if res.error is None:
+            await observe(tenant, res.file_id, res.stripper)
+            res.boilerplate_tokens = res.stripper.tokens_removed
+            usage.boilerplate_tokens += res.boilerplate_tokens
+        res.added = len(res.seen) - res.unchanged if res.error is None else 0
+
+    async def feed() -> None:
+        nonlocal retry_after_s
+        async with asyncio.TaskGroup() as tg:
+            while (src := await asyncio.to_thread(next, sources, _DONE)) is not _DONE:
+                name, f, error = src
+                if files_per_token > 0 and results and len(results) % files_per_token == 0:
+                    d = await take(tenant, "ingest")
+                    if not d.allowed:
+                        retry_after_s = d.retry_after_s
+                        if f is not None:
+                            f.close()
+                        if hasattr(sources, "close"):
+                            sources.close()  # releases the archive being read
+                        break
+                res = FileResult(name)
+                results.append(res)
+                if f is None:
+                    res.fail(error or "unreadable")
+                    continue
+                await slots.acquire()
+                tg.create_task(process(res, f))
+        await to_embed.put(_DONE)
+
+    async def embed() -> None:
+        buf: List[Piece] = []
+        done = False
+        inflight = asyncio.Semaphore(max(1, embed_concurrency))
+        async with asyncio.TaskGroup() as tg:
+            while not done:
+                try:
+                    got = await (asyncio.wait_for(to_embed.get(), linger_ms / 1000) if buf else to_embed.get())
+                except TimeoutError:
+                    got = None  # nothing new for linger_ms: send what is waiting
+                if got is _DONE:
+                    done = True
+                elif got is not None:
+                    buf.extend(got)
+                while len(buf) >= batch_size or (buf and (got is None or done)):
+                    batch, buf = buf[:batch_size], buf[batch_size:]
+                    await inflight.acquire()
+                    tg.create_task(_embed_batch(batch)).add_done_callback(lambda _: inflight.release())
+        await to_upsert.put(_DONE)
+
+    async def _embed_batch(batch: List[Piece]) -> None:
+        def on_cached(mask: List[bool]) -> None:
+            for (_, ch, _), cached in zip(batch, mask):
+                usage.add_embed(ch.n_tokens, cached)
+        try:
+            with span("ingest.embed"):
+                vecs = await embed_chunks([ch.text for _, ch, _ in batch], on_cached)
+        except Exception as e:
+            _settle(batch, f"embedding failed: {type(e).__name__}: {e}")
+            return
+        items = [make_items([ch], [h], [v], tenant, res.file_id)[0] for (res, ch, h), v in zip(batch, vecs)]
+        await to_upsert.put((batch, items))
+
+    async def upsert() -> None:
+        while (job := await to_upsert.get()) is not _DONE:
+            batch, items = job
+            try:
+                with span("ingest.upsert"):
+                    await upsert_chunks(items)
+            except Exception as e:
+                _settle(batch, f"upsert failed: {type(e).__name__}: {e}")
+                continue
+            _settle(batch, None)
+
+    def _settle(batch: List[Piece], error: Optional[str]) -> None:
+        files: Dict[int, FileResult] = {id(res): res for res, _, _ in batch}
+        for key, n in Counter(id(res) for res, _, _ in batch).items():
+            if error is not None:
+                files[key].fail(error)
+            files[key].settle(n)
+
+    async with asyncio.TaskGroup() as tg:
+        tg.create_task(feed())
+        tg.create_task(embed())
+        tg.create_task(upsert())
+    await record_usage(tenant, usage)
+    files = [r.report() for r in results]
+    totals = {k: sum(r[k] for r in files) for k in ("chunks", "added", "unchanged", "removed",
+                                                         "boilerplate_tokens")}
+    totals.update(files=len(files), failed=sum(1 for r in files if r["error"]), rate_limited=retry_after_s is not None)
+    if retry_after_s is not None:
+        totals["retry_after_s"] = retry_after_s
+    return {"files": files, "totals": totals}
@@ -1,17 +1,188 @@
-from typing import List
+from dataclasses import dataclass
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple
+import numpy as np
 import tiktoken
 
-_enc = tiktoken.get_encoding("cl100k_base")
+_enc: Optional[tiktoken.Encoding] = None
+
+def _encoding() -> tiktoken.Encoding:
+    """The cl100k_base tokenizer, loaded on first use (or by prewarm()) rather than at import."""
+    global _enc
+    if _enc is None:
+        _enc = tiktoken.get_encoding("cl100k_base")
+    return _enc
+
+PAGE_SEP = " "
+
+@dataclass
+class Chunk:
+    text: str
+    page_start: Optional[int]
+    page_end: Optional[int]
+    char_start: int
+    char_end: int
+    n_tokens: int
 
 def count_tokens(text: str) -> int:
-    return len(_enc.encode(text))
+    return len(_encoding().encode(text))
+
+def truncate_tokens(text: str, max_tokens: int) -> str:
+    """The longest prefix of ``text`` (on token boundaries) that is at most ``max_tokens`` tokens."""
+    enc = _encoding()
+    ids = enc.encode(text)
+    if len(ids) <= max_tokens:
+        return text
+    n = max_tokens
+    while n > 0:
+        out = enc.decode(ids[:n]).rstrip("\ufffd")
+        if len(enc.encode(out)) <= max_tokens:
+            return out
+        n -= 1
+    return ""
+
+_tok_lens: Optional[np.ndarray] = None
+
+def _token_lens() -> np.ndarray:
+    """Byte length of every token id, built once so token byte offsets are a vectorized cumsum."""
+    global _tok_lens
+    if _tok_lens is None:
+        enc = _encoding()
+        lens = np.zeros(enc.n_vocab, dtype=np.int64)
+        for t in range(enc.n_vocab):
+            try:
+                lens[t] = len(enc.decode_single_token_bytes(t))
+            except KeyError:
+                pass
+        _tok_lens = lens
+    return _tok_lens
+
+_UTF8_CONT = bytes(range(0x80, 0xC0))
+
+def _page(p: np.int64) -> Optional[int]:
+    return None if p < 0 else int(p)
+
+class Chunker:
+    """Single-pass sliding-window chunker over a stream of pages.
+
+    The byte form of each page is kept in one buffer and token boundaries are
+    located from a token-length table, so overlapping windows are sliced
+    rather than BPE-decoded again. Character offsets refer to the document
+    text with pages joined by ``PAGE_SEP``; a character split by a window edge
+    is left out of that window's text.
+    """
+
+    def __init__(self, max_tokens: int = 900, overlap: int = 150):
+        self.max_tokens = max_tokens
+        self.step = max_tokens - overlap
+        self._buf = bytearray()
+        self._buf_off = 0                        # absolute byte offset of _buf[0]
+        self._start = 0                          # absolute byte offset of the current window
+        self._ends = np.empty(0, dtype=np.int64)   # absolute byte end of each buffered token
+        self._pages = np.empty(0, dtype=np.int64)  # page of each buffered token (-1 = none)
+        self._i = 0                              # index of the window's first token in _ends/_pages
+        self._char_base = 0                      # char offset of the current window
+        self._started = False
+
+    def feed(self, text: str, page: Optional[int] = None) -> List[Chunk]:
+        if not text:
+            return []
+        s = (PAGE_SEP if self._started else "") + text
+        return self.feed_tokens(_encoding().encode_ordinary(s), page, s.encode("utf-8"))
+
+    def feed_tokens(self, tokens: Sequence[int], page: Optional[int] = None, data: Optional[bytes] = None) -> List[Chunk]:
+        if not len(tokens):
+            return []
+        self._started = True
+        base = self._buf_off + len(self._buf)
+        self._buf += data if data is not None else _encoding().decode_bytes(tokens)
+        ends = np.cumsum(_token_lens()[np.fromiter(tokens, dtype=np.int64, count=len(tokens))])
+        ends += base
+        self._ends = np.concatenate((self._ends, ends))
+        self._pages = np.concatenate((self._pages, np.full(len(tokens), -1 if page is None else page, dtype=np.int64)))
+        out = []
+        # emit only when more tokens follow, so the last window is never a subset of the previous one
+        while len(self._ends) - self._i > self.max_tokens:
+            out.append(self._window())
+            self._advance()
+        self._compact()
+        return out
+
+    def finish(self) -> List[Chunk]:
+        out = []
+        while len(self._ends) > self._i:
+            out.append(self._window())
+            if len(self._ends) - self._i <= self.max_tokens:
+                break
+            self._advance()
+        self._buf.clear()
+        self._buf_off = self._start = self._i = 0
+        self._ends = self._ends[:0]
+        self._pages = self._pages[:0]
+        return out
+
+    def _window(self) -> Chunk:
+        n = min(self.max_tokens, len(self._ends) - self._i)
+        lo = self._start - self._buf_off
+        text = self._buf[lo:int(self._ends[self._i+n-1]) - self._buf_off].decode("utf-8", errors="ignore")
+        return Chunk(
+            text=text,
+            page_start=_page(self._pages[self._i]),
+            page_end=_page(self._pages[self._i+n-1]),
+            char_start=self._char_base,
+            char_end=self._char_base + len(text),
+            n_tokens=n,
+        )
+
+    def _advance(self) -> None:
+        cut = int(self._ends[self._i+self.step-1])
+        # count UTF-8 lead bytes instead of decoding to find the next window's char offset
+        seg = self._buf[self._start - self._buf_off:cut - self._buf_off]
+        self._char_base += len(seg.translate(None, _UTF8_CONT))
+        self._start = cut
+        self._i += self.step
+
+    def _compact(self) -> None:
+        self._ends = self._ends[self._i:]
+        self._pages = self._pages[self._i:]
+        self._i = 0
+        del self._buf[:self._start - self._buf_off]
+        self._buf_off = self._start
+
+def iter_page_chunks(pages: Iterable[Tuple[Optional[int], str]], max_tokens: int = 900, overlap: int = 150) -> Iterator[Chunk]:
+    """Streaming chunking of ``(page_no, text)`` pairs; memory is bounded by one window."""
+    ck = Chunker(max_tokens, overlap)
+    for page, text in pages:
+        yield from ck.feed(text, page)
+    yield from ck.finish()
+
+def prewarm() -> None:
+    """Load the tokenizer and the token byte-length table ahead of the first request."""
+    _token_lens()
+
+def chunk_pages(pages: List[str], max_tokens: int = 900, overlap: int = 150) -> List[Chunk]:
+    return list(iter_page_chunks(enumerate(pages, 1), max_tokens, overlap))
+
+def chunk_documents(docs: List[List[str]], max_tokens: int = 900, overlap: int = 150, num_threads: int = 8) -> List[List[Chunk]]:
+    """Batch mode: chunk many paged documents, tokenizing all pages in one ``encode_ordinary_batch`` call."""
+    flat = [(page, (PAGE_SEP if n else "") + p) for d in docs for n, (page, p) in enumerate((i, q) for i, q in enumerate(d, 1) if q)]
+    toks = _encoding().encode_ordinary_batch([s for _, s in flat], num_threads=num_threads)
+    out: List[List[Chunk]] = []
+    k = 0
+    for d in docs:
+        ck = Chunker(max_tokens, overlap)
+        chunks: List[Chunk] = []
+        for _ in range(sum(1 for p in d if p)):
+            page, s = flat[k]
+            chunks.extend(ck.feed_tokens(toks[k], page, s.encode("utf-8")))
+            k += 1
+        chunks.extend(ck.finish())
+        out.append(chunks)
+    return out
 
 def chunk_text(text: str, max_tokens: int = 900, overlap: int = 150) -> List[str]:
-    tokens = _enc.encode(text)
-    chunks, i = [], 0
-    step = max_tokens - overlap
-    while i < len(tokens):
-        chunk = tokens[i:i+max_tokens]
-        chunks.append(_enc.decode(chunk))
-        i += step
-    return chunks
+    return [c.text for c in chunk_pages([text], max_tokens, overlap)]
+
+def iter_chunks(pieces: Iterable[str], max_tokens: int = 900, overlap: int = 150) -> Iterator[str]:
+    """Streaming ``chunk_text`` over consecutive text pieces (e.g. pages)."""
+    for c in iter_page_chunks(((None, p) for p in pieces), max_tokens, overlap):
+        yield c.text
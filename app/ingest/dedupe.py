@@ -1,4 +1,11 @@
-import hashlib
+import hashlib, uuid
+
+# fixed namespace so chunk IDs are stable across processes and deployments
+CHUNK_NAMESPACE = uuid.UUID("6f1c1a52-3f0e-4f7e-9a53-2b1d7c4e8a10")
 
 def chunk_hash(s: str) -> str:
     return hashlib.sha256(s.encode("utf-8")).hexdigest()
+
+def chunk_id(tenant_id: str, file_id: str, h: str) -> str:
+    """Content-addressed chunk ID: the same text in the same tenant/file always maps to the same ID."""
+    return str(uuid.uuid5(CHUNK_NAMESPACE, f"{tenant_id}\x1f{file_id}\x1f{h}"))
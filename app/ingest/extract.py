@@ -1,16 +1,147 @@
-import io, pdfplumber
-from bs4 import BeautifulSoup
-import docx
+import codecs, io, logging, multiprocessing, shutil, signal, tempfile, threading, time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import BinaryIO, Iterator, List, Tuple
+from core.config import settings
 
-def extract_text(data: bytes, filename: str) -> str:
+# format libraries (pdfplumber, bs4/lxml, python-docx) are imported on first use; see prewarm()
+
+logger = logging.getLogger(__name__)
+
+TEXT_BLOCK_BYTES = 1 << 20
+DOCX_PARAGRAPHS_PER_PAGE = 50
+
+_executor: ProcessPoolExecutor | None = None
+_executor_lock = threading.Lock()
+
+class _PageTimeout(Exception):
+    pass
+
+def _on_alarm(signum, frame):
+    raise _PageTimeout()
+
+def _extract_range(path: str, start: int, end: int, timeout_s: float) -> List[Tuple[int, str, float]]:
+    """Worker: extract pages ``[start, end)``; returns (page_no, text, ms) with "" for skipped pages."""
+    use_alarm = timeout_s > 0 and hasattr(signal, "setitimer")
+    if use_alarm:
+        signal.signal(signal.SIGALRM, _on_alarm)
+    import pdfplumber
+    out = []
+    with pdfplumber.open(path, pages=list(range(start + 1, end + 1))) as pdf:
+        for n, p in zip(range(start, end), pdf.pages):
+            t0 = time.perf_counter()
+            try:
+                if use_alarm:
+                    signal.setitimer(signal.ITIMER_REAL, timeout_s)
+                txt = p.extract_text() or ""
+            except _PageTimeout:
+                txt = None
+            finally:
+                if use_alarm:
+                    signal.setitimer(signal.ITIMER_REAL, 0)
+            out.append((n, txt, (time.perf_counter() - t0) * 1000))
+            p.close()
+    return out
+
+def _pool() -> ProcessPoolExecutor:
+    global _executor
+    # uploads extract in worker threads, so two first requests can race to create the pool
+    with _executor_lock:
+        if _executor is None:
+            # spawn: workers must not inherit the server's event loop and threads
+            _executor = ProcessPoolExecutor(max_workers=settings.EXTRACT_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _executor
+
+def shutdown_pool() -> None:
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(cancel_futures=True)
+            _executor = None
+
+def _iter_pdf_pages_parallel(f: BinaryIO, n_pages: int) -> Iterator[str]:
+    per_task = max(1, settings.EXTRACT_PAGES_PER_TASK)
+    ahead = 2 * settings.EXTRACT_WORKERS
+    with tempfile.NamedTemporaryFile(suffix=".pdf") as tmp:
+        f.seek(0)
+        shutil.copyfileobj(f, tmp)
+        tmp.flush()
+        ranges = iter((s, min(s + per_task, n_pages)) for s in range(0, n_pages, per_task))
+        pending: deque[Future] = deque()
+        pool = _pool()
+
+        def submit_next() -> None:
+            r = next(ranges, None)
+            if r is not None:
+                pending.append(pool.submit(_extract_range, tmp.name, r[0], r[1], settings.EXTRACT_PAGE_TIMEOUT_S))
+
+        for _ in range(ahead):
+            submit_next()
+        # keep a bounded window of ranges in flight; yield strictly in page order
+        while pending:
+            results = pending.popleft().result()
+            submit_next()
+            for n, txt, ms in results:
+                if txt is None:
+                    logger.warning(f"Skipped PDF page {n + 1}: extraction exceeded {settings.EXTRACT_PAGE_TIMEOUT_S}s")
+                    txt = ""
+                elif ms > 1000:
+                    logger.info(f"Slow PDF page {n + 1}: {ms:.0f} ms")
+                yield txt
+
+def prewarm() -> None:
+    """Import the format libraries ahead of the first upload."""
+    import docx, lxml.etree, pdfplumber  # noqa: F401
+    from bs4 import BeautifulSoup  # noqa: F401
+
+def is_paged(filename: str) -> bool:
+    """True when iter_pages() yields real pages (PDF) rather than arbitrary text blocks."""
+    return filename.lower().endswith(".pdf")
+
+def iter_pages(f: BinaryIO, filename: str) -> Iterator[str]:
+    """Yield the document text page by page (or block by block for formats without pages).
+
+    Only one page is held at a time; PDF page caches are released as soon as the text is out.
+    """
     fn = filename.lower()
+    f.seek(0)
     if fn.endswith(".pdf"):
-        with pdfplumber.open(io.BytesIO(data)) as pdf:
-            return "\n".join((p.extract_text() or "") for p in pdf.pages)
+        import pdfplumber
+        with pdfplumber.open(f) as pdf:
+            n_pages = len(pdf.pages)
+            if settings.EXTRACT_WORKERS <= 0 or n_pages <= settings.EXTRACT_PAGES_PER_TASK:
+                for p in pdf.pages:
+                    yield p.extract_text() or ""
+                    p.close()
+                return
+        yield from _iter_pdf_pages_parallel(f, n_pages)
+        return
     if fn.endswith(".docx"):
-        d = docx.Document(io.BytesIO(data))
-        return "\n".join(p.text for p in d.paragraphs)
+        import docx
+        d = docx.Document(f)
+        paras = [p.text for p in d.paragraphs]
+        for i in range(0, len(paras), DOCX_PARAGRAPHS_PER_PAGE):
+            yield "\n".join(paras[i:i+DOCX_PARAGRAPHS_PER_PAGE])
+        return
     if fn.endswith(".html") or fn.endswith(".htm"):
-        soup = BeautifulSoup(data, "lxml")
-        return soup.get_text(" ")
-    return data.decode("utf-8", errors="ignore")
+        from bs4 import BeautifulSoup
+        soup = BeautifulSoup(f.read(), "lxml")
+        yield soup.get_text(" ")
+        return
+    # split plain text on whitespace so no word straddles two blocks
+    dec = codecs.getincrementaldecoder("utf-8")(errors="ignore")
+    carry = ""
+    while block := f.read(TEXT_BLOCK_BYTES):
+        txt = carry + dec.decode(block)
+        cut = max(txt.rfind(" "), txt.rfind("\n"))
+        if cut < 0:
+            carry = txt
+            continue
+        carry = txt[cut+1:]
+        yield txt[:cut+1]
+    carry += dec.decode(b"", final=True)
+    if carry:
+        yield carry
+
+def extract_text(data: bytes, filename: str) -> str:
+    return "\n".join(iter_pages(io.BytesIO(data), filename))
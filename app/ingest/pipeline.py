@@ -0,0 +1,147 @@
+"""
+Staged, bounded-memory ingest pipeline.
+
+    spooled upload -> pages -> normalize -> chunk -> diff -> embed batch -> upsert batch
+
+Chunk IDs are content-addressed (tenant, file, chunk hash), so re-ingesting a
+file only embeds and stores chunks that are new; chunks the new version no
+longer contains are deleted once the stream is done.
+
+Extraction and chunking run in a worker thread; embedding and upserting run on
+the event loop. Stages are connected by bounded queues, so a slow downstream
+stage pauses extraction instead of letting chunks pile up, and embedding/upsert
+of early pages overlaps with extraction of later ones. Peak memory is roughly
+``queue_depth * batch_size`` chunks regardless of file size.
+"""
+import asyncio
+import logging
+from typing import BinaryIO, Iterator, List, Optional
+from ingest.boilerplate import Stripper, load_stripper, observe
+from ingest.extract import iter_pages, is_paged
+from ingest.normalize import normalize
+from ingest.chunk import Chunk, iter_page_chunks
+from ingest.dedupe import chunk_hash, chunk_id
+from core.tracing import span
+from core.usage import Usage, record_usage
+from llm.embeddings import embed_chunks
+from vector.factory import DeleteFailed, upsert_chunks, list_ids, delete_ids
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+
+
+def iter_chunk_batches(f: BinaryIO, filename: str, batch_size: int,
+                       stripper: Optional[Stripper] = None) -> Iterator[List[Chunk]]:
+    paged = is_paged(filename)
+    raw = iter_pages(f, filename)
+    if stripper is not None:
+        raw = stripper.pages(raw)
+    pages = ((n if paged else None, normalize(p)) for n, p in enumerate(raw, 1))
+    batch: List[Chunk] = []
+    for ch in iter_page_chunks(pages):
+        batch.append(ch)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def make_items(chunks: List[Chunk], hashes: List[str], vecs: List[List[float]], tenant: str, file_id: str) -> List[dict]:
+    return [{
+        "id": chunk_id(tenant, file_id, h),
+        "tenant_id": tenant,
+        "file_id": file_id,
+        "page": ch.page_start,
+        "page_end": ch.page_end,
+        "char_start": ch.char_start,
+        "char_end": ch.char_end,
+        "section": None,
+        "text": ch.text,
+        "vector": v,
+        "source": file_id,
+        "hash": h,
+    } for ch, h, v in zip(chunks, hashes, vecs)]
+
+
+async def run_ingest(f: BinaryIO, filename: str, tenant: str, batch_size: int = 64, queue_depth: int = 2) -> dict:
+    """Stream ``f`` through the pipeline; returns total/added/unchanged/removed chunk counts
+    and the tokens stripped as boilerplate."""
+    to_embed: asyncio.Queue = asyncio.Queue(maxsize=queue_depth)
+    to_upsert: asyncio.Queue = asyncio.Queue(maxsize=queue_depth)
+    usage = Usage(requests=1)
+    with span("ingest.list_ids"):
+        existing = await list_ids(tenant, filename)
+    with span("ingest.boilerplate"):
+        stripper = await load_stripper(tenant, filename)
+    seen: set[str] = set()
+    total = unchanged = 0
+
+    async def produce():
+        it = iter_chunk_batches(f, filename, batch_size, stripper)
+        while True:
+            with span("ingest.chunk"):
+                batch = await asyncio.to_thread(next, it, _DONE)
+            if batch is _DONE:
+                break
+            await to_embed.put(batch)
+        await to_embed.put(_DONE)
+
+    async def embed():
+        nonlocal total, unchanged
+        while (batch := await to_embed.get()) is not _DONE:
+            total += len(batch)
+            new_chunks, new_hashes = [], []
+            for ch in batch:
+                h = chunk_hash(ch.text)
+                cid = chunk_id(tenant, filename, h)
+                if cid in seen:
+                    continue
+                seen.add(cid)
+                if cid in existing:
+                    unchanged += 1
+                else:
+                    new_chunks.append(ch)
+                    new_hashes.append(h)
+            if new_chunks:
+                def on_cached(mask: List[bool]) -> None:
+                    for ch, cached in zip(new_chunks, mask):
+                        usage.add_embed(ch.n_tokens, cached)
+                with span("ingest.embed"):
+                    vecs = await embed_chunks([c.text for c in new_chunks], on_cached)
+                await to_upsert.put(make_items(new_chunks, new_hashes, vecs, tenant, filename))
+        await to_upsert.put(_DONE)
+
+    async def upsert():
+        while (items := await to_upsert.get()) is not _DONE:
+            with span("ingest.upsert"):
+                await upsert_chunks(items)
+
+    try:
+        async with asyncio.TaskGroup() as tg:
+            tg.create_task(produce())
+            tg.create_task(embed())
+            tg.create_task(upsert())
+    except ExceptionGroup as eg:
+        # surface the first stage failure as-is to the caller
+        raise eg.exceptions[0]
+    stale = list(existing - seen)
+    removed = len(stale)
+    with span("ingest.delete"):
+        try:
+            await delete_ids(tenant, stale)
+        except DeleteFailed as e:
+            # the new chunks are stored; leftovers are retried on the next re-ingest
+            logger.warning(f"Stale chunks of {filename} kept: {e}")
+            removed -= len(e.failed)
+    await observe(tenant, filename, stripper)
+    usage.boilerplate_tokens = stripper.tokens_removed
+    await record_usage(tenant, usage)
+    return {
+        "chunks": total,
+        "added": len(seen) - unchanged,
+        "unchanged": unchanged,
+        "removed": removed,
+        "boilerplate_tokens": stripper.tokens_removed,
+    }
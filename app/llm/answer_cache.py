@@ -0,0 +1,132 @@
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from redis.exceptions import RedisError
+from core.config import settings
+from core.resources import resources
+
+logger = logging.getLogger(__name__)
+
+Scope = Tuple[str, int, str]  # (tenant, k, retrieval variant)
+
+
+@dataclass
+class CachedAnswer:
+    answer: str
+    sources: List[dict]
+    cost: dict
+    vec: np.ndarray
+    generation: int
+    created: float
+
+
+def _unit(vec: List[float]) -> np.ndarray:
+    v = np.asarray(vec, dtype=np.float32)
+    n = float(np.linalg.norm(v))
+    return v / n if n else v
+
+
+class SemanticAnswerCache:
+    """In-process answer cache matched by cosine similarity of question embeddings.
+
+    Entries are scoped per (tenant, k, retrieval variant) and stamped with the tenant's generation;
+    an entry from an older generation is never returned. Eviction is LRU by
+    ``max_entries`` across all tenants plus a per-entry TTL.
+    """
+
+    def __init__(self, threshold: float = 0.95, max_entries: int = 5000, ttl_s: float = 3600):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self._lru: "OrderedDict[int, Scope]" = OrderedDict()
+        self._scopes: Dict[Scope, Dict[int, CachedAnswer]] = {}
+        self._mats: Dict[Scope, Tuple[List[int], np.ndarray]] = {}
+        self._next_id = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _drop(self, scope: Scope, eid: int) -> None:
+        self._scopes[scope].pop(eid, None)
+        self._lru.pop(eid, None)
+        self._mats.pop(scope, None)
+        if not self._scopes[scope]:
+            del self._scopes[scope]
+
+    def _matrix(self, scope: Scope) -> Tuple[List[int], np.ndarray]:
+        if scope not in self._mats:
+            entries = self._scopes[scope]
+            ids = list(entries)
+            self._mats[scope] = (ids, np.stack([entries[i].vec for i in ids]))
+        return self._mats[scope]
+
+    def get(self, tenant: str, k: int, vec: List[float], generation: int, variant: str = "") -> Optional[CachedAnswer]:
+        scope = (tenant, k, variant)
+        now = time.time()
+        for eid, e in list(self._scopes.get(scope, {}).items()):
+            if e.generation != generation or now - e.created > self.ttl_s:
+                self._drop(scope, eid)
+        if scope not in self._scopes:
+            self.misses += 1
+            return None
+        ids, mat = self._matrix(scope)
+        sims = mat @ _unit(vec)
+        best = int(np.argmax(sims))
+        if sims[best] < self.threshold:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._lru.move_to_end(ids[best])
+        return self._scopes[scope][ids[best]]
+
+    def put(self, tenant: str, k: int, vec: List[float], generation: int, answer: str, sources: List[dict], cost: dict,
+            variant: str = "") -> None:
+        scope = (tenant, k, variant)
+        eid = self._next_id
+        self._next_id += 1
+        self._scopes.setdefault(scope, {})[eid] = CachedAnswer(answer, sources, cost, _unit(vec), generation, time.time())
+        self._mats.pop(scope, None)
+        self._lru[eid] = scope
+        while len(self._lru) > self.max_entries:
+            old, old_scope = next(iter(self._lru.items()))
+            self._drop(old_scope, old)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._lru),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+def _gen_key(tenant: str) -> str:
+    return f"gen:{tenant}"
+
+
+async def tenant_generation(tenant: str) -> Optional[int]:
+    """The tenant's current generation, or None if Redis is unavailable (the cache is then bypassed)."""
+    try:
+        raw = await resources.redis().get(_gen_key(tenant))
+    except RedisError as e:
+        logger.warning(f"Answer cache generation unavailable, bypassing the cache: {e}")
+        return None
+    return int(raw) if raw else 0
+
+
+async def bump_generation(tenant: str) -> int:
+    """Invalidate every cached answer of ``tenant`` (in all workers)."""
+    return await resources.redis().incr(_gen_key(tenant))
+
+
+_cache: SemanticAnswerCache | None = None
+
+
+def answer_cache() -> SemanticAnswerCache:
+    global _cache
+    if _cache is None:
+        _cache = SemanticAnswerCache(settings.ANSWER_CACHE_THRESHOLD, settings.ANSWER_CACHE_MAX_ENTRIES, settings.ANSWER_CACHE_TTL_S)
+    return _cache
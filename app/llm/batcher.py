@@ -0,0 +1,89 @@
+import asyncio
+from collections import Counter
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+OnCached = Optional[Callable[[bool], None]]
+
+
+class QueryEmbedBatcher:
+    """Coalesce concurrent single-text embedding requests into one upstream call.
+
+    Requests arriving within ``window_ms`` of the first pending one (or until
+    ``max_batch`` are queued) are sent together and each caller gets its own vector.
+    A caller's ``on_cached`` hook learns whether its text cost an upstream call
+    (a duplicate of another caller's text in the same batch counts as cached).
+    """
+
+    def __init__(self, embed_fn: Callable[[List[str]], Awaitable[List[List[float]]]], window_ms: float = 5, max_batch: int = 32):
+        self.embed_fn = embed_fn
+        self.window_s = window_ms / 1000
+        self.max_batch = max(1, max_batch)
+        self._pending: List[Tuple[str, asyncio.Future, OnCached]] = []
+        self._timer: asyncio.TimerHandle | None = None
+        self._tasks: set[asyncio.Task] = set()
+        self.batches = 0
+        self.items = 0
+        self.sizes: Counter = Counter()
+
+    async def embed(self, text: str, on_cached: OnCached = None) -> List[float]:
+        if self.window_s <= 0:
+            self._record(1)
+            if on_cached is None:
+                return (await self.embed_fn([text]))[0]
+            return (await self.embed_fn([text], on_cached=lambda mask: on_cached(mask[0])))[0]
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        self._pending.append((text, fut, on_cached))
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window_s, self._flush)
+        return await fut
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        t = asyncio.get_running_loop().create_task(self._run(batch))
+        self._tasks.add(t)
+        t.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: List[Tuple[str, asyncio.Future, OnCached]]) -> None:
+        texts = list(dict.fromkeys(t for t, _, _ in batch))
+        self._record(len(texts))
+        hooks = [(t, cb) for t, _, cb in batch if cb is not None]
+
+        def on_cached(mask: List[bool]) -> None:
+            first = dict(zip(texts, mask))
+            for t, cb in hooks:
+                cb(first.pop(t, True))
+
+        try:
+            if hooks:
+                vecs = dict(zip(texts, await self.embed_fn(texts, on_cached=on_cached)))
+            else:
+                vecs = dict(zip(texts, await self.embed_fn(texts)))
+        except Exception as e:
+            for _, fut, _ in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+        for t, fut, _ in batch:
+            if not fut.done():
+                fut.set_result(vecs[t])
+
+    def _record(self, n: int) -> None:
+        self.batches += 1
+        self.items += n
+        self.sizes[n] += 1
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+            "batch_sizes": dict(sorted(self.sizes.items())),
+        }
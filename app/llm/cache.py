@@ -0,0 +1,83 @@
+import hashlib
+from typing import Dict, List, Optional
+import numpy as np
+import redis.asyncio as aioredis
+from core.config import settings
+from core.resources import resources
+
+KEY_VERSION = "v2"
+_DTYPES = {"float32": np.float32, "float16": np.float16}
+
+
+def pack(vec: List[float], dtype: str = "float32") -> bytes:
+    return np.asarray(vec, dtype=_DTYPES[dtype]).tobytes()
+
+
+def unpack(raw: bytes, dtype: str = "float32") -> List[float]:
+    return np.frombuffer(raw, dtype=_DTYPES[dtype]).astype(np.float32).tolist()
+
+
+class EmbeddingCache:
+    """Redis-backed embedding cache: one MGET per lookup, one pipeline per write.
+
+    Keys are ``emb:<version>:<model>:<dtype>:<sha256(text)>`` so switching the
+    deployment, its output dimension or the storage precision never returns
+    vectors from another space.
+    """
+
+    def __init__(self, r: aioredis.Redis, model: str, dtype: str = "float32", ttl_s: int = 60*60*24*7):
+        if dtype not in _DTYPES:
+            raise ValueError(f"unsupported EMBED_CACHE_DTYPE: {dtype}")
+        self.r = r
+        self.model = model
+        self.dtype = dtype
+        self.ttl_s = ttl_s
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, text: str) -> str:
+        h = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        return f"emb:{KEY_VERSION}:{self.model}:{self.dtype}:{h}"
+
+    async def get_many(self, texts: List[str]) -> List[Optional[List[float]]]:
+        if not texts:
+            return []
+        raws = await self.r.mget([self.key(t) for t in texts])
+        out = [unpack(raw, self.dtype) if raw else None for raw in raws]
+        found = sum(1 for v in out if v is not None)
+        self.hits += found
+        self.misses += len(out) - found
+        return out
+
+    async def set_many(self, items: Dict[str, List[float]]) -> None:
+        if not items:
+            return
+        pipe = self.r.pipeline(transaction=False)
+        for text, vec in items.items():
+            pipe.setex(self.key(text), self.ttl_s, pack(vec, self.dtype))
+        await pipe.execute()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+_cache: EmbeddingCache | None = None
+
+
+def embedding_cache() -> EmbeddingCache:
+    global _cache
+    if _cache is None:
+        _cache = EmbeddingCache(
+            resources.redis(),
+            f"{settings.AZURE_OPENAI_DEPLOYMENT_EMBED}@{settings.EMBED_DIM}",
+            settings.EMBED_CACHE_DTYPE,
+            settings.EMBED_CACHE_TTL_S,
+        )
+    # follow the registry if the pool was reopened after a shutdown
+    _cache.r = resources.redis()
+    return _cache
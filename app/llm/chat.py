@@ -1,22 +1,33 @@
-from typing import List
-from openai import AsyncAzureOpenAI
+from typing import TYPE_CHECKING, AsyncIterator, List, Tuple
 from core.config import settings
+from core.resources import resources
 from core.costs import estimate_cost
+from ingest.chunk import count_tokens
+if TYPE_CHECKING:
+    from openai import AsyncAzureOpenAI
 
-async def _client() -> AsyncAzureOpenAI:
-    return AsyncAzureOpenAI(
-        azure_endpoint=settings.AZURE_OPENAI_ENDPOINT,
-        api_key=settings.AZURE_OPENAI_API_KEY,
-        api_version="2024-07-01-preview",
-    )
+async def _client() -> "AsyncAzureOpenAI":
+    return resources.openai()
 
-async def answer_with_context(question: str, ctx: List[dict]) -> tuple[str, list[dict], dict]:
-    context_text = "\n\n".join(f"[{c['file_id']} p.{c.get('page', '?')}] {c['text']}" for c in ctx)
-    cli = await _client()
-    msgs = [
+def page_label(c: dict) -> str:
+    p, q = c.get("page"), c.get("page_end")
+    if p is None:
+        return "p.?"
+    return f"p.{p}" if q in (None, p) else f"p.{p}-{q}"
+
+def _messages(question: str, ctx: List[dict]) -> list[dict]:
+    context_text = "\n\n".join(f"[{c['file_id']} {page_label(c)}] {c['text']}" for c in ctx)
+    return [
         {"role": "system", "content": "Odpowiadaj tylko na podstawie kontekstu. Cytuj źródła."},
         {"role": "user", "content": f"Kontekst:\n{context_text}\n---\nPytanie: {question}"},
     ]
+
+def citations(ctx: List[dict]) -> list[dict]:
+    return [{"file_id": c["file_id"], "page": c.get("page"), "page_end": c.get("page_end"), "snippet": c["text"][:160]} for c in ctx]
+
+async def answer_with_context(question: str, ctx: List[dict]) -> tuple[str, list[dict], dict]:
+    cli = await _client()
+    msgs = _messages(question, ctx)
     res = await cli.chat.completions.create(model=settings.AZURE_OPENAI_DEPLOYMENT_CHAT, messages=msgs, temperature=0.2)
     txt = res.choices[0].message.content
     usage = res.usage or None
@@ -24,5 +35,38 @@ async def answer_with_context(question: str, ctx: List[dict]) -> tuple[str, list
     if usage:
         c = estimate_cost(settings.AZURE_OPENAI_DEPLOYMENT_CHAT, usage.prompt_tokens, usage.completion_tokens)
         cost = c.__dict__
-    cites = [{"file_id": c["file_id"], "page": c.get("page"), "snippet": c["text"][:160]} for c in ctx]
-    return txt, cites, cost
+    return txt, citations(ctx), cost
+
+def estimate_stream_cost(question: str, ctx: List[dict], answer: str) -> dict:
+    """Locally counted cost of a streamed answer whose upstream usage never arrived (not reported, or cut short)."""
+    in_tok = sum(count_tokens(m["content"]) for m in _messages(question, ctx))
+    return estimate_cost(settings.AZURE_OPENAI_DEPLOYMENT_CHAT, in_tok, count_tokens(answer)).__dict__
+
+async def stream_answer(question: str, ctx: List[dict]) -> AsyncIterator[Tuple[str, object]]:
+    """Stream the completion as ("token", str) events, then one ("cost", dict) event.
+
+    If the upstream does not report usage on the stream, tokens are counted locally.
+    Cancelling the consumer closes the upstream HTTP stream.
+    """
+    cli = await _client()
+    msgs = _messages(question, ctx)
+    stream = await cli.chat.completions.create(
+        model=settings.AZURE_OPENAI_DEPLOYMENT_CHAT, messages=msgs, temperature=0.2,
+        stream=True, stream_options={"include_usage": True},
+    )
+    parts: List[str] = []
+    usage = None
+    try:
+        async for chunk in stream:
+            if chunk.usage:
+                usage = chunk.usage
+            for choice in chunk.choices:
+                if choice.delta and choice.delta.content:
+                    parts.append(choice.delta.content)
+                    yield "token", choice.delta.content
+    finally:
+        await stream.close()
+    if usage:
+        yield "cost", estimate_cost(settings.AZURE_OPENAI_DEPLOYMENT_CHAT, usage.prompt_tokens, usage.completion_tokens).__dict__
+    else:
+        yield "cost", estimate_stream_cost(question, ctx, "".join(parts))
@@ -0,0 +1,105 @@
+import hashlib
+from typing import List, Optional, Set, Tuple
+from ingest.chunk import count_tokens, truncate_tokens
+
+SHINGLE_WORDS = 5
+MIN_TRUNCATED_TOKENS = 64
+
+
+def shingles(text: str, n: int = SHINGLE_WORDS) -> Set[int]:
+    """Hashed word n-grams of ``text`` (a single hash for texts shorter than ``n`` words)."""
+    words = text.lower().split()
+    grams = [" ".join(words[i:i+n]) for i in range(max(1, len(words) - n + 1))]
+    return {int.from_bytes(hashlib.blake2b(g.encode("utf-8"), digest_size=8).digest(), "little") for g in grams}
+
+
+def jaccard(a: Set[int], b: Set[int]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def _text_overlap(a: str, b: str, probe: int = 64) -> Optional[int]:
+    """Length of the longest suffix of ``a`` that is a prefix of ``b``, found via a short probe."""
+    head = b[:probe]
+    if not head:
+        return None
+    pos = a.find(head)
+    while pos != -1:
+        if b.startswith(a[pos:]):
+            return len(a) - pos
+        pos = a.find(head, pos + 1)
+    return None
+
+
+def _merge_by_text(cur: dict, h: dict) -> bool:
+    for a, b in ((cur["text"], h["text"]), (h["text"], cur["text"])):
+        k = _text_overlap(a, b)
+        if k is not None:
+            cur["text"] = a + b[k:]
+            cur["score"] = max(cur["score"], h["score"])
+            return True
+    return False
+
+
+def _merge_file(hits: List[dict]) -> List[dict]:
+    with_off = sorted((h for h in hits if h.get("char_start") is not None), key=lambda h: h["char_start"])
+    without = [h for h in hits if h.get("char_start") is None]
+    merged: List[dict] = []
+    for h in with_off:
+        cur = merged[-1] if merged else None
+        if cur is not None and h["char_start"] <= cur["char_end"]:
+            # offsets index the same document text, so the tail past cur_end is the new part
+            extra = h["text"][cur["char_end"] - h["char_start"]:]
+            cur["text"] += extra
+            cur["char_end"] = max(cur["char_end"], h["char_end"])
+            cur["score"] = max(cur["score"], h["score"])
+            cur["page_end"] = max((p for p in (cur.get("page_end"), h.get("page_end")) if p is not None), default=None)
+        else:
+            merged.append(dict(h))
+    # no offsets (older chunks): fall back to detecting the textual overlap
+    loose: List[dict] = []
+    for h in without:
+        if not any(_merge_by_text(cur, h) for cur in loose):
+            loose.append(dict(h))
+    return merged + loose
+
+
+def pack_context(hits: List[dict], budget_tokens: int, dedup_jaccard: float = 0.8) -> Tuple[List[dict], dict]:
+    """Assemble the prompt context from retrieved chunks.
+
+    Contiguous/overlapping chunks of the same file are merged, near-duplicate
+    passages are dropped, and passages are taken by score until
+    ``budget_tokens`` is filled. A passage that does not fit is cut to the
+    remaining budget when at least MIN_TRUNCATED_TOKENS are left (so one
+    long merged passage cannot leave the context empty), otherwise skipped.
+    Returns the passages and token accounting.
+    """
+    raw_tokens = sum(count_tokens(h["text"] or "") for h in hits)
+    by_file: dict = {}
+    for h in hits:
+        if h.get("text"):
+            by_file.setdefault(h.get("file_id"), []).append({**h, "score": h.get("score") or 0.0})
+    passages = [m for group in by_file.values() for m in _merge_file(group)]
+    passages.sort(key=lambda p: p["score"], reverse=True)
+
+    out: List[dict] = []
+    kept: List[Set[int]] = []
+    used = 0
+    for p in passages:
+        sh = shingles(p["text"])
+        if any(jaccard(sh, k) >= dedup_jaccard for k in kept):
+            continue
+        n = count_tokens(p["text"])
+        if used + n > budget_tokens:
+            room = budget_tokens - used
+            if room < MIN_TRUNCATED_TOKENS:
+                continue
+            p = {**p, "text": truncate_tokens(p["text"], room)}
+            if p.get("char_start") is not None:
+                p["char_end"] = p["char_start"] + len(p["text"])
+            n = count_tokens(p["text"])
+        out.append(p)
+        kept.append(sh)
+        used += n
+    return out, {"context_tokens": used, "context_tokens_saved": max(0, raw_tokens - used)}
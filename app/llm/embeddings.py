@@ -1,39 +1,56 @@
-import hashlib, json
-from typing import List
-import redis
-from openai import AsyncAzureOpenAI
+from typing import TYPE_CHECKING, Callable, List, Optional
 from core.config import settings
+from core.resources import resources
+from llm.cache import embedding_cache
+from llm.batcher import QueryEmbedBatcher
+from llm.scheduler import run_batches
+if TYPE_CHECKING:
+    from openai import AsyncAzureOpenAI
 
-_r = redis.from_url(settings.REDIS_URL)
+async def _client() -> "AsyncAzureOpenAI":
+    return resources.openai()
 
-async def _client() -> AsyncAzureOpenAI:
-    return AsyncAzureOpenAI(
-        azure_endpoint=settings.AZURE_OPENAI_ENDPOINT,
-        api_key=settings.AZURE_OPENAI_API_KEY,
-        api_version="2024-07-01-preview",
-    )
+async def embed_chunks(chunks: List[str], on_cached: Optional[Callable[[List[bool]], None]] = None) -> List[List[float]]:
+    """Embed ``chunks`` (cache first); ``on_cached`` receives which of them were served from the cache."""
+    cache = embedding_cache()
+    out = await cache.get_many(chunks)
+    if on_cached is not None:
+        on_cached([v is not None for v in out])
+    order = [i for i, v in enumerate(out) if v is None]
+    if order:
+        # retries are owned by the scheduler, not the SDK
+        cli = (await _client()).with_options(max_retries=0)
 
-def _key(s: str) -> str:
-    return "emb:" + hashlib.sha256(s.encode("utf-8")).hexdigest()
+        async def _embed(batch: List[str]) -> List[List[float]]:
+            resp = await cli.embeddings.create(input=batch, model=settings.AZURE_OPENAI_DEPLOYMENT_EMBED,
+                                               dimensions=settings.EMBED_DIM)
+            return [d.embedding for d in sorted(resp.data, key=lambda d: d.index)]
 
-async def embed_chunks(chunks: List[str]) -> List[List[float]]:
-    out: List[List[float]] = []
-    to_query = []
-    order = []
-    for i, ch in enumerate(chunks):
-        k = _key(ch)
-        v = _r.get(k)
-        if v:
-            out.append(json.loads(v))
-        else:
-            to_query.append(ch)
-            order.append(i)
-            out.append(None)
-    if to_query:
-        cli = await _client()
-        resp = await cli.embeddings.create(input=to_query, model=settings.AZURE_OPENAI_DEPLOYMENT_EMBED)
-        vecs = [d.embedding for d in resp.data]
+        to_query = [chunks[i] for i in order]
+        vecs = await run_batches(
+            to_query, _embed,
+            max_items=settings.EMBED_BATCH_MAX_ITEMS,
+            max_tokens=settings.EMBED_BATCH_MAX_TOKENS,
+            concurrency=settings.EMBED_CONCURRENCY,
+            max_retries=settings.EMBED_MAX_RETRIES,
+            backoff_base_s=settings.EMBED_BACKOFF_BASE_S,
+            backoff_max_s=settings.EMBED_BACKOFF_MAX_S,
+        )
+        fresh = {}
         for idx, vec in zip(order, vecs):
             out[idx] = vec
-            _r.setex(_key(chunks[idx]), 60*60*24*7, json.dumps(vec))
+            fresh[chunks[idx]] = vec
+        await cache.set_many(fresh)
     return out
+
+_batcher: QueryEmbedBatcher | None = None
+
+def query_batcher() -> QueryEmbedBatcher:
+    global _batcher
+    if _batcher is None:
+        _batcher = QueryEmbedBatcher(embed_chunks, settings.QUERY_BATCH_WINDOW_MS, settings.QUERY_BATCH_MAX)
+    return _batcher
+
+async def embed_query(text: str, on_cached: Optional[Callable[[bool], None]] = None) -> List[float]:
+    """Embed a single query, coalesced with concurrent queries from other requests."""
+    return await query_batcher().embed(text, on_cached)
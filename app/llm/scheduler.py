@@ -0,0 +1,94 @@
+import asyncio, random
+from typing import Awaitable, Callable, List, Optional
+from functools import lru_cache
+import httpx
+from ingest.chunk import count_tokens
+
+
+@lru_cache(maxsize=1)
+def _retryable() -> tuple:
+    # the openai package is heavy to import; only batches that actually run need it
+    import openai
+    return (openai.RateLimitError, openai.APITimeoutError, openai.APIConnectionError, openai.InternalServerError)
+
+
+def plan_batches(texts: List[str], max_items: int, max_tokens: int) -> List[List[int]]:
+    """Greedy, order-preserving split of ``texts`` into index batches bounded by item and token count."""
+    batches: List[List[int]] = []
+    cur: List[int] = []
+    cur_tok = 0
+    for i, t in enumerate(texts):
+        n = count_tokens(t)
+        if cur and (len(cur) >= max_items or cur_tok + n > max_tokens):
+            batches.append(cur)
+            cur, cur_tok = [], 0
+        cur.append(i)
+        cur_tok += n
+    if cur:
+        batches.append(cur)
+    return batches
+
+
+def retry_after_s(err: Exception) -> Optional[float]:
+    resp: httpx.Response | None = getattr(err, "response", None)
+    if resp is None:
+        return None
+    ms = resp.headers.get("retry-after-ms")
+    if ms:
+        try:
+            return float(ms) / 1000
+        except ValueError:
+            pass
+    s = resp.headers.get("retry-after")
+    if s:
+        try:
+            return float(s)
+        except ValueError:
+            return None
+    return None
+
+
+def backoff_s(attempt: int, base: float, cap: float, hint: Optional[float] = None) -> float:
+    if hint is not None:
+        return min(cap, hint) + random.uniform(0, base)
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+async def run_batches(
+    texts: List[str],
+    embed_fn: Callable[[List[str]], Awaitable[List[List[float]]]],
+    max_items: int,
+    max_tokens: int,
+    concurrency: int,
+    max_retries: int,
+    backoff_base_s: float,
+    backoff_max_s: float,
+) -> List[List[float]]:
+    """Embed ``texts`` in token-bounded batches, ``concurrency`` at a time.
+
+    Throttled or transiently failing batches are retried on their own, honouring
+    Retry-After when the service sends it. The result is aligned with ``texts``.
+    """
+    out: List[Optional[List[float]]] = [None] * len(texts)
+    sem = asyncio.Semaphore(max(1, concurrency))
+
+    async def _one(idx: List[int]) -> None:
+        batch = [texts[i] for i in idx]
+        attempt = 0
+        while True:
+            async with sem:
+                try:
+                    vecs = await embed_fn(batch)
+                    break
+                except _retryable() as e:
+                    if attempt >= max_retries:
+                        raise
+                    delay = backoff_s(attempt, backoff_base_s, backoff_max_s, retry_after_s(e))
+            # sleep outside the semaphore so other batches keep the slot busy
+            await asyncio.sleep(delay)
+            attempt += 1
+        for i, v in zip(idx, vecs):
+            out[i] = v
+
+    await asyncio.gather(*(_one(b) for b in plan_batches(texts, max_items, max_tokens)))
+    return out
@@ -1,19 +1,47 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+import math
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
+from core.resources import resources
+from core.warmup import readiness
 from core.telemetry import setup_logging
 from core.middleware import RequestIdMiddleware, MetricsMiddleware
+from core.admission import llm_admission
+from core.metrics import counters, latency, stages
+from core.ratelimit import TooManyRequests
 from api.routes_ingest import router as ingest_router
 from api.routes_ask import router as ask_router
 from api.routes_admin import router as admin_router
 
-app = FastAPI(title="RAG Docs API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await resources.startup()
+    yield
+    await resources.aclose()
+
+app = FastAPI(title="RAG Docs API", lifespan=lifespan)
 setup_logging()
 app.add_middleware(RequestIdMiddleware)
 app.add_middleware(MetricsMiddleware)
 
+@app.exception_handler(TooManyRequests)
+async def too_many_requests(request: Request, exc: TooManyRequests):
+    return JSONResponse({"detail": exc.reason}, status_code=429,
+                        headers={"Retry-After": str(max(1, math.ceil(exc.retry_after_s)))})
+
 @app.get("/healthz")
 def health():
     return {"ok": True}
 
+@app.get("/readyz")
+def ready():
+    return JSONResponse(readiness.report(), status_code=200 if readiness.ready else 503)
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    body = latency.prometheus() + stages.prometheus() + counters.prometheus() + llm_admission.prometheus()
+    return PlainTextResponse(body, media_type="text/plain; version=0.0.4")
+
 app.include_router(ingest_router, prefix="/ingest", tags=["ingest"])
 app.include_router(ask_router, prefix="/ask", tags=["ask"])
 app.include_router(admin_router, prefix="/admin", tags=["admin"])
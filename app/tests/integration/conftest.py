@@ -0,0 +1,29 @@
+import pytest
+from fastapi.testclient import TestClient
+from bench.fakes import FakeOpenAI, install
+from core.config import settings
+
+
+@pytest.fixture
+def client(monkeypatch, tmp_path):
+    """The real app against offline stand-ins for OpenAI, Redis and Qdrant (bench/fakes.py)."""
+    from core.resources import resources
+    from vector.factory import get_backend
+    import vector.factory as factory
+    # install() overrides VECTOR_STORE and AZURE_OPENAI_ENDPOINT; monkeypatch restores them afterwards
+    for name, value in (("VECTOR_STORE", "qdrant"), ("AZURE_OPENAI_ENDPOINT", None), ("EMBED_DIM", 64),
+                        ("LEXICAL_INDEX_DIR", str(tmp_path / "lexical")), ("RATE_LIMIT_RPS", 0),
+                        ("INGEST_RATE_LIMIT_RPS", 0)):
+        monkeypatch.setattr(settings, name, value)
+    monkeypatch.setattr(factory, "_schema_ready", False)
+    monkeypatch.setattr("llm.cache._cache", None)
+    monkeypatch.setattr("llm.answer_cache._cache", None)
+    get_backend.cache_clear()
+    fake = FakeOpenAI()
+    install(fake)
+    from main import app
+    with TestClient(app) as c:
+        c.fake = fake
+        yield c
+    get_backend.cache_clear()
+    resources._reset()
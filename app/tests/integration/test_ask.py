@@ -1,17 +1,110 @@
-from fastapi.testclient import TestClient
-from app.main import app
-
-def test_ask_minimal(monkeypatch):
-    client = TestClient(app)
-    import app.llm.embeddings as emb
-    monkeypatch.setattr(emb, "embed_chunks", lambda x: [[0.0]*1536])
-    import app.vector.qdrant_client as vc
-    class H: 
-        payload={"file_id":"x","page":1,"text":"foo bar"}; score=0.9
-    monkeypatch.setattr(vc, "search", lambda v,t,top_k=4: [H()])
-    import app.llm.chat as chat
-    async def fake_answer(q, ctx):
-        return "odp", [{"file_id":"x","page":1,"snippet":"foo"}], {"usd":0.0}
-    monkeypatch.setattr(chat, "answer_with_context", fake_answer)
-    r = client.post("/ask", json={"question":"Co to jest?"})
+import asyncio, contextlib, json
+from core.config import settings
+from ingest.chunk import count_tokens
+
+
+def test_ask_minimal(client):
+    r = client.post("/ingest", files={"file": ("x.txt", b"foo bar " * 50, "text/plain")})
+    assert r.status_code == 200
+    r = client.post("/ask", json={"question": "Co to jest?"})
     assert r.status_code == 200
+    body = r.json()
+    assert body["answer"] and not body["cached"]
+    assert body["sources"] and body["sources"][0]["file_id"] == "x.txt"
+    assert client.fake.calls["chat"] == 1
+
+
+def _events(body: str):
+    out = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        out.append((lines["event"], json.loads(lines["data"])))
+    return out
+
+
+def _stream(client, question="Co to jest?"):
+    r = client.post("/ask/stream", json={"question": question})
+    assert r.status_code == 200 and r.headers["content-type"].startswith("text/event-stream")
+    return _events(r.text)
+
+
+def test_ask_stream_event_order_and_answer_cache(client):
+    client.post("/ingest", files={"file": ("x.txt", b"foo bar " * 50, "text/plain")})
+    events = _stream(client)
+    names = [e for e, _ in events]
+    assert names[0] == "sources" and names[-1] == "done"
+    assert set(names[1:-1]) == {"token"} and len(names) - 2 == client.fake.answer_tokens
+    assert events[0][1][0]["file_id"] == "x.txt"
+    done = events[-1][1]
+    assert not done["cached"] and done["cost"]["output_tokens"] == client.fake.answer_tokens
+    answer = "".join(d["text"] for e, d in events if e == "token")
+
+    again = _stream(client)
+    assert [e for e, _ in again] == ["sources", "token", "done"]
+    assert again[1][1]["text"] == answer and again[-1][1]["cached"]
+    assert client.fake.calls["chat"] == 1
+
+
+def test_ask_stream_counts_tokens_locally_without_upstream_usage(client):
+    client.fake.stream_usage = False
+    client.post("/ingest", files={"file": ("x.txt", b"foo bar " * 50, "text/plain")})
+    events = _stream(client)
+    answer = "".join(d["text"] for e, d in events if e == "token")
+    cost = events[-1][1]["cost"]
+    assert cost["output_tokens"] == count_tokens(answer) != client.fake.answer_tokens
+    assert cost["input_tokens"] > 0
+
+
+def test_ask_stream_reports_upstream_failure(client):
+    client.fake.fail_after_tokens = 3
+    client.post("/ingest", files={"file": ("x.txt", b"foo bar " * 50, "text/plain")})
+    events = _stream(client)
+    assert [e for e, _ in events] == ["sources", "token", "token", "token", "error"]
+    assert events[-1][1]["status"] == 502
+    client.fake.fail_after_tokens = None
+    assert _stream(client)[-1][0] == "done"  # the failed answer was not cached
+    assert client.fake.calls["chat"] == 2
+
+
+def test_ask_stream_records_usage_when_client_disconnects(client):
+    from api.routes_ask import Q, ask_stream
+    from core.usage import tenant_usage
+    client.post("/ingest", files={"file": ("x.txt", b"foo bar " * 50, "text/plain")})
+    client.fake.token_latency_s = 0.01
+
+    async def run():
+        resp = await ask_stream(Q(question="Co to jest?"))
+        tokens = []
+
+        async def consume():
+            async for chunk in resp.body_iterator:
+                if chunk.startswith("event: token"):
+                    tokens.append(chunk)
+        task = asyncio.create_task(consume())
+        while len(tokens) < 3:
+            await asyncio.sleep(0.005)
+        task.cancel()  # what Starlette does when the client goes away
+        with contextlib.suppress(asyncio.CancelledError):
+            await task
+        await asyncio.sleep(0.05)
+        return len(tokens), (await tenant_usage())[settings.DEFAULT_TENANT]
+
+    n, usage = client.portal.call(run)
+    assert n < client.fake.answer_tokens
+    assert usage["chat_input_tokens"] > 0 and usage["chat_output_tokens"] >= n
+
+
+def test_ask_answers_when_redis_fails_after_retrieval(client, monkeypatch):
+    import fakeredis
+    import llm.embeddings
+    from core.resources import resources
+    from llm.cache import embedding_cache
+    client.post("/ingest", files={"file": ("x.txt", b"foo bar " * 50, "text/plain")})
+    cache = embedding_cache()
+    monkeypatch.setattr(llm.embeddings, "embedding_cache", lambda: cache)  # keeps the working connection
+    down = fakeredis.FakeServer()
+    down.connected = False
+    resources._redis = fakeredis.FakeAsyncRedis(server=down)  # answer-cache generation and usage
+    for _ in range(2):  # nothing is served from or written to the answer cache
+        r = client.post("/ask", json={"question": "Co to jest?"})
+        assert r.status_code == 200 and r.json()["cached"] is False
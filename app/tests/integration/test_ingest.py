@@ -1,11 +1,35 @@
-from fastapi.testclient import TestClient
-from app.main import app
-
-def test_ingest_txt(tmp_path):
-    client = TestClient(app)
+def test_ingest_txt(client, tmp_path):
     p = tmp_path/"x.txt"
     p.write_text("hello world "*100)
     with p.open("rb") as f:
         r = client.post("/ingest", files={"file": ("x.txt", f, "text/plain")})
     assert r.status_code == 200
     assert r.json()["chunks"] > 0
+    # unchanged content is not embedded again
+    with p.open("rb") as f:
+        again = client.post("/ingest", files={"file": ("x.txt", f, "text/plain")}).json()
+    assert again["added"] == 0 and again["unchanged"] == r.json()["chunks"]
+
+def test_readyz_passes_after_warm_up(client):
+    import time
+    assert client.get("/healthz").status_code == 200
+    deadline = time.time() + 10
+    while (r := client.get("/readyz")).status_code != 200 and time.time() < deadline:
+        time.sleep(0.05)
+    assert r.status_code == 200
+    assert r.json()["ready"] and all(s["ok"] for s in r.json()["steps"].values())
+
+def test_bulk_ingest_zip_and_plain_files(client):
+    import io, zipfile
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as z:
+        for i in range(5):
+            z.writestr(f"docs/{i}.txt", f"archived document {i} " * 30)
+    r = client.post("/ingest/bulk", files=[("files", ("docs.zip", buf.getvalue(), "application/zip")),
+                                           ("files", ("y.txt", b"plain upload " * 30, "text/plain"))])
+    assert r.status_code == 200
+    body = r.json()
+    assert body["totals"]["files"] == 6 and body["totals"]["failed"] == 0
+    assert body["totals"]["added"] == 6
+    # six one-chunk files embedded together
+    assert client.fake.calls["embeddings"] == 1
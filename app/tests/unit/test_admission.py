@@ -0,0 +1,76 @@
+import asyncio
+import pytest
+from starlette.testclient import TestClient
+from core.admission import AdmissionController
+from core.ratelimit import TooManyRequests
+
+
+def test_slots_are_handed_over_in_fifo_order():
+    order = []
+    async def job(ac, name, hold):
+        async with ac.slot():
+            order.append(name)
+            await asyncio.sleep(hold)
+    async def main():
+        ac = AdmissionController(max_inflight=1, max_wait_ms=1000, initial_service_ms=10)
+        await asyncio.gather(job(ac, "a", 0.02), job(ac, "b", 0), job(ac, "c", 0))
+        return ac
+    ac = asyncio.run(main())
+    assert order == ["a", "b", "c"]
+    assert ac.inflight == 0 and ac.stats()["queued"] == 0
+
+
+def test_sheds_when_expected_wait_exceeds_slo():
+    async def main():
+        ac = AdmissionController(max_inflight=2, max_wait_ms=100, initial_service_ms=150)
+        await ac.acquire()
+        await ac.acquire()
+        # one queued request would wait ~75 ms; allow it, then the next (~150 ms) is shed
+        waiter = asyncio.create_task(ac.acquire())
+        await asyncio.sleep(0)
+        with pytest.raises(TooManyRequests) as e:
+            await ac.acquire()
+        ac.release()
+        await waiter
+        return ac, e.value
+    ac, err = asyncio.run(main())
+    assert err.retry_after_s >= 0.15
+    assert ac.inflight == 2
+
+
+def test_queue_timeout_sheds_and_frees_the_place():
+    async def main():
+        ac = AdmissionController(max_inflight=1, max_wait_ms=30, initial_service_ms=1)
+        await ac.acquire()
+        with pytest.raises(TooManyRequests):
+            await ac.acquire()
+        ac.release()
+        return ac
+    ac = asyncio.run(main())
+    assert ac.inflight == 0 and ac.stats()["queued"] == 0
+
+
+def test_cancelled_waiter_skipped_by_release():
+    async def main():
+        ac = AdmissionController(max_inflight=1, max_wait_ms=1000, initial_service_ms=1)
+        await ac.acquire()
+        waiter = asyncio.create_task(ac.acquire())
+        await asyncio.sleep(0)
+        waiter.cancel()  # cancels the waiter's future now; its handler runs on the next loop step
+        ac.release()  # pops the cancelled future first and frees the slot
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        return ac
+    ac = asyncio.run(main())
+    assert ac.inflight == 0 and ac.stats()["queued"] == 0
+
+
+def test_rejections_become_429_with_retry_after(monkeypatch):
+    import api.routes_ask as routes_ask
+    from main import app
+    async def limited(tenant, route):
+        raise TooManyRequests("rate limit exceeded", 1.2)
+    monkeypatch.setattr(routes_ask, "enforce", limited)
+    res = TestClient(app).post("/ask", json={"question": "q"})
+    assert res.status_code == 429
+    assert res.headers["Retry-After"] == "2"
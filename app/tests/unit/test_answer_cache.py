@@ -0,0 +1,28 @@
+from llm.answer_cache import SemanticAnswerCache
+
+def test_hit_within_threshold_and_scoped_by_tenant():
+    c = SemanticAnswerCache(threshold=0.95, max_entries=10, ttl_s=60)
+    c.put("t1", 4, [1.0, 0.0, 0.0], 0, "odp", [{"file_id": "a"}], {"usd": 0.01})
+    assert c.get("t1", 4, [0.99, 0.05, 0.0], 0).answer == "odp"
+    assert c.get("t1", 4, [0.0, 1.0, 0.0], 0) is None
+    assert c.get("t2", 4, [1.0, 0.0, 0.0], 0) is None
+    assert c.get("t1", 8, [1.0, 0.0, 0.0], 0) is None
+    assert c.stats()["hits"] == 1
+
+def test_generation_bump_and_ttl_invalidate():
+    c = SemanticAnswerCache(threshold=0.9, max_entries=10, ttl_s=60)
+    c.put("t", 4, [1.0, 0.0], 3, "old", [], {})
+    assert c.get("t", 4, [1.0, 0.0], 4) is None
+    assert c.stats()["entries"] == 0
+    c.ttl_s = -1
+    c.put("t", 4, [1.0, 0.0], 4, "new", [], {})
+    assert c.get("t", 4, [1.0, 0.0], 4) is None
+
+def test_lru_eviction_across_tenants():
+    c = SemanticAnswerCache(threshold=0.9, max_entries=2, ttl_s=60)
+    c.put("a", 4, [1.0, 0.0], 0, "a", [], {})
+    c.put("b", 4, [1.0, 0.0], 0, "b", [], {})
+    assert c.get("a", 4, [1.0, 0.0], 0).answer == "a"
+    c.put("c", 4, [1.0, 0.0], 0, "c", [], {})
+    assert c.get("b", 4, [1.0, 0.0], 0) is None
+    assert c.get("a", 4, [1.0, 0.0], 0).answer == "a"
@@ -0,0 +1,35 @@
+import asyncio
+from types import SimpleNamespace
+import pytest
+import vector.azure_search_client as azure
+from core.config import settings
+from vector.batching import DeleteFailed
+
+
+class FakeSearchClient:
+    def __init__(self, statuses):
+        self.statuses = statuses  # id -> list of status codes, one per attempt
+        self.calls = []
+
+    async def delete_documents(self, documents):
+        self.calls.append([d["id"] for d in documents])
+        out = []
+        for d in documents:
+            code = (self.statuses.get(d["id"]) or [200]).pop(0)
+            out.append(SimpleNamespace(key=d["id"], succeeded=code == 200, status_code=code, error_message="x"))
+        return out
+
+
+def test_delete_ids_batches_and_raises_on_failed_keys(monkeypatch):
+    monkeypatch.setattr(settings, "UPSERT_BATCH_MAX_ITEMS", 5000)
+    monkeypatch.setattr(azure, "backoff_s", lambda *a: 0)
+    client = FakeSearchClient({"id7": [503, 200], "id42": [400]})
+    monkeypatch.setattr(azure, "get_search_client", lambda: client)
+    ids = [f"id{i}" for i in range(2500)]
+    with pytest.raises(DeleteFailed) as e:
+        asyncio.run(azure.delete_ids("t", ids))
+    assert e.value.failed == ["id42"]
+    # at most 1000 per request; the throttled key is retried on its own
+    first = [c for c in client.calls if len(c) > 1]
+    assert [len(c) for c in first] == [1000, 1000, 500]
+    assert ["id7"] in client.calls
@@ -0,0 +1,40 @@
+import asyncio
+from llm.batcher import QueryEmbedBatcher
+
+def test_concurrent_queries_share_one_call():
+    calls = []
+    async def fake_embed(texts):
+        calls.append(list(texts))
+        return [[float(len(t))] for t in texts]
+    async def main():
+        b = QueryEmbedBatcher(fake_embed, window_ms=20, max_batch=100)
+        res = await asyncio.gather(*(b.embed("q" * i) for i in range(1, 6)), b.embed("q"))
+        return b, res
+    b, res = asyncio.run(main())
+    assert len(calls) == 1
+    assert res == [[1.0], [2.0], [3.0], [4.0], [5.0], [1.0]]
+    assert b.stats()["batch_sizes"] == {5: 1}
+
+def test_max_batch_flushes_early_and_errors_fan_out():
+    async def boom(texts):
+        raise RuntimeError("down")
+    async def main():
+        b = QueryEmbedBatcher(boom, window_ms=10_000, max_batch=2)
+        return await asyncio.wait_for(asyncio.gather(b.embed("a"), b.embed("b"), return_exceptions=True), 1)
+    res = asyncio.run(main())
+    assert all(isinstance(r, RuntimeError) for r in res)
+
+def test_on_cached_reaches_each_caller():
+    async def fake_embed(texts, on_cached=None):
+        on_cached([t == "hit" for t in texts])
+        return [[0.0] for _ in texts]
+    seen = []
+    async def main():
+        b = QueryEmbedBatcher(fake_embed, window_ms=20, max_batch=100)
+        await asyncio.gather(b.embed("hit", lambda c: seen.append(("hit", c))),
+                             b.embed("miss", lambda c: seen.append(("miss", c))),
+                             b.embed("miss", lambda c: seen.append(("dup", c))),
+                             b.embed("quiet"))
+    asyncio.run(main())
+    # the duplicate rode along on the first "miss" call
+    assert sorted(seen) == [("dup", True), ("hit", True), ("miss", False)]
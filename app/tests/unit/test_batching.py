@@ -0,0 +1,31 @@
+import asyncio
+from vector.batching import est_bytes, run_limited, size_batches
+
+
+def test_size_batches_respects_item_and_byte_limits():
+    items = [{"text": "x" * 100, "vector": [0.0] * 10} for _ in range(10)]
+    per = est_bytes(items[0])
+    batches = size_batches(items, max_items=4, max_bytes=10**9)
+    assert [len(b) for b in batches] == [4, 4, 2]
+    batches = size_batches(items, max_items=100, max_bytes=3 * per)
+    assert [len(b) for b in batches] == [3, 3, 3, 1]
+    # an item larger than the byte budget still gets its own batch
+    assert size_batches(items[:2], max_items=10, max_bytes=1) == [[items[0]], [items[1]]]
+    assert [i for b in batches for i in b] == items
+
+
+def test_run_limited_bounds_concurrency():
+    active = peak = 0
+    sent = []
+
+    async def send(batch):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.01)
+        sent.extend(batch)
+        active -= 1
+
+    asyncio.run(run_limited([[i] for i in range(10)], send, concurrency=3))
+    assert peak == 3
+    assert sorted(sent) == list(range(10))
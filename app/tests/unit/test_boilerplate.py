@@ -0,0 +1,92 @@
+import asyncio
+import fakeredis.aioredis
+import ingest.boilerplate as boilerplate
+from core.config import settings
+from core.resources import resources
+
+DISCLAIMER = ("This document is confidential and intended solely for the use of the individual "
+              "or entity to whom it is addressed. Any review or distribution is prohibited.")
+
+
+def test_repeated_lines_are_stripped_from_every_page():
+    body = [f"Finding {i}: in the account sampled, ledger entry {i * 7} was not reconciled with the bank."
+            for i in range(1, 6)]
+    pages = [f"ACME Corp Internal Audit\n{b}\nConfidential - page {i} of 5" for i, b in enumerate(body, 1)]
+    s = boilerplate.Stripper("audit.pdf")
+    assert list(s.pages(pages)) == body
+    assert s.lines_removed == 10 and s.tokens_removed > 0
+
+
+def test_short_documents_and_unpaged_files_keep_their_lines():
+    assert list(boilerplate.Stripper("a.pdf").pages(["Header\nx", "Header\ny"])) == ["Header\nx", "Header\ny"]
+    pages = ["Header\nbody"] * 4
+    assert list(boilerplate.Stripper("a.txt").pages(pages)) == pages
+
+
+def test_near_identical_paragraphs_share_a_band():
+    a = boilerplate.band_keys(DISCLAIMER + " Issued 2024-01-31.")
+    b = boilerplate.band_keys(DISCLAIMER + " Issued 2025-06-30.")
+    assert set(a) & set(b)
+    assert not set(a) & set(boilerplate.band_keys("The ledger for the third quarter shows unreconciled "
+                                                  "entries in the accounts payable subledger."))
+    assert boilerplate.band_keys("too short to matter") == []
+
+
+def test_corpus_paragraphs_become_boilerplate_after_min_files(monkeypatch):
+    r = fakeredis.aioredis.FakeRedis()
+    monkeypatch.setattr(resources, "redis", lambda: r)
+    monkeypatch.setattr(settings, "BOILERPLATE_MIN_FILES", 3)
+
+    async def ingest(name: str, body: str) -> boilerplate.Stripper:
+        s = await boilerplate.load_stripper("t", name)
+        out = list(s.pages([f"{body}\n\n{DISCLAIMER}"]))
+        s.text = out[0]
+        await boilerplate.observe("t", name, s)
+        return s
+
+    async def run():
+        for _ in range(2):  # re-ingesting a file does not count it twice
+            s = await ingest("a.txt", "Alpha report body.")
+        assert DISCLAIMER in s.text
+        await ingest("b.txt", "Beta report body.")
+        assert s.tokens_removed == 0
+        await ingest("c.txt", "Gamma report body.")
+        s = await ingest("d.txt", "Delta report body.")
+        assert s.text == "Delta report body." and s.paragraphs_removed == 1 and s.tokens_removed > 0
+        # only bands seen in more than one file get a counter; every key expires
+        await ingest("e.txt", "An entirely unrelated paragraph about quarterly travel expenses and receipts.")
+        assert await r.hlen("boilerplate:t:files") == len(boilerplate.band_keys(DISCLAIMER))
+        assert await r.hlen("boilerplate:t:docs") == 4  # a (once), b, c, e; d had nothing left to sign
+        assert 0 < await r.ttl("boilerplate:t:bits") <= settings.BOILERPLATE_INDEX_TTL_DAYS * 86400
+
+    asyncio.run(run())
+
+
+def test_numeric_table_pages_keep_figures_headings_and_labels():
+    pages = []
+    for i in range(1, 11):
+        body = [f"Balance sheet, note {i}", "Total assets", "4,936", "220.40", f"Cash {i * 100}",
+                "Receivables", "1,204", f"Assets of segment {i} were reviewed without exceptions."]
+        pages.append("\n".join(["ACME Corp Internal Audit", *body, "12", "4,936", f"Confidential - page {i} of 10"]))
+    s = boilerplate.Stripper("balance.pdf")
+    out = list(s.pages(pages))
+    for i, page in enumerate(out, 1):
+        assert page.splitlines()[0] == f"Balance sheet, note {i}"
+        assert page.splitlines()[-2:] == ["12", "4,936"]  # a figure among the last lines stays too
+        assert "Total assets\n4,936\n220.40" in page and "Receivables\n1,204" in page
+    assert s.lines_removed == 20
+
+
+def test_pdf_pages_are_split_into_paragraphs_before_removal():
+    body = ("The auditors sampled forty invoices from the third quarter and traced each one to the\n"
+            "general ledger, finding two entries posted to the wrong cost centre.")
+    disclaimer = ("This document is confidential and intended solely for the use of the individual or\n"
+                  "entity to whom it is addressed. Any review or distribution is prohibited.")
+    assert boilerplate.pdf_paragraphs(f"{body}\n{disclaimer}") == [body, disclaimer]
+    s = boilerplate.Stripper("x.pdf", frozenset(boilerplate.band_keys(disclaimer)), corpus=True)
+    assert s.strip(f"{body}\n{disclaimer}") == body
+    assert s.paragraphs_removed == 1
+    # a page that cannot be split is too long to be signed, so it is never dropped whole
+    page = " ".join([DISCLAIMER] * 10)
+    s = boilerplate.Stripper("x.pdf", frozenset(boilerplate.band_keys(DISCLAIMER)), corpus=True)
+    assert s.strip(page) == page
@@ -0,0 +1,117 @@
+import asyncio, io, tarfile, zipfile
+import fakeredis
+import ingest.bulk as bulk
+from core.config import settings
+from core.resources import resources
+
+
+def _fake_store(monkeypatch):
+    store, calls = {}, []
+    async def fake_embed(chunks, on_cached=None):
+        if any("poison" in c for c in chunks):
+            raise RuntimeError("upstream rejected the batch")
+        calls.append(len(chunks))
+        return [[0.0]] * len(chunks)
+    async def fake_upsert(items):
+        store.update((i["id"], i) for i in items)
+    async def fake_list_ids(tenant, file_id):
+        return {k for k, v in store.items() if v["tenant_id"] == tenant and v["file_id"] == file_id}
+    async def fake_delete(tenant, ids):
+        for k in ids:
+            store.pop(k)
+    async def fake_record(tenant, usage):
+        pass
+    for name, fn in (("embed_chunks", fake_embed), ("upsert_chunks", fake_upsert), ("list_ids", fake_list_ids),
+                     ("delete_ids", fake_delete), ("record_usage", fake_record)):
+        monkeypatch.setattr(bulk, name, fn)
+    monkeypatch.setattr(settings, "BOILERPLATE_MIN_FILES", 0)
+    return store, calls
+
+
+def _zip(files):
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as z:
+        for name, text in files.items():
+            z.writestr(name, text)
+    buf.seek(0)
+    return buf
+
+
+def _run(uploads, **kw):
+    return asyncio.run(bulk.run_bulk_ingest(bulk.iter_sources(uploads, 1 << 20), "t", **kw))
+
+
+def test_small_files_share_embedding_batches(monkeypatch):
+    store, calls = _fake_store(monkeypatch)
+    docs = {f"docs/f{i}.txt": f"document {i} " * 40 for i in range(20)}
+    res = _run([("a.zip", _zip({**docs, "img.png": "x", "__MACOSX/._f0.txt": "x"}))], batch_size=64)
+    by_id = {f["file_id"]: f for f in res["files"]}
+    assert by_id["img.png"]["error"] == "unsupported file type"
+    assert all(by_id[n]["added"] == by_id[n]["chunks"] > 0 and by_id[n]["error"] is None for n in docs)
+    assert res["totals"]["files"] == 21 and res["totals"]["failed"] == 1
+    # 20 one-chunk files, batches of up to 64 chunks
+    assert len(calls) < 5 and sum(calls) == len(store) == 20
+
+
+def test_failed_batch_is_reported_per_file_and_keeps_old_chunks(monkeypatch):
+    store, _ = _fake_store(monkeypatch)
+    _run([("ok.txt", io.BytesIO(b"fine text " * 30)), ("bad.txt", io.BytesIO(b"old text " * 30))])
+    before = set(store)
+    # one chunk per batch so only the poisoned file's batch fails
+    res = _run([("ok.txt", io.BytesIO(b"fine text " * 30)), ("bad.txt", io.BytesIO(b"poison " * 30))], batch_size=1)
+    by_id = {f["file_id"]: f for f in res["files"]}
+    assert by_id["ok.txt"] == {"file_id": "ok.txt", "chunks": 1, "added": 0, "unchanged": 1, "removed": 0,
+                               "boilerplate_tokens": 0, "error": None}
+    assert "upstream rejected" in by_id["bad.txt"]["error"]
+    assert set(store) == before
+
+
+def test_tar_stream_and_corrupt_archive(monkeypatch):
+    store, _ = _fake_store(monkeypatch)
+    buf = io.BytesIO()
+    with tarfile.open(fileobj=buf, mode="w:gz") as t:
+        for name in ("a.md", "b.txt"):
+            data = f"{name} body " .encode() * 20
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            t.addfile(info, io.BytesIO(data))
+    buf.seek(0)
+    res = _run([("docs.tar.gz", buf), ("broken.zip", io.BytesIO(b"not a zip"))])
+    assert [f["file_id"] for f in res["files"]] == ["a.md", "b.txt", "broken.zip"]
+    assert res["files"][2]["error"].startswith("unreadable archive")
+    assert res["totals"]["added"] == len(store) == 2
+
+
+def test_unreadable_zip_members_fail_alone(monkeypatch):
+    store, _ = _fake_store(monkeypatch)
+    buf = _zip({"locked.txt": "secret " * 40, "odd.txt": "other " * 40, "open.txt": "plain text " * 40})
+    raw = bytearray(buf.getvalue())
+    # zipfile cannot write these, so patch the local (PK\3\4) and central (PK\1\2) headers:
+    # locked.txt gets the encrypted flag, odd.txt an unknown compression method (99)
+    for sig, name_at, flags_at, method_at in ((b"PK\x03\x04", 30, 6, 8), (b"PK\x01\x02", 46, 8, 10)):
+        pos = raw.find(sig)
+        while pos >= 0:
+            if raw[pos + name_at:].startswith(b"locked.txt"):
+                raw[pos + flags_at] |= 1
+            elif raw[pos + name_at:].startswith(b"odd.txt"):
+                raw[pos + method_at] = 99
+            pos = raw.find(sig, pos + 4)
+    res = _run([("a.zip", io.BytesIO(bytes(raw)))])
+    by_id = {f["file_id"]: f for f in res["files"]}
+    assert "encrypted" in by_id["locked.txt"]["error"]
+    assert by_id["odd.txt"]["error"].startswith("unreadable archive member")
+    assert by_id["open.txt"]["error"] is None and by_id["open.txt"]["added"] > 0
+    assert res["totals"]["failed"] == 2
+
+
+def test_large_uploads_are_charged_per_file(monkeypatch):
+    store, _ = _fake_store(monkeypatch)
+    r = fakeredis.FakeAsyncRedis()
+    monkeypatch.setattr(resources, "redis", lambda: r)
+    monkeypatch.setattr(settings, "INGEST_RATE_LIMIT_RPS", 0.001)
+    monkeypatch.setattr(settings, "INGEST_RATE_LIMIT_BURST", 2)
+    # files 1-2 ride on the request's token, 3-4 and 5-6 take one each, the 7th finds the bucket empty
+    res = _run([("docs.zip", _zip({f"d{i}.txt": f"document {i} body" for i in range(10)}))], files_per_token=2)
+    assert [f["file_id"] for f in res["files"]] == [f"d{i}.txt" for i in range(6)]
+    assert res["totals"]["rate_limited"] and res["totals"]["retry_after_s"] > 0
+    assert len(store) == 6
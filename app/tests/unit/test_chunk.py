@@ -1,7 +1,24 @@
-from ingest.chunk import chunk_text, count_tokens
+from ingest.chunk import chunk_documents, chunk_pages, chunk_text, count_tokens
 
 def test_chunking_overlap():
     text = "Ala ma kota. " * 200
     chunks = chunk_text(text, max_tokens=50, overlap=10)
     assert len(chunks) > 1
     assert all(count_tokens(c) <= 50 for c in chunks)
+
+def test_chunk_pages_tracks_pages_and_offsets():
+    pages = [f"Strona {i}: zażółć gęślą jaźń, klauzula {i}. " * 20 for i in range(1, 6)]
+    doc = " ".join(pages)
+    chunks = chunk_pages(pages, max_tokens=60, overlap=10)
+    assert chunks[0].page_start == 1 and chunks[-1].page_end == 5
+    assert all(c.page_start <= c.page_end for c in chunks)
+    assert all(doc[c.char_start:c.char_end] == c.text for c in chunks)
+    assert all(c.n_tokens <= 60 for c in chunks)
+
+def test_chunk_documents_matches_single_document_mode():
+    docs = [["alpha beta " * 100, "", "gamma delta " * 80], ["solo " * 10], []]
+    batched = chunk_documents(docs, max_tokens=40, overlap=5)
+    assert [[c.text for c in d] for d in batched] == [
+        [c.text for c in chunk_pages(d, max_tokens=40, overlap=5)] for d in docs
+    ]
+    assert batched[0][-1].page_end == 3 and batched[2] == []
@@ -0,0 +1,38 @@
+from llm.context import pack_context
+
+DOC = " ".join(f"Zdanie numer {i} o audycie." for i in range(400))
+
+def _hit(start, end, score, file_id="a.pdf"):
+    return {"file_id": file_id, "page": 1, "page_end": 1, "char_start": start, "char_end": end,
+            "text": DOC[start:end], "score": score}
+
+def test_overlapping_chunks_of_same_file_are_merged():
+    hits = [_hit(0, 600, 0.9), _hit(450, 1100, 0.8), _hit(3000, 3500, 0.7)]
+    ctx, acc = pack_context(hits, budget_tokens=10_000)
+    assert len(ctx) == 2
+    assert ctx[0]["text"] == DOC[0:1100] and ctx[0]["score"] == 0.9
+    assert acc["context_tokens_saved"] > 0
+
+def test_text_overlap_fallback_without_offsets():
+    a, b = _hit(0, 600, 0.9), _hit(450, 1100, 0.8)
+    for h in (a, b):
+        h.pop("char_start"); h.pop("char_end")
+    ctx, _ = pack_context([b, a], budget_tokens=10_000)
+    assert [c["text"] for c in ctx] == [DOC[0:1100]]
+
+def test_near_duplicates_dropped_and_budget_respected():
+    dup = dict(_hit(0, 600, 0.5), file_id="copy.pdf")
+    hits = [_hit(0, 600, 0.9), dup, _hit(2000, 2600, 0.8), _hit(5000, 5600, 0.1)]
+    ctx, acc = pack_context(hits, budget_tokens=10_000)
+    assert [c["file_id"] for c in ctx].count("copy.pdf") == 0
+    budget = acc["context_tokens"] // 2
+    small, acc_small = pack_context(hits, budget_tokens=budget)
+    assert acc_small["context_tokens"] <= budget and len(small) < len(ctx)
+    assert small[0]["score"] == 0.9
+
+def test_passage_over_budget_is_truncated_not_dropped():
+    # adjacent chunks merge into one passage larger than the whole budget
+    hits = [_hit(i * 500, i * 500 + 600, 0.9 - i / 100) for i in range(8)]
+    ctx, acc = pack_context(hits, budget_tokens=300)
+    assert len(ctx) == 1 and 290 <= acc["context_tokens"] <= 300
+    assert DOC.startswith(ctx[0]["text"]) and ctx[0]["char_end"] == len(ctx[0]["text"])
@@ -0,0 +1,19 @@
+from llm.cache import EmbeddingCache, pack, unpack
+
+def test_pack_roundtrip_float32():
+    v = [0.1, -0.25, 3.5]
+    raw = pack(v)
+    assert len(raw) == 4*len(v)
+    assert unpack(raw) == [float(x) for x in __import__("numpy").float32(v)]
+
+def test_pack_float16_is_half_size():
+    v = [0.5]*3072
+    assert len(pack(v, "float16")) == 2*3072
+    assert unpack(pack(v, "float16"), "float16") == v
+
+def test_key_includes_model_and_dtype():
+    a = EmbeddingCache(None, "text-embedding-3-large")
+    b = EmbeddingCache(None, "text-embedding-3-small")
+    c = EmbeddingCache(None, "text-embedding-3-large", dtype="float16")
+    assert a.key("x").startswith("emb:v2:text-embedding-3-large:float32:")
+    assert len({a.key("x"), b.key("x"), c.key("x")}) == 3
@@ -0,0 +1,79 @@
+import io, threading, time
+from concurrent.futures import Future
+import pdfplumber.page
+import ingest.extract as extract
+from bench.corpus import make_pdf
+from core.config import settings
+
+PAGES = [f"Page marker {i} with some audit text about ledger {i}" for i in range(9)]
+
+
+def _parallel(monkeypatch, workers=2, per_task=1):
+    monkeypatch.setattr(settings, "EXTRACT_WORKERS", workers)
+    monkeypatch.setattr(settings, "EXTRACT_PAGES_PER_TASK", per_task)
+
+
+def test_parallel_extraction_keeps_page_order(monkeypatch):
+    _parallel(monkeypatch, workers=2, per_task=2)
+    try:
+        pages = list(extract.iter_pages(io.BytesIO(make_pdf(PAGES)), "x.pdf"))
+    finally:
+        extract.shutdown_pool()
+    assert [p.split()[2] for p in pages] == [str(i) for i in range(9)]
+
+
+class _InlinePool:
+    """Runs each range on submit, so the test sees how many ranges the iterator keeps in flight."""
+    def __init__(self):
+        self.submitted = 0
+
+    def submit(self, fn, *args):
+        self.submitted += 1
+        fut = Future()
+        fut.set_result(fn(*args))
+        return fut
+
+
+def test_parallel_extraction_keeps_a_bounded_window(monkeypatch):
+    _parallel(monkeypatch, workers=2, per_task=1)
+    pool = _InlinePool()
+    monkeypatch.setattr(extract, "_pool", lambda: pool)
+    it = extract.iter_pages(io.BytesIO(make_pdf(PAGES)), "x.pdf")
+    next(it)
+    assert pool.submitted == 2 * settings.EXTRACT_WORKERS + 1
+    assert len(list(it)) == 8 and pool.submitted == 9
+
+
+def test_slow_page_is_skipped_after_timeout(monkeypatch, tmp_path):
+    path = tmp_path / "x.pdf"
+    path.write_bytes(make_pdf(PAGES[:3]))
+    real = pdfplumber.page.Page.extract_text
+
+    def slow_second_page(self, *a, **kw):
+        if self.page_number == 2:
+            time.sleep(2)
+        return real(self, *a, **kw)
+    monkeypatch.setattr(pdfplumber.page.Page, "extract_text", slow_second_page)
+    out = extract._extract_range(str(path), 0, 3, timeout_s=0.1)
+    assert [n for n, _, _ in out] == [0, 1, 2]
+    assert out[1][1] is None and out[0][1].startswith("Page marker 0") and out[2][1].startswith("Page marker 2")
+    assert out[1][2] < 1000
+
+    _parallel(monkeypatch, workers=1, per_task=1)
+    monkeypatch.setattr(settings, "EXTRACT_PAGE_TIMEOUT_S", 0.1)
+    monkeypatch.setattr(extract, "_pool", lambda: _InlinePool())
+    assert list(extract.iter_pages(io.BytesIO(path.read_bytes()), "x.pdf"))[1] == ""
+
+
+def test_pool_is_created_once_under_concurrent_first_use(monkeypatch):
+    monkeypatch.setattr(settings, "EXTRACT_WORKERS", 1)
+    pools = []
+    threads = [threading.Thread(target=lambda: pools.append(extract._pool())) for _ in range(8)]
+    try:
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert len({id(p) for p in pools}) == 1
+    finally:
+        extract.shutdown_pool()
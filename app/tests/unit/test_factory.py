@@ -0,0 +1,33 @@
+import asyncio
+import vector.factory as factory
+from core.config import settings
+
+
+def test_backend_resolved_once_per_process(monkeypatch):
+    monkeypatch.setattr(settings, "VECTOR_STORE", "local")
+    factory.get_backend.cache_clear()
+    try:
+        backend = factory.get_backend()
+        from vector import local_store
+        assert backend.name == "local" and backend.search_chunks is local_store.search_chunks
+        monkeypatch.setattr(settings, "VECTOR_STORE", "qdrant")
+        assert factory.get_backend() is backend  # cached, settings are not re-read
+        assert factory.get_backend.cache_info().hits == 1
+        for fn in ("ensure_schema", "upsert_chunks", "search_chunks", "list_ids", "delete_ids"):
+            assert asyncio.iscoroutinefunction(getattr(backend, fn)), fn
+    finally:
+        factory.get_backend.cache_clear()
+
+
+def test_lexical_search_on_azure_sends_no_vector(monkeypatch):
+    calls = []
+    async def search_chunks(query_vector, tenant_id, top_k, **kw):
+        calls.append((query_vector, tenant_id, top_k, kw))
+        return [{"id": "a"}]
+    async def noop(*a, **kw):
+        pass
+    backend = factory.VectorBackend(name="azure_search", ensure_schema=noop, upsert_chunks=noop,
+                                    search_chunks=search_chunks, list_ids=noop, delete_ids=noop)
+    monkeypatch.setattr(factory, "get_backend", lambda: backend)
+    assert asyncio.run(factory.lexical_search("t", "XR-200", top_k=3)) == [{"id": "a"}]
+    assert calls == [(None, "t", 3, {"query_text": "XR-200"})]
@@ -0,0 +1,92 @@
+import pytest
+import vector.lexical as lexical
+from core.config import settings
+from vector.lexical import LexicalIndex, is_identifier_query, rrf_fuse, tokenize
+from vector.naming import TenantMismatch
+
+
+def _item(i, text):
+    return {"id": i, "text": text, "file_id": "f", "source": "s", "page": 1}
+
+
+def test_tokenize_keeps_compound_ids():
+    toks = tokenize("See ISO-27001 clause A.5.1")
+    assert "iso-27001" in toks and "iso" in toks and "27001" in toks
+    assert "a.5.1" in toks
+
+
+def test_bm25_ranks_rare_term_and_handles_delete(tmp_path):
+    idx = LexicalIndex(str(tmp_path / "t.db"))
+    idx.add([
+        _item("a", "the pump model XR-200 has a pressure limit"),
+        _item("b", "the pump is installed in the basement"),
+        _item("c", "the valve and the pump"),
+    ])
+    hits = idx.search("XR-200 pump", top_k=2)
+    assert hits[0]["id"] == "a"
+    assert hits[0]["file_id"] == "f" and hits[0]["score"] > 0
+
+    idx.add([_item("a", "replaced text without the model")])
+    assert [h["id"] for h in idx.search("xr-200")] == []
+
+    idx.delete(["b", "c"])
+    assert [h["id"] for h in idx.search("pump basement valve")] == []
+    idx.close()
+
+
+def test_similar_tenant_ids_get_separate_indexes(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "LEXICAL_INDEX_DIR", str(tmp_path))
+    try:
+        lexical.tenant_index("acme corp").add([_item("a", "quarterly revenue report")])
+        assert lexical.tenant_index("acme/corp").search("revenue") == []
+        assert lexical.tenant_index("acme_corp").search("revenue") == []
+        path = lexical._index_path("acme corp")
+    finally:
+        lexical.close_all()
+    with pytest.raises(TenantMismatch):
+        LexicalIndex(path, tenant_id="acme/corp")
+
+
+def test_rrf_fuse_prefers_items_in_both_lists():
+    vec = [{"id": "x"}, {"id": "y"}, {"id": "z"}]
+    lex = [{"id": "y"}, {"id": "w"}]
+    fused = rrf_fuse([vec, lex], top_k=3, k=60)
+    assert [h["id"] for h in fused][:2] == ["y", "x"]
+    assert len(fused) == 3
+
+
+def test_is_identifier_query():
+    assert is_identifier_query("XR-200")
+    assert is_identifier_query("ISO 27001?")
+    assert not is_identifier_query("how do I reset the pump after a power failure")
+    assert is_identifier_query("GDPR")
+    assert not is_identifier_query("")
+    for q in ("What is GDPR?", "revenue in 2023", "Explain IFRS 16", "WHAT IS GDPR"):
+        assert not is_identifier_query(q), q
+
+
+def test_stopwords_and_common_terms_are_not_scored(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "LEXICAL_MAX_DF_RATIO", 0.5)
+    monkeypatch.setattr(lexical, "MIN_DF_CUTOFF", 2)
+    idx = LexicalIndex(str(tmp_path / "t.db"))
+    idx.add([_item(str(i), f"the company report number {i}") for i in range(8)]
+            + [_item("rev", "the company revenue grew")])
+    assert "the" not in tokenize("the revenue of the company")
+    # "company" is in every chunk, so only "revenue" decides the ranking
+    assert [h["id"] for h in idx.search("what is the revenue of the company")] == ["rev"]
+    # a query of nothing but common terms is left to vector search
+    assert idx.search("company report") == []
+    assert idx.search("what is the") == []
+    idx.close()
+
+
+def test_search_reads_alongside_writes(tmp_path):
+    import threading
+    idx = LexicalIndex(str(tmp_path / "t.db"))
+    idx.add([_item("a", "pump XR-200 manual")])
+    with idx._lock:  # a writer holding the lock does not block readers
+        t = threading.Thread(target=lambda: setattr(t, "hits", idx.search("XR-200")))
+        t.start()
+        t.join(5)
+    assert [h["id"] for h in t.hits] == ["a"]
+    idx.close()
@@ -0,0 +1,112 @@
+import numpy as np
+import pytest
+import vector.local_store as local_store
+from core.config import settings
+from vector.local_store import TenantStore
+from vector.naming import TenantMismatch
+
+
+def _items(vecs, prefix="c", file_id="f"):
+    return [{"id": f"{prefix}{i}", "tenant_id": "t", "file_id": file_id, "text": f"chunk {i}", "page": i, "vector": v.tolist()}
+            for i, v in enumerate(vecs)]
+
+
+def test_exact_search_upsert_delete_and_reopen(tmp_path):
+    rng = np.random.default_rng(1)
+    vecs = rng.normal(size=(50, 8)).astype(np.float32)
+    store = TenantStore(str(tmp_path / "t"))
+    store.upsert(_items(vecs))
+    hits = store.search(vecs[7], top_k=3)
+    assert hits[0]["id"] == "c7" and hits[0]["page"] == 7
+    assert abs(hits[0]["score"] - 1.0) < 1e-5
+    assert [h["score"] for h in hits] == sorted((h["score"] for h in hits), reverse=True)
+
+    # replacing an id moves it to the new vector
+    store.upsert([{**_items(vecs[:1])[0], "id": "c7"}])
+    assert store.search(vecs[7], top_k=1)[0]["id"] != "c7"
+    store.delete(["c0"])
+    assert "c0" not in {h["id"] for h in store.search(vecs[0], top_k=50)}
+    assert store.list_ids("f") == {f"c{i}" for i in range(1, 50)}
+    store.close()
+
+    reopened = TenantStore(str(tmp_path / "t"))
+    assert reopened.live == 49
+    assert reopened.search(vecs[3], top_k=1)[0]["id"] == "c3"
+    reopened.close()
+
+
+def test_growth_and_compaction(tmp_path):
+    rng = np.random.default_rng(2)
+    vecs = rng.normal(size=(3000, 4)).astype(np.float32)
+    store = TenantStore(str(tmp_path / "t"))
+    for s in range(0, 3000, 500):
+        store.upsert(_items(vecs[s:s + 500], prefix=f"b{s}-"))
+    assert store.live == 3000
+    store.delete([f"b0-{i}" for i in range(500)] + [f"b500-{i}" for i in range(500)] +
+                 [f"b1000-{i}" for i in range(500)] + [f"b1500-{i}" for i in range(400)])
+    assert store.n == store.live == 1100
+    assert store.search(vecs[2999], top_k=1)[0]["id"] == "b2500-499"
+    store.close()
+
+
+def test_ivf_mode_finds_exact_match(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "LOCAL_IVF_MIN_ROWS", 500)
+    monkeypatch.setattr(settings, "LOCAL_IVF_NPROBE", 4)
+    rng = np.random.default_rng(3)
+    vecs = rng.normal(size=(2000, 16)).astype(np.float32)
+    store = TenantStore(str(tmp_path / "t"))
+    store.upsert(_items(vecs))
+    for i in (0, 123, 1999):
+        assert store.search(vecs[i], top_k=1)[0]["id"] == f"c{i}"
+    store.upsert(_items(vecs[:1], prefix="new"))
+    assert store.search(vecs[0], top_k=2)[0]["score"] > 0.99
+    store.close()
+
+
+def test_quantized_search_rescored_in_full_precision(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "VECTOR_QUANTIZATION", "binary")
+    rng = np.random.default_rng(4)
+    vecs = rng.normal(size=(1000, 64)).astype(np.float32)
+    store = TenantStore(str(tmp_path / "t"))
+    store.upsert(_items(vecs))
+    hit = store.search(vecs[42], top_k=1)[0]
+    assert hit["id"] == "c42" and abs(hit["score"] - 1.0) < 1e-5
+    store.close()
+    # codes are rebuilt from the float32 file on open
+    reopened = TenantStore(str(tmp_path / "t"))
+    assert reopened.search(vecs[900], top_k=1)[0]["id"] == "c900"
+    reopened.close()
+
+
+def test_migrate_local_reprojects_without_reembedding(tmp_path, monkeypatch):
+    from vector.migrate import migrate_local
+    monkeypatch.setattr(settings, "LOCAL_STORE_DIR", str(tmp_path / "src"))
+    vecs = np.random.default_rng(5).normal(size=(30, 16)).astype(np.float32)
+    store = TenantStore(str(tmp_path / "src" / "t"))
+    store.upsert(_items(vecs))
+    store.close()
+    assert migrate_local(str(tmp_path / "dst"), 8, batch=7) == 30
+    dst = TenantStore(str(tmp_path / "dst" / "t"))
+    assert dst.dim == 8 and dst.live == 30
+    hit = dst.search(vecs[5][:8], top_k=1)[0]
+    assert hit["id"] == "c5" and hit["text"] == "chunk 5"
+    dst.close()
+
+
+def test_similar_tenant_ids_get_separate_stores(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "LOCAL_STORE_DIR", str(tmp_path))
+    vec = np.ones((1, 4), dtype=np.float32)
+    # a store from before hashed names, whose old name was the tenant ID itself, is adopted
+    legacy = TenantStore(str(tmp_path / "acme_corp"))
+    legacy.upsert([{**_items(vec, prefix="old")[0], "tenant_id": "acme_corp"}])
+    legacy.close()
+    try:
+        local_store.tenant_store("acme corp").upsert([{**_items(vec)[0], "tenant_id": "acme corp"}])
+        assert [h["id"] for h in local_store.tenant_store("acme_corp").search(vec[0])] == ["old0"]
+        assert [h["id"] for h in local_store.tenant_store("acme corp").search(vec[0])] == ["c0"]
+        assert not local_store.tenant_store("acme/corp").search(vec[0])
+        path = local_store._store_path("acme corp")
+    finally:
+        local_store.close_all()
+    with pytest.raises(TenantMismatch):
+        TenantStore(path, "acme_corp")
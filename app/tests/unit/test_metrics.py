@@ -0,0 +1,81 @@
+import asyncio
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from starlette.testclient import TestClient
+from core.metrics import LatencyRegistry, LogHistogram
+from core.middleware import MetricsMiddleware, RequestIdMiddleware
+
+
+def test_histogram_quantiles_within_bucket_error():
+    h = LogHistogram()
+    for v in range(1, 1001):
+        h.record(float(v))
+    for q, exact in ((0.5, 500), (0.95, 950), (0.99, 990)):
+        assert exact <= h.quantile(q) <= exact * 1.1
+    assert h.cumulative_le([10.0, 1000.0, 10**6])[2] == 1000
+    assert LogHistogram().quantile(0.5) == 0.0
+
+
+def test_prometheus_exposition_is_cumulative():
+    reg = LatencyRegistry()
+    for ms in (3, 30, 300, 3000):
+        reg.record("GET", "/x/{id}", 200, ms)
+    text = reg.prometheus()
+    assert '# TYPE http_request_duration_seconds histogram' in text
+    assert 'http_request_duration_seconds_bucket{method="GET",route="/x/{id}",status="200",le="0.005"} 1' in text
+    assert 'le="0.5"} 3' in text and 'le="+Inf"} 4' in text
+    assert 'http_request_duration_seconds_count{method="GET",route="/x/{id}",status="200"} 4' in text
+    assert reg.summary()["GET /x/{id}"]["count"] == 4
+
+
+def test_middlewares_label_by_route_template_and_keep_streaming(monkeypatch):
+    import core.middleware as mw
+    reg = LatencyRegistry()
+    monkeypatch.setattr(mw, "latency", reg)
+    app = FastAPI()
+    app.add_middleware(RequestIdMiddleware)
+    app.add_middleware(MetricsMiddleware)
+
+    @app.get("/items/{item_id}")
+    def item(item_id: int):
+        return {"id": item_id}
+
+    @app.get("/stream")
+    def stream():
+        async def gen():
+            for i in range(3):
+                await asyncio.sleep(0)
+                yield f"{i}\n"
+        return StreamingResponse(gen(), media_type="text/plain")
+
+    with TestClient(app) as c:
+        r = c.get("/items/1", headers={"X-Request-ID": "abc"})
+        assert r.headers["x-request-id"] == "abc" and "x-response-time-ms" in r.headers
+        c.get("/items/2")
+        assert c.get("/stream").text == "0\n1\n2\n"
+        assert c.get("/nope").status_code == 404
+    s = reg.summary()
+    assert s["GET /items/{item_id}"]["count"] == 2
+    assert s["GET /stream"]["count"] == 1
+    assert s["GET <unmatched>"]["count"] == 1
+
+
+def test_request_id_on_access_log_and_stdlib_records(caplog):
+    import logging
+    from structlog.testing import capture_logs
+    from core.telemetry import setup_logging
+    setup_logging()
+    app = FastAPI()
+    app.add_middleware(RequestIdMiddleware)
+
+    @app.get("/items/{item_id}")
+    def item(item_id: int):
+        logging.getLogger("app.test").warning("inside the handler")
+        return {"id": item_id}
+
+    with capture_logs() as events, caplog.at_level(logging.WARNING), TestClient(app) as c:
+        c.get("/items/1", headers={"X-Request-ID": "req-1"})
+    access = [e for e in events if e["event"] == "request"]
+    assert access == [{"event": "request", "log_level": "info", "method": "GET", "route": "/items/{item_id}",
+                       "status": 200, "ms": access[0]["ms"], "request_id": "req-1"}]
+    assert [r.request_id for r in caplog.records if r.name == "app.test"] == ["req-1"]
@@ -0,0 +1,29 @@
+import numpy as np
+from vector.mmr import diversify, mmr
+
+
+def test_mmr_skips_near_duplicates():
+    q = np.array([1.0, 0.0, 0.0])
+    cands = np.array([
+        [0.9, 0.1, 0.0],    # best match
+        [0.9, 0.11, 0.0],   # near-copy of the best
+        [0.7, 0.0, 0.7],    # less relevant but distinct
+    ])
+    assert mmr(q, cands, 2, lam=0.5) == [0, 2]
+    # lam=1 is plain relevance ranking
+    assert mmr(q, cands, 2, lam=1.0) == [0, 1]
+    assert sorted(mmr(q, cands, 10)) == [0, 1, 2]
+    assert mmr(q, np.zeros((0, 3)), 2) == []
+
+
+def test_diversify_drops_vectors_and_fills_with_vectorless_hits():
+    hits = [
+        {"id": "a", "vector": [1.0, 0.0]},
+        {"id": "a-copy", "vector": [1.0, 0.001]},
+        {"id": "c", "vector": [0.6, 0.8]},
+        {"id": "lex"},
+    ]
+    out = diversify([1.0, 0.0], hits, 2, lam=0.3)
+    assert [h["id"] for h in out] == ["a", "c"]
+    assert all("vector" not in h for h in out)
+    assert [h["id"] for h in diversify([1.0, 0.0], hits, 4)][-1] == "lex"
@@ -0,0 +1,72 @@
+import asyncio, io
+import ingest.pipeline as pipeline
+from core.config import settings
+from ingest.chunk import chunk_text, iter_chunks
+from ingest.extract import iter_pages
+
+def test_iter_chunks_matches_chunk_text_windows():
+    text = "Ala ma kota. " * 300
+    streamed = list(iter_chunks([text], max_tokens=50, overlap=10))
+    assert streamed == chunk_text(text, max_tokens=50, overlap=10)[:len(streamed)]
+
+def test_text_blocks_do_not_split_words(monkeypatch):
+    monkeypatch.setattr("ingest.extract.TEXT_BLOCK_BYTES", 7)
+    blocks = list(iter_pages(io.BytesIO(("zażółć gęślą " * 20).encode()), "x.txt"))
+    assert len(blocks) > 1
+    assert "".join(blocks) == "zażółć gęślą " * 20
+    assert all(b.endswith(" ") for b in blocks)
+
+def _fake_store(monkeypatch):
+    store, embedded = {}, []
+    async def fake_embed(chunks, on_cached=None):
+        embedded.extend(chunks)
+        return [[0.0]] * len(chunks)
+    async def fake_upsert(items):
+        store.update((i["id"], i) for i in items)
+    async def fake_list_ids(tenant, file_id):
+        return {k for k, v in store.items() if v["tenant_id"] == tenant and v["file_id"] == file_id}
+    async def fake_record(tenant, usage):
+        pass
+    async def fake_delete(tenant, ids):
+        for k in ids:
+            store.pop(k)
+    monkeypatch.setattr(pipeline, "embed_chunks", fake_embed)
+    monkeypatch.setattr(pipeline, "upsert_chunks", fake_upsert)
+    monkeypatch.setattr(pipeline, "list_ids", fake_list_ids)
+    monkeypatch.setattr(pipeline, "delete_ids", fake_delete)
+    monkeypatch.setattr(pipeline, "record_usage", fake_record)
+    monkeypatch.setattr(settings, "BOILERPLATE_MIN_FILES", 0)
+    return store, embedded
+
+def test_run_ingest_batches_end_to_end(monkeypatch):
+    store, embedded = _fake_store(monkeypatch)
+    f = io.BytesIO(" ".join(f"word{i}" for i in range(3000)).encode())
+    res = asyncio.run(pipeline.run_ingest(f, "x.txt", "t", batch_size=4, queue_depth=1))
+    assert res["chunks"] == res["added"] == len(store) == len(embedded) > 4
+    assert res["unchanged"] == res["removed"] == 0
+
+def test_reingest_only_embeds_changes(monkeypatch):
+    store, embedded = _fake_store(monkeypatch)
+    words = [f"word{i}" for i in range(3000)]
+    asyncio.run(pipeline.run_ingest(io.BytesIO(" ".join(words).encode()), "x.txt", "t", batch_size=4))
+    embedded.clear()
+    edited = " ".join(words[:-200])
+    res = asyncio.run(pipeline.run_ingest(io.BytesIO(edited.encode()), "x.txt", "t", batch_size=4))
+    assert res["unchanged"] > 0 and res["removed"] > 0
+    assert len(embedded) == res["added"] < res["chunks"]
+    assert len(store) == res["chunks"]
+
+def test_failed_stale_deletes_are_not_counted(monkeypatch):
+    from vector.batching import DeleteFailed
+    store, _ = _fake_store(monkeypatch)
+    words = [f"word{i}" for i in range(3000)]
+    asyncio.run(pipeline.run_ingest(io.BytesIO(" ".join(words).encode()), "x.txt", "t", batch_size=4))
+    n_before = len(store)
+    async def partial_delete(tenant, ids):
+        for k in ids[1:]:
+            store.pop(k)
+        raise DeleteFailed(ids[:1], len(ids))
+    monkeypatch.setattr(pipeline, "delete_ids", partial_delete)
+    res = asyncio.run(pipeline.run_ingest(io.BytesIO(" ".join(words[:-200]).encode()), "x.txt", "t", batch_size=4))
+    assert res["removed"] == n_before + res["added"] - len(store) > 0
+    assert len(store) == res["chunks"] + 1
@@ -0,0 +1,136 @@
+import asyncio
+import uuid
+import pytest
+from qdrant_client import AsyncQdrantClient
+from core.config import settings
+from vector import qdrant_client as q
+
+
+def _items(tenant, n, dim=4):
+    return [{"id": str(uuid.uuid5(uuid.NAMESPACE_URL, f"{tenant}/{i}")), "tenant_id": tenant, "file_id": "f",
+             "text": f"{tenant} {i}", "hash": "h", "vector": [1.0, float(i), 0.5, 0.0][:dim]} for i in range(n)]
+
+
+def test_move_tenant_between_shared_and_dedicated(monkeypatch):
+    client = AsyncQdrantClient(location=":memory:")
+    monkeypatch.setattr(q, "qdrant", lambda: client)
+    monkeypatch.setattr(settings, "EMBED_DIM", 4)
+    monkeypatch.setattr(settings, "QDRANT_ROUTE_CACHE_S", 0)
+    monkeypatch.setattr(q, "_aliases_at", float("-inf"))
+
+    async def main():
+        await q.ensure_collection()
+        await q.upsert_chunks(_items("a", 5) + _items("b", 3))
+        assert await q.partition_of("a") == q.SHARED
+
+        assert await q.move_tenant("a", q.DEDICATED) == 5
+        assert await q.partition_of("a") == q.DEDICATED
+        assert await q.collection_for("a") == q.tenant_alias("a")
+        assert (await client.count(q.COLL)).count == 3
+        hits = await q.search_chunks([1.0, 2.0, 0.5, 0.0], "a", top_k=10)
+        assert len(hits) == 5 and all(h["text"].startswith("a ") for h in hits)
+        assert len(await q.list_ids("a", "f")) == 5
+
+        assert await q.move_tenant("a", q.SHARED) == 5
+        assert await q.partition_of("a") == q.SHARED
+        assert (await client.count(q.COLL)).count == 8
+        assert len(await q.search_chunks([1.0, 2.0, 0.5, 0.0], "b", top_k=10)) == 3
+
+    asyncio.run(main())
+
+
+def test_new_tenant_placed_by_mode(monkeypatch):
+    client = AsyncQdrantClient(location=":memory:")
+    monkeypatch.setattr(q, "qdrant", lambda: client)
+    monkeypatch.setattr(settings, "EMBED_DIM", 4)
+    monkeypatch.setattr(settings, "QDRANT_TENANT_MODE", q.DEDICATED)
+    monkeypatch.setattr(q, "_aliases_at", float("-inf"))
+
+    async def main():
+        await q.ensure_collection()
+        await q.upsert_chunks(_items("new", 2))
+        assert await q.partition_of("new") == q.DEDICATED
+        assert (await client.count(q.COLL)).count == 0
+        await q.delete_ids("new", [_items("new", 1)[0]["id"]])
+        assert len(await q.list_ids("new", "f")) == 1
+
+    asyncio.run(main())
+
+
+def test_similar_tenant_ids_get_separate_aliases(monkeypatch):
+    client = AsyncQdrantClient(location=":memory:")
+    monkeypatch.setattr(q, "qdrant", lambda: client)
+    monkeypatch.setattr(settings, "EMBED_DIM", 4)
+    monkeypatch.setattr(settings, "QDRANT_ROUTE_CACHE_S", 0)
+    monkeypatch.setattr(q, "_aliases_at", float("-inf"))
+    assert q.tenant_alias("a b") != q.tenant_alias("a_b")
+
+    async def main():
+        await q.ensure_collection()
+        await q.upsert_chunks(_items("a b", 2) + _items("a_b", 3))
+        assert await q.move_tenant("a b", q.DEDICATED) == 2
+        assert await q.partition_of("a_b") == q.SHARED
+        assert len(await q.list_ids("a_b", "f")) == 3
+        assert await q.move_tenant("a b", q.SHARED) == 2
+        assert len(await q.list_ids("a b", "f")) == 2 and len(await q.list_ids("a_b", "f")) == 3
+
+    asyncio.run(main())
+
+
+def test_shared_legacy_collection_keeps_other_tenants_points(monkeypatch):
+    client = AsyncQdrantClient(location=":memory:")
+    monkeypatch.setattr(q, "qdrant", lambda: client)
+    monkeypatch.setattr(settings, "EMBED_DIM", 4)
+    monkeypatch.setattr(settings, "QDRANT_ROUTE_CACHE_S", 0)
+    monkeypatch.setattr(q, "_aliases_at", float("-inf"))
+
+    async def main():
+        # before hashed names, "a b" and "a_b" both wrote through the alias <COLL>__a_b
+        await q.ensure_collection()
+        legacy = f"{q.COLL}__a_b"
+        await q.ensure_collection(f"{legacy}__data")
+        await client.update_collection_aliases(change_aliases_operations=[q.CreateAliasOperation(
+            create_alias=q.CreateAlias(collection_name=f"{legacy}__data", alias_name=legacy))])
+        await client.upsert(f"{legacy}__data", points=[q.PointStruct(id=i["id"], vector=i["vector"], payload=q.payload(i))
+                                                       for i in _items("a_b", 3) + _items("a b", 2)])
+        assert await q.collection_for("a_b") == legacy
+        assert await q.partition_of("a b") == q.SHARED
+        assert await q.move_tenant("a_b", q.SHARED) == 3
+        assert (await client.count(f"{legacy}__data")).count == 2
+
+    asyncio.run(main())
+
+
+def test_upsert_retries_transient_batch_failures(monkeypatch):
+    import httpx
+    from qdrant_client.http.exceptions import UnexpectedResponse
+    client = AsyncQdrantClient(location=":memory:")
+    monkeypatch.setattr(q, "qdrant", lambda: client)
+    monkeypatch.setattr(q, "backoff_s", lambda *a: 0)
+    monkeypatch.setattr(settings, "EMBED_DIM", 4)
+    monkeypatch.setattr(settings, "UPSERT_MAX_RETRIES", 2)
+    monkeypatch.setattr(settings, "QDRANT_ROUTE_CACHE_S", 0)
+    monkeypatch.setattr(q, "_aliases_at", float("-inf"))
+    real_upsert, failures = client.upsert, []
+
+    async def flaky_upsert(**kw):
+        if failures:
+            raise failures.pop(0)
+        return await real_upsert(**kw)
+    monkeypatch.setattr(client, "upsert", flaky_upsert)
+
+    async def main():
+        await q.ensure_collection()
+        failures.extend([UnexpectedResponse(503, "Unavailable", b"", httpx.Headers()), httpx.ConnectError("reset")])
+        await q.upsert_chunks(_items("a", 3))
+        assert (await client.count(q.COLL)).count == 3
+        # non-transient errors and exhausted retries are raised
+        failures.append(UnexpectedResponse(400, "Bad Request", b"", httpx.Headers()))
+        with pytest.raises(UnexpectedResponse):
+            await q.upsert_chunks(_items("b", 1))
+        failures.extend([httpx.ConnectError("reset")] * 3)
+        with pytest.raises(httpx.ConnectError):
+            await q.upsert_chunks(_items("b", 1))
+        assert not failures
+
+    asyncio.run(main())
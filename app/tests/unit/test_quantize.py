@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+from vector.quantize import Codes, binary_encode, binary_scores, int8_encode, reproject
+
+
+def test_reproject_truncates_and_normalises():
+    m = np.array([[3.0, 4.0, 12.0], [0.0, 0.0, 1.0]], dtype=np.float32)
+    out = reproject(m, 2)
+    assert out.shape == (2, 2)
+    np.testing.assert_allclose(out[0], [0.6, 0.8], rtol=1e-6)
+    np.testing.assert_allclose(out[1], [0.0, 0.0])
+    with pytest.raises(ValueError):
+        reproject(m, 4)
+
+
+def test_int8_roundtrip_is_close():
+    m = np.random.default_rng(0).normal(size=(10, 64)).astype(np.float32)
+    codes, scale = int8_encode(m)
+    assert codes.dtype == np.int8
+    np.testing.assert_allclose(codes * scale[:, None], m, atol=float(scale.max()))
+
+
+def test_binary_scores_rank_identical_sign_pattern_first():
+    m = np.random.default_rng(1).normal(size=(20, 40)).astype(np.float32)
+    bits = binary_encode(m)
+    assert bits.shape == (20, 5)
+    assert int(np.argmax(binary_scores(bits, m[7]))) == 7
+
+
+@pytest.mark.parametrize("mode", ["int8", "binary"])
+def test_codes_shortlist_contains_true_neighbour(mode):
+    rng = np.random.default_rng(2)
+    m = rng.normal(size=(500, 128)).astype(np.float32)
+    m /= np.linalg.norm(m, axis=1, keepdims=True)
+    codes = Codes(mode, 128)
+    codes.set(0, m[:200])
+    codes.set(200, m[200:])
+    q = m[321] + 0.05 * rng.normal(size=128).astype(np.float32)
+    approx = codes.scores(q, np.arange(500))
+    assert 321 in np.argsort(-approx)[:10]
@@ -0,0 +1,46 @@
+import asyncio
+import fakeredis
+import pytest
+import core.ratelimit as ratelimit
+from core.config import settings
+from core.metrics import CounterRegistry
+from core.resources import resources
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(ratelimit.time, "time", lambda: now[0])
+    monkeypatch.setattr(settings, "RATE_LIMIT_RPS", 2.0)
+    monkeypatch.setattr(settings, "RATE_LIMIT_BURST", 3)
+    r = fakeredis.FakeAsyncRedis()
+    monkeypatch.setattr(resources, "redis", lambda: r)
+    return now
+
+
+def test_burst_then_retry_after_then_refill(clock):
+    async def main():
+        assert [(await ratelimit.take("t", "ask")).allowed for _ in range(3)] == [True] * 3
+        d = await ratelimit.take("t", "ask")
+        assert not d.allowed and d.retry_after_s == 0.5
+        assert (await ratelimit.take("other", "ask")).allowed  # buckets are per tenant
+        with pytest.raises(ratelimit.TooManyRequests) as e:
+            await ratelimit.enforce("t", "ask")
+        assert e.value.retry_after_s == 0.5
+        clock[0] += 0.5
+        assert (await ratelimit.take("t", "ask")).allowed
+        assert not (await ratelimit.take("t", "ask")).allowed
+        clock[0] += 60  # refill is capped at the burst
+        assert [(await ratelimit.take("t", "ask")).allowed for _ in range(4)] == [True] * 3 + [False]
+    asyncio.run(main())
+
+
+def test_fails_open_when_redis_is_down(clock, monkeypatch):
+    server = fakeredis.FakeServer()
+    server.connected = False
+    r = fakeredis.FakeAsyncRedis(server=server)
+    monkeypatch.setattr(resources, "redis", lambda: r)
+    reg = CounterRegistry()
+    monkeypatch.setattr(ratelimit, "counters", reg)
+    assert asyncio.run(ratelimit.take("t", "ask")).allowed
+    assert reg.summary()["ratelimit_decisions_total"] == {"decision=error,route=ask": 1.0}
@@ -0,0 +1,55 @@
+import asyncio, threading, time
+import openai
+from core.config import settings
+from core.resources import Resources
+
+
+class _Closable:
+    def __init__(self):
+        self.closed = False
+
+    async def close(self):
+        self.closed = True
+
+    async def aclose(self):
+        self.closed = True
+
+
+def test_clients_are_created_lazily_and_reused(monkeypatch):
+    monkeypatch.setattr(settings, "REDIS_MAX_CONNECTIONS", 7)
+    r = Resources()
+    assert r._redis is None and r._openai is None and r._qdrant is None
+    redis = r.redis()
+    assert r.redis() is redis
+    assert redis.connection_pool.max_connections == 7
+    assert r._openai is None and r._qdrant is None
+
+
+def test_concurrent_first_use_creates_one_client(monkeypatch):
+    made = []
+    class SlowClient:
+        def __init__(self, **kw):
+            time.sleep(0.05)
+            made.append(self)
+    monkeypatch.setattr(openai, "AsyncAzureOpenAI", SlowClient)
+    r = Resources()
+    got = []
+    threads = [threading.Thread(target=lambda: got.append(r.openai())) for _ in range(4)]
+    for t in threads:
+        t.start()
+    got.append(r.openai())
+    for t in threads:
+        t.join()
+    assert len(made) == 1 and all(c is made[0] for c in got)
+
+
+def test_aclose_closes_clients_and_resets(monkeypatch):
+    monkeypatch.setattr(settings, "EXTRACT_WORKERS", 0)
+    r = Resources()
+    clients = {name: _Closable() for name in ("_openai", "_redis", "_qdrant", "_search_client")}
+    for name, c in clients.items():
+        setattr(r, name, c)
+    asyncio.run(r.aclose())
+    assert all(c.closed for c in clients.values())
+    assert r._openai is None and r._redis is None and r._qdrant is None
+    assert r.redis() is not clients["_redis"]
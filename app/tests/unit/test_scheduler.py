@@ -0,0 +1,33 @@
+import asyncio
+import httpx
+import openai
+from llm.scheduler import plan_batches, run_batches, retry_after_s
+
+def _rate_limited(retry_after="0"):
+    req = httpx.Request("POST", "http://test/embeddings")
+    resp = httpx.Response(429, headers={"retry-after": retry_after}, request=req)
+    return openai.RateLimitError("throttled", response=resp, body=None)
+
+def test_plan_batches_respects_limits_and_order():
+    texts = ["word " * 10] * 7
+    batches = plan_batches(texts, max_items=3, max_tokens=10_000)
+    assert [len(b) for b in batches] == [3, 3, 1]
+    assert sum(batches, []) == list(range(7))
+    assert all(len(b) == 1 for b in plan_batches(texts, max_items=100, max_tokens=5))
+
+def test_retry_after_header():
+    assert retry_after_s(_rate_limited("3")) == 3.0
+    assert retry_after_s(ValueError()) is None
+
+def test_run_batches_retries_throttled_batch_and_keeps_order():
+    calls = {"n": 0}
+    async def fake_embed(batch):
+        calls["n"] += 1
+        if calls["n"] == 2:
+            raise _rate_limited()
+        return [[float(t)] for t in batch]
+    texts = [str(i) for i in range(10)]
+    out = asyncio.run(run_batches(texts, fake_embed, max_items=3, max_tokens=1000,
+                                  concurrency=2, max_retries=2, backoff_base_s=0.0, backoff_max_s=0.0))
+    assert out == [[float(i)] for i in range(10)]
+    assert calls["n"] == 5
@@ -0,0 +1,32 @@
+from core.config import settings
+from core.costs import estimate_cost
+from core.metrics import StageRegistry
+from core.usage import Usage
+import core.tracing as tracing
+
+
+def test_usage_splits_spend_and_savings():
+    u = Usage(requests=1)
+    u.add_embed(1000, cached=False)
+    u.add_embed(500, cached=True)
+    u.add_chat({"input_tokens": 10, "output_tokens": 5, "usd": 0.25})
+    u.add_answer_cache_hit({"usd": 0.5})
+    per_tok = estimate_cost(settings.AZURE_OPENAI_DEPLOYMENT_EMBED, 1000).usd / 1000
+    assert (u.embed_tokens, u.embed_tokens_cached) == (1000, 500)
+    assert (u.chat_input_tokens, u.chat_output_tokens, u.answer_cache_hits) == (10, 5, 1)
+    assert abs(u.usd - (0.25 + 1000 * per_tok)) < 1e-9
+    assert abs(u.usd_saved - (0.5 + 500 * per_tok)) < 1e-9
+
+
+def test_span_records_stage_even_on_error(monkeypatch):
+    reg = StageRegistry()
+    monkeypatch.setattr(tracing, "stages", reg)
+    with tracing.span("ask.search"):
+        pass
+    try:
+        with tracing.span("ask.search"):
+            raise ValueError
+    except ValueError:
+        pass
+    assert reg.summary()["ask.search"]["count"] == 2
+    assert 'stage_duration_seconds_count{stage="ask.search"} 2' in reg.prometheus()
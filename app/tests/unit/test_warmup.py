@@ -0,0 +1,32 @@
+import asyncio
+import core.warmup as warmup
+
+
+def test_ready_only_after_failing_step_recovers(monkeypatch):
+    calls = {"n": 0}
+    async def flaky():
+        calls["n"] += 1
+        if calls["n"] < 3:
+            raise ConnectionError("redis down")
+    async def ok():
+        pass
+    monkeypatch.setattr(warmup, "steps", lambda: [("redis", flaky), ("tokenizer", ok)])
+    monkeypatch.setattr(warmup, "_BACKOFF_BASE_S", 0.001)
+    seen = []
+    async def main():
+        task = asyncio.create_task(warmup.warm_up())
+        while not task.done():
+            seen.append((warmup.readiness.ready, dict(warmup.readiness.steps["redis"])))
+            await asyncio.sleep(0)
+        await task
+    asyncio.run(main())
+    assert any(not ready and step.get("error") == "ConnectionError: redis down" for ready, step in seen)
+    assert warmup.readiness.ready and calls["n"] == 3
+    assert warmup.readiness.report()["steps"]["redis"]["ok"]
+
+
+def test_format_libraries_load_lazily():
+    import subprocess, sys
+    code = "import sys, ingest.extract; print(any(m in sys.modules for m in ('pdfplumber', 'docx', 'bs4')))"
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+    assert out.strip() == "False"
@@ -1,5 +1,5 @@
-from azure.search.documents import SearchClient
-from azure.search.documents.indexes import SearchIndexClient
+from azure.search.documents.aio import SearchClient
+from azure.search.documents.indexes.aio import SearchIndexClient
 from azure.search.documents.indexes.models import (
     SearchIndex,
     SearchField,
@@ -7,14 +7,21 @@ from azure.search.documents.indexes.models import (
     VectorSearch,
     VectorSearchProfile,
     HnswAlgorithmConfiguration,
+    ScalarQuantizationCompression,
+    BinaryQuantizationCompression,
+    RescoringOptions,
 )
 from azure.search.documents.models import VectorizedQuery
 from azure.core.credentials import AzureKeyCredential
-from azure.identity import DefaultAzureCredential
+from azure.identity.aio import DefaultAzureCredential
 from azure.core.exceptions import ResourceNotFoundError
 from core.config import settings
-from typing import List, Dict, Any
+from core.resources import resources
+from typing import Awaitable, Callable, List, Dict, Any, Optional
+import asyncio
 import logging
+from llm.scheduler import backoff_s
+from vector.batching import DeleteFailed, est_bytes as _est_bytes, run_limited, size_batches
 
 logger = logging.getLogger(__name__)
 
@@ -29,53 +36,69 @@ def get_credential():
         return AzureKeyCredential(settings.AZURE_SEARCH_API_KEY)
 
 
+def odata_str(value: str) -> str:
+    """Quote a string literal for an OData filter expression."""
+    return "'" + value.replace("'", "''") + "'"
+
+
 def get_search_client() -> SearchClient:
-    """Get Azure Search client with MSI or API key authentication."""
-    return SearchClient(
-        endpoint=settings.AZURE_SEARCH_ENDPOINT,
-        index_name=settings.AZURE_SEARCH_INDEX,
-        credential=get_credential()
-    )
+    """Get the shared, pooled Azure Search client (MSI or API key authentication)."""
+    return resources.search_client()
 
 
 def get_index_client() -> SearchIndexClient:
-    """Get Azure Search Index client for managing indexes."""
-    return SearchIndexClient(
-        endpoint=settings.AZURE_SEARCH_ENDPOINT,
-        credential=get_credential()
-    )
+    """Get the shared Azure Search Index client for managing indexes."""
+    return resources.index_client()
+
 
+def _compressions() -> list:
+    """Vector compression for VECTOR_QUANTIZATION; results are rescored with the original vectors."""
+    mode = settings.VECTOR_QUANTIZATION
+    rescoring = RescoringOptions(enable_rescoring=True, default_oversampling=settings.QUANT_OVERSAMPLING)
+    if mode == "int8":
+        return [ScalarQuantizationCompression(compression_name="vector-compression", rescoring_options=rescoring)]
+    if mode == "binary":
+        return [BinaryQuantizationCompression(compression_name="vector-compression", rescoring_options=rescoring)]
+    if mode != "none":
+        raise ValueError(f"unsupported VECTOR_QUANTIZATION: {mode}")
+    return []
 
-def create_index_if_not_exists() -> None:
+
+async def create_index_if_not_exists(index_name: Optional[str] = None, dim: Optional[int] = None) -> None:
     """
     Create the Azure Search index if it doesn't exist.
 
+    An existing index with a different vector dimension is never dropped;
+    use ``python -m vector.migrate`` to move the data to a new index.
+
     Index schema:
     - id: unique document ID
     - tenant_id: for multi-tenancy filtering
     - file_id: source file name
     - text: the actual text content
-    - text_vector: embedding vector (3072 dimensions for text-embedding-3-large)
+    - text_vector: embedding vector (EMBED_DIM dimensions)
     - source: source file name
     - hash: content hash for deduplication
-    - page: optional page number
+    - page: optional page number (first page of the chunk)
+    - page_end: optional last page of the chunk
+    - char_start / char_end: chunk offsets in the extracted document text
     - section: optional section name
     """
     index_client = get_index_client()
-    index_name = settings.AZURE_SEARCH_INDEX
+    index_name = index_name or settings.AZURE_SEARCH_INDEX
+    dim = dim or settings.EMBED_DIM
 
     # Check if index exists with correct dimensions
+    existing_index = None
     try:
-        existing_index = index_client.get_index(index_name)
+        existing_index = await index_client.get_index(index_name)
         for field in existing_index.fields:
             if field.name == "text_vector":
-                if field.vector_search_dimensions == 3072:
-                    logger.info(f"Index '{index_name}' already exists with correct dimensions")
-                    return
-                else:
-                    logger.warning(f"Index '{index_name}' has wrong dimensions ({field.vector_search_dimensions}), recreating...")
-                    index_client.delete_index(index_name)
-                    break
+                if field.vector_search_dimensions != dim:
+                    raise RuntimeError(
+                        f"Index '{index_name}' has {field.vector_search_dimensions} dims but EMBED_DIM={dim}; "
+                        f"run `python -m vector.migrate --dim {dim} --target <new index>`")
+                break
     except ResourceNotFoundError:
         logger.info(f"Index '{index_name}' not found, creating...")
 
@@ -89,23 +112,41 @@ def create_index_if_not_exists() -> None:
             name="text_vector",
             type=SearchFieldDataType.Collection(SearchFieldDataType.Single),
             searchable=True,
-            vector_search_dimensions=3072,
+            vector_search_dimensions=dim,
             vector_search_profile_name="vector-profile"
         ),
         SearchField(name="source", type=SearchFieldDataType.String, filterable=True),
         SearchField(name="hash", type=SearchFieldDataType.String, filterable=True),
         SearchField(name="page", type=SearchFieldDataType.Int32, filterable=True),
+        SearchField(name="page_end", type=SearchFieldDataType.Int32),
+        SearchField(name="char_start", type=SearchFieldDataType.Int32),
+        SearchField(name="char_end", type=SearchFieldDataType.Int32),
         SearchField(name="section", type=SearchFieldDataType.String, filterable=True),
     ]
 
+    if existing_index is not None:
+        # Adding fields is a non-breaking index update; no need to rebuild
+        have = {f.name for f in existing_index.fields}
+        missing = [f for f in fields if f.name not in have]
+        if missing:
+            existing_index.fields.extend(missing)
+            await index_client.create_or_update_index(existing_index)
+            logger.info(f"Added fields {[f.name for f in missing]} to index '{index_name}'")
+        else:
+            logger.info(f"Index '{index_name}' already exists with correct dimensions")
+        return
+
     # Configure vector search (HNSW algorithm for fast approximate search)
+    compressions = _compressions()
     vector_search = VectorSearch(
         profiles=[
             VectorSearchProfile(
                 name="vector-profile",
-                algorithm_configuration_name="hnsw-config"
+                algorithm_configuration_name="hnsw-config",
+                compression_name=compressions[0].compression_name if compressions else None,
             )
         ],
+        compressions=compressions,
         algorithms=[
             HnswAlgorithmConfiguration(
                 name="hnsw-config",
@@ -126,20 +167,11 @@ def create_index_if_not_exists() -> None:
         vector_search=vector_search
     )
 
-    index_client.create_index(index)
+    await index_client.create_index(index)
     logger.info(f"Created index '{index_name}' successfully")
 
 
-def get_search_client() -> SearchClient:
-    """Get Azure Search client with MSI or API key authentication."""
-    return SearchClient(
-        endpoint=settings.AZURE_SEARCH_ENDPOINT,
-        index_name=settings.AZURE_SEARCH_INDEX,
-        credential=get_credential()
-    )
-
-
-def upsert_chunks(chunks: List[Dict[str, Any]]) -> None:
+async def upsert_chunks(chunks: List[Dict[str, Any]]) -> None:
     """
     Upsert chunks to Azure Cognitive Search.
 
@@ -149,9 +181,6 @@ def upsert_chunks(chunks: List[Dict[str, Any]]) -> None:
     if not settings.AZURE_SEARCH_ENDPOINT:
         raise ValueError("AZURE_SEARCH_ENDPOINT not configured")
 
-    # Ensure index exists before upserting
-    create_index_if_not_exists()
-
     client = get_search_client()
 
     # Transform chunks to Azure Search document format
@@ -167,31 +196,76 @@ def upsert_chunks(chunks: List[Dict[str, Any]]) -> None:
             "hash": chunk["hash"],
         }
         # Optional fields
-        if chunk.get("page"):
-            doc["page"] = chunk["page"]
+        for key in ("page", "page_end", "char_start", "char_end"):
+            if chunk.get(key) is not None:
+                doc[key] = chunk[key]
         if chunk.get("section"):
             doc["section"] = chunk["section"]
 
         documents.append(doc)
 
     logger.info(f"Upserting {len(documents)} chunks to Azure Search index '{settings.AZURE_SEARCH_INDEX}'")
-    result = client.upload_documents(documents=documents)
+    batches = size_batches(documents, settings.UPSERT_BATCH_MAX_ITEMS, settings.UPSERT_BATCH_MAX_BYTES,
+                           size=_doc_bytes)
+    failed: List[str] = []
+
+    async def send(batch: List[Dict[str, Any]]) -> None:
+        failed.extend(await _index_with_retry(client.upload_documents, batch))
+
+    await run_limited(batches, send, settings.UPSERT_CONCURRENCY)
+    logger.info(f"Successfully uploaded {len(documents) - len(failed)}/{len(documents)} documents")
+    if failed:
+        raise RuntimeError(f"Failed to upload {len(failed)} documents to Azure Search (e.g. {failed[:3]})")
 
-    success_count = sum(1 for r in result if r.succeeded)
-    logger.info(f"Successfully uploaded {success_count}/{len(documents)} documents")
 
-    if success_count < len(documents):
-        logger.warning(f"Failed to upload {len(documents) - success_count} documents")
+# per-document statuses worth retrying: throttling, version conflicts, transient service errors
+_RETRY_STATUS = {409, 422, 429, 503}
+_RETRY_BASE_S = 0.5
+_RETRY_MAX_S = 10.0
 
 
-def search_chunks(query_vector: List[float], tenant_id: str, top_k: int = 5) -> List[Dict[str, Any]]:
+def _doc_bytes(doc: Dict[str, Any]) -> int:
+    return _est_bytes({"text": doc.get("text"), "vector": doc.get("text_vector")})
+
+
+async def _index_with_retry(action: Callable[..., Awaitable[list]], docs: List[Dict[str, Any]]) -> List[str]:
+    """Upload or delete a batch, re-sending only the documents that failed with a retryable status.
+
+    Returns the keys that still failed after UPSERT_MAX_RETRIES attempts.
     """
-    Search for similar chunks using vector similarity.
+    pending = docs
+    rejected: List[str] = []
+    for attempt in range(settings.UPSERT_MAX_RETRIES + 1):
+        if attempt:
+            logger.info(f"Retrying {len(pending)} documents (attempt {attempt})")
+            await asyncio.sleep(backoff_s(attempt, _RETRY_BASE_S, _RETRY_MAX_S))
+        result = await action(documents=pending)
+        by_key = {d["id"]: d for d in pending}
+        errors = [r for r in result if not r.succeeded]
+        hard = [r for r in errors if r.status_code not in _RETRY_STATUS]
+        if hard:
+            logger.warning(f"{len(hard)} documents rejected by Azure Search: {[r.error_message for r in hard[:3]]}")
+            rejected.extend(r.key for r in hard)
+        pending = [by_key[r.key] for r in errors if r.status_code in _RETRY_STATUS]
+        if not pending:
+            break
+    return rejected + [d["id"] for d in pending]
+
+
+async def search_chunks(query_vector: Optional[List[float]], tenant_id: str, top_k: int = 5,
+                        query_text: Optional[str] = None, with_vectors: bool = False) -> List[Dict[str, Any]]:
+    """
+    Search for similar chunks using vector similarity, full-text search, or both.
+
+    With both a vector and query_text, Azure runs a hybrid query and fuses the
+    two rankings with reciprocal-rank fusion on the service side.
 
     Args:
-        query_vector: Embedding vector for the query
+        query_vector: Embedding vector for the query (None for full-text only)
         tenant_id: Tenant ID to filter results
         top_k: Number of results to return
+        query_text: Optional text for BM25 full-text search over the "text" field
+        with_vectors: Also return each chunk's stored embedding as "vector"
 
     Returns:
         List of matching chunks with text and metadata
@@ -201,31 +275,78 @@ def search_chunks(query_vector: List[float], tenant_id: str, top_k: int = 5) ->
 
     client = get_search_client()
 
-    vector_query = VectorizedQuery(
-        vector=query_vector,
-        k_nearest_neighbors=top_k,
-        fields="text_vector"
-    )
-
-    results = client.search(
-        search_text=None,
-        vector_queries=[vector_query],
-        filter=f"tenant_id eq '{tenant_id}'",
-        select=["id", "text", "source", "file_id", "page", "section"],
+    vector_queries = None
+    if query_vector is not None:
+        vector_queries = [VectorizedQuery(
+            vector=query_vector,
+            k_nearest_neighbors=top_k,
+            fields="text_vector"
+        )]
+
+    select = ["id", "text", "source", "file_id", "page", "page_end", "char_start", "char_end", "section"]
+    if with_vectors:
+        select.append("text_vector")
+    results = await client.search(
+        search_text=query_text,
+        vector_queries=vector_queries,
+        filter=f"tenant_id eq {odata_str(tenant_id)}",
+        select=select,
         top=top_k
     )
 
     chunks = []
-    for result in results:
+    async for result in results:
         chunks.append({
             "id": result["id"],
             "text": result["text"],
             "source": result.get("source"),
             "file_id": result.get("file_id"),
             "page": result.get("page"),
+            "page_end": result.get("page_end"),
+            "char_start": result.get("char_start"),
+            "char_end": result.get("char_end"),
             "section": result.get("section"),
             "score": result.get("@search.score", 0.0)
         })
+        if with_vectors:
+            chunks[-1]["vector"] = result.get("text_vector")
 
     logger.info(f"Found {len(chunks)} chunks for tenant '{tenant_id}'")
     return chunks
+
+
+async def list_ids(tenant_id: str, file_id: str) -> set[str]:
+    """
+    List the IDs of all chunks stored for one file of a tenant.
+    """
+    if not settings.AZURE_SEARCH_ENDPOINT:
+        raise ValueError("AZURE_SEARCH_ENDPOINT not configured")
+
+    client = get_search_client()
+    results = await client.search(
+        search_text="*",
+        filter=f"tenant_id eq {odata_str(tenant_id)} and file_id eq {odata_str(file_id)}",
+        select=["id"],
+    )
+    return {r["id"] async for r in results}
+
+
+async def delete_ids(tenant_id: str, ids: List[str]) -> None:
+    """
+    Delete chunks by ID, in batches of at most UPSERT_BATCH_MAX_ITEMS (Azure accepts 1000 per request).
+
+    Raises DeleteFailed with the keys that could not be deleted after retries.
+    """
+    if not ids:
+        return
+    client = get_search_client()
+    batches = size_batches([{"id": i} for i in ids], min(settings.UPSERT_BATCH_MAX_ITEMS, 1000),
+                           settings.UPSERT_BATCH_MAX_BYTES, size=lambda d: len(d["id"]) + 16)
+    failed: List[str] = []
+
+    async def send(batch: List[Dict[str, Any]]) -> None:
+        failed.extend(await _index_with_retry(client.delete_documents, batch))
+
+    await run_limited(batches, send, settings.UPSERT_CONCURRENCY)
+    if failed:
+        raise DeleteFailed(failed, len(ids))
@@ -0,0 +1,53 @@
+"""
+Bounded, size-aware write batches sent with limited concurrency.
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, List, TypeVar
+
+T = TypeVar("T")
+
+
+class DeleteFailed(RuntimeError):
+    """Some IDs could not be deleted; ``failed`` lists them, the others are gone."""
+
+    def __init__(self, failed: List[str], total: int):
+        super().__init__(f"Failed to delete {len(failed)}/{total} documents (e.g. {failed[:3]})")
+        self.failed = failed
+
+
+# JSON-encoded float (sign, digits, exponent, separator) - a deliberately high estimate
+_FLOAT_BYTES = 20
+_OVERHEAD_BYTES = 256
+
+
+def est_bytes(item: Dict[str, Any]) -> int:
+    """Approximate request size of one chunk: its vector, its text and the metadata."""
+    return _OVERHEAD_BYTES + _FLOAT_BYTES * len(item.get("vector") or ()) + len((item.get("text") or "").encode("utf-8"))
+
+
+def size_batches(items: List[T], max_items: int, max_bytes: int, size: Callable[[T], int] = est_bytes) -> List[List[T]]:
+    """Greedy, order-preserving split bounded by item count and estimated request bytes."""
+    batches: List[List[T]] = []
+    cur: List[T] = []
+    cur_bytes = 0
+    for it in items:
+        n = size(it)
+        if cur and (len(cur) >= max_items or cur_bytes + n > max_bytes):
+            batches.append(cur)
+            cur, cur_bytes = [], 0
+        cur.append(it)
+        cur_bytes += n
+    if cur:
+        batches.append(cur)
+    return batches
+
+
+async def run_limited(batches: List[List[T]], send: Callable[[List[T]], Awaitable[None]], concurrency: int) -> None:
+    """Send every batch with at most ``concurrency`` requests in flight; the first failure is raised."""
+    sem = asyncio.Semaphore(max(1, concurrency))
+
+    async def _one(batch: List[T]) -> None:
+        async with sem:
+            await send(batch)
+
+    await asyncio.gather(*(_one(b) for b in batches))
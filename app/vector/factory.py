@@ -1,54 +1,242 @@
 """
-Vector store factory - automatically selects Qdrant (local) or Azure Search (cloud).
+Vector store factory - selects Azure Search (cloud), a Qdrant server, or the
+in-process memmap store (vector/local_store.py).
+
+The backend is resolved once per process; every backend exposes the same async
+contract (ensure_schema / upsert_chunks / search_chunks / list_ids / delete_ids)
+returning plain dicts.
+
+Hybrid retrieval: Azure Search fuses full-text and vector rankings natively.
+Other backends are paired with the embedded per-tenant BM25 index in
+vector/lexical.py, kept in sync on upsert/delete and fused here with
+reciprocal-rank fusion.
 """
 from core.config import settings
-from typing import List, Dict, Any
+from vector.batching import DeleteFailed
+from dataclasses import dataclass
+from functools import lru_cache
+from itertools import groupby
+from operator import itemgetter
+from typing import AsyncIterator, Awaitable, Callable, List, Dict, Any, Optional, Set
+import asyncio
 import logging
 
 logger = logging.getLogger(__name__)
 
+_schema_ready = False
+
+
+@dataclass(frozen=True)
+class VectorBackend:
+    name: str
+    ensure_schema: Callable[[], Awaitable[None]]
+    upsert_chunks: Callable[[List[Dict[str, Any]]], Awaitable[None]]
+    search_chunks: Callable[..., Awaitable[List[Dict[str, Any]]]]
+    list_ids: Callable[[str, str], Awaitable[Set[str]]]
+    delete_ids: Callable[[str, List[str]], Awaitable[None]]
+    iter_tenant_chunks: Optional[Callable[[str], AsyncIterator[List[Dict[str, Any]]]]] = None
+    partition_of: Optional[Callable[[str], Awaitable[str]]] = None
+    move_tenant: Optional[Callable[[str, str], Awaitable[int]]] = None
+
 
 def get_vector_store_type() -> str:
     """
     Determine which vector store to use based on environment.
 
     Returns:
-        "azure_search" if Azure Search endpoint is configured, otherwise "qdrant"
+        VECTOR_STORE if set explicitly ("azure_search", "qdrant" or "local"),
+        otherwise "azure_search" if Azure Search endpoint is configured, else "qdrant"
     """
+    if settings.VECTOR_STORE != "auto":
+        return settings.VECTOR_STORE
     if settings.AZURE_SEARCH_ENDPOINT:
         return "azure_search"
     return "qdrant"
 
 
-def upsert_chunks(chunks: List[Dict[str, Any]]) -> None:
-    """
-    Upsert chunks to the appropriate vector store.
-
-    Automatically uses Azure Search if configured, otherwise falls back to Qdrant.
-    """
+@lru_cache(maxsize=1)
+def get_backend() -> VectorBackend:
+    """Resolve the configured backend once and cache it for the process lifetime."""
     store_type = get_vector_store_type()
     logger.info(f"Using vector store: {store_type}")
 
     if store_type == "azure_search":
-        from vector.azure_search_client import upsert_chunks as azure_upsert
-        azure_upsert(chunks)
-    else:
-        from vector.qdrant_client import upsert_chunks as qdrant_upsert
-        qdrant_upsert(chunks)
+        from vector import azure_search_client as m
+        return VectorBackend(
+            name=store_type,
+            ensure_schema=m.create_index_if_not_exists,
+            upsert_chunks=m.upsert_chunks,
+            search_chunks=m.search_chunks,
+            list_ids=m.list_ids,
+            delete_ids=m.delete_ids,
+        )
+    if store_type == "local":
+        from vector import local_store as m
+        return VectorBackend(
+            name=store_type,
+            ensure_schema=m.ensure_store,
+            upsert_chunks=m.upsert_chunks,
+            search_chunks=m.search_chunks,
+            list_ids=m.list_ids,
+            delete_ids=m.delete_ids,
+            iter_tenant_chunks=m.iter_tenant_chunks,
+        )
+    if store_type == "qdrant":
+        from vector import qdrant_client as m
+        return VectorBackend(
+            name=store_type,
+            ensure_schema=m.ensure_collection,
+            upsert_chunks=m.upsert_chunks,
+            search_chunks=m.search_chunks,
+            list_ids=m.list_ids,
+            delete_ids=m.delete_ids,
+            iter_tenant_chunks=m.iter_tenant_chunks,
+            partition_of=m.partition_of,
+            move_tenant=m.move_tenant,
+        )
+    raise ValueError(f"Unknown VECTOR_STORE: {store_type}")
+
+
+def native_full_text() -> bool:
+    """True when the backend does its own full-text search (no embedded BM25 index needed)."""
+    return get_backend().name == "azure_search"
 
 
-def search_chunks(query_vector: List[float], tenant_id: str, top_k: int = 5) -> List[Dict[str, Any]]:
+def _local_lexical() -> bool:
+    return settings.LEXICAL_ENABLED and not native_full_text()
+
+
+async def ensure_schema() -> None:
     """
-    Search for similar chunks in the appropriate vector store.
+    Create or verify the index/collection once per process.
 
-    Automatically uses Azure Search if configured, otherwise falls back to Qdrant.
+    Called from the app lifespan; upsert_chunks() retries it only if the startup check failed.
     """
-    store_type = get_vector_store_type()
-    logger.info(f"Using vector store: {store_type}")
+    global _schema_ready
+    if _schema_ready:
+        return
+    await get_backend().ensure_schema()
+    _schema_ready = True
 
-    if store_type == "azure_search":
-        from vector.azure_search_client import search_chunks as azure_search
-        return azure_search(query_vector, tenant_id, top_k)
-    else:
-        from vector.qdrant_client import search_chunks as qdrant_search
-        return qdrant_search(query_vector, tenant_id, top_k)
+
+async def upsert_chunks(chunks: List[Dict[str, Any]]) -> None:
+    """
+    Upsert chunks to the configured vector store.
+    """
+    await ensure_schema()
+    await get_backend().upsert_chunks(chunks)
+    if _local_lexical():
+        from vector.lexical import tenant_index
+        for tenant, items in groupby(sorted(chunks, key=itemgetter("tenant_id")), key=itemgetter("tenant_id")):
+            await asyncio.to_thread(tenant_index(tenant).add, list(items))
+
+
+async def search_chunks(query_vector: List[float], tenant_id: str, top_k: int = 5,
+                        query_text: Optional[str] = None, mmr: bool = False,
+                        mmr_fetch: Optional[int] = None, mmr_lambda: Optional[float] = None) -> List[Dict[str, Any]]:
+    """
+    Search for similar chunks in the configured vector store.
+
+    With query_text (and LEXICAL_ENABLED), vector and BM25 rankings are fused.
+    With mmr, ``top_k * mmr_fetch`` vector candidates are fetched with their
+    embeddings and ``top_k`` diverse ones are kept (vector/mmr.py); for the
+    embedded BM25 index this happens before fusion, since its hits carry no
+    vectors.
+    """
+    backend = get_backend()
+    hybrid = bool(query_text) and settings.LEXICAL_ENABLED
+    if mmr:
+        from vector.mmr import diversify
+        fetch = top_k * (mmr_fetch or settings.MMR_FETCH_MULTIPLIER)
+        lam = settings.MMR_LAMBDA if mmr_lambda is None else mmr_lambda
+    if hybrid and native_full_text():
+        if not mmr:
+            return await backend.search_chunks(query_vector, tenant_id, top_k, query_text=query_text)
+        hits = await backend.search_chunks(query_vector, tenant_id, fetch, query_text=query_text, with_vectors=True)
+        return diversify(query_vector, hits, top_k, lam)
+    if not hybrid:
+        if not mmr:
+            return await backend.search_chunks(query_vector, tenant_id, top_k)
+        hits = await backend.search_chunks(query_vector, tenant_id, fetch, with_vectors=True)
+        return diversify(query_vector, hits, top_k, lam)
+
+    from vector.lexical import rrf_fuse, tenant_index
+    fetch_k = top_k * settings.HYBRID_FETCH_MULTIPLIER
+    vec_search = (backend.search_chunks(query_vector, tenant_id, fetch, with_vectors=True) if mmr
+                  else backend.search_chunks(query_vector, tenant_id, fetch_k))
+    vec_hits, lex_hits = await asyncio.gather(
+        vec_search,
+        asyncio.to_thread(tenant_index(tenant_id).search, query_text, fetch_k),
+    )
+    if mmr:
+        vec_hits = diversify(query_vector, vec_hits, top_k, lam)
+    return rrf_fuse([vec_hits, lex_hits], top_k, settings.RRF_K)
+
+
+async def lexical_search(tenant_id: str, query_text: str, top_k: int = 5) -> List[Dict[str, Any]]:
+    """
+    Full-text only search (no embedding needed).
+    """
+    if native_full_text():
+        return await get_backend().search_chunks(None, tenant_id, top_k, query_text=query_text)
+    from vector.lexical import tenant_index
+    return await asyncio.to_thread(tenant_index(tenant_id).search, query_text, top_k)
+
+
+async def tenant_partition(tenant_id: str) -> str:
+    """
+    Where a tenant's vectors live: "shared" (filtered by tenant_id) or "dedicated".
+    """
+    backend = get_backend()
+    if backend.partition_of is not None:
+        return await backend.partition_of(tenant_id)
+    # the local store keeps one file set per tenant; Azure Search uses one filtered index
+    return "dedicated" if backend.name == "local" else "shared"
+
+
+async def move_tenant(tenant_id: str, mode: str) -> int:
+    """
+    Move a tenant's vectors between shared and dedicated storage.
+    """
+    backend = get_backend()
+    if backend.move_tenant is None:
+        raise ValueError(f"the {backend.name} backend does not support moving tenants")
+    return await backend.move_tenant(tenant_id, mode)
+
+
+async def rebuild_lexical(tenant_id: str) -> int:
+    """
+    Re-index all stored chunks of a tenant into the embedded BM25 index.
+
+    Needed once for data ingested before the lexical index existed.
+    """
+    backend = get_backend()
+    if not _local_lexical() or backend.iter_tenant_chunks is None:
+        return 0
+    from vector.lexical import tenant_index
+    idx = tenant_index(tenant_id)
+    n = 0
+    async for batch in backend.iter_tenant_chunks(tenant_id):
+        await asyncio.to_thread(idx.add, batch)
+        n += len(batch)
+    return n
+
+
+async def list_ids(tenant_id: str, file_id: str) -> Set[str]:
+    """
+    IDs of the chunks currently stored for one file of a tenant.
+    """
+    await ensure_schema()
+    return await get_backend().list_ids(tenant_id, file_id)
+
+
+async def delete_ids(tenant_id: str, ids: List[str]) -> None:
+    """
+    Delete chunks of a tenant by ID from the configured vector store.
+
+    Raises DeleteFailed (listing the IDs that are still stored) if some could not be deleted.
+    """
+    await get_backend().delete_ids(tenant_id, ids)
+    if ids and _local_lexical():
+        from vector.lexical import tenant_index
+        await asyncio.to_thread(tenant_index(tenant_id).delete, ids)
@@ -0,0 +1,244 @@
+"""
+Embedded per-tenant BM25 index for backends without native full-text search.
+
+Each tenant gets one SQLite file under LEXICAL_INDEX_DIR, named by its tenant
+slug (vector/naming.py) and recording the tenant it belongs to. Postings are stored
+as (term, doc, tf) in a WITHOUT ROWID table keyed by term, document payloads
+and per-document term counts are zlib-compressed JSON, and document frequencies
+and corpus totals are maintained incrementally on add/delete, so queries only
+touch the postings of the query terms.
+
+Stopwords are neither indexed nor searched, and query terms found in more than
+LEXICAL_MAX_DF_RATIO of a tenant's chunks (and in more than MIN_DF_CUTOFF) are
+dropped, which bounds the postings a query reads; BM25 scores and the top-k are
+computed in SQLite.
+Searches use one read connection per thread, so under WAL they run alongside
+each other and alongside writes.
+
+The index lives on the local disk of the process that ingested the chunks.
+Replicas sharing one Qdrant collection each hold only what they ingested
+themselves: run a single ingesting replica, or POST /admin/lexical/rebuild on
+each replica after ingest. Do not put LEXICAL_INDEX_DIR on a network share
+(SQLite WAL needs local shared memory).
+"""
+import json, logging, math, os, re, sqlite3, threading, zlib
+from collections import Counter
+from typing import Any, Dict, List, Optional
+from core.config import settings
+from vector.naming import TenantMismatch, legacy_slug, tenant_slug
+
+logger = logging.getLogger(__name__)
+
+_TOKEN = re.compile(r"\w+(?:[-./]\w+)*")
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS docs (n INTEGER PRIMARY KEY, id TEXT UNIQUE NOT NULL, len INTEGER NOT NULL, terms BLOB NOT NULL, payload BLOB NOT NULL);
+CREATE TABLE IF NOT EXISTS postings (term TEXT NOT NULL, doc INTEGER NOT NULL, tf INTEGER NOT NULL, PRIMARY KEY (term, doc)) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS terms (term TEXT PRIMARY KEY, df INTEGER NOT NULL) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS owner (tenant_id TEXT NOT NULL);
+"""
+_STOPWORDS = frozenset("""
+a about above after again against all also am an and any are as at be because been before being below between
+both but by can could did do does doing down during each few for from further had has have having he her here
+hers him his how i if in into is it its itself just me more most my no nor not of off on once only or other our
+ours out over own same she should so some such than that the their theirs them then there these they this those
+through to too under until up very was we were what when where which while who whom why will with would you your
+""".split())
+MIN_DF_CUTOFF = 100
+PAYLOAD_FIELDS = ("text", "source", "file_id", "page", "page_end", "char_start", "char_end", "section")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word tokens without stopwords; compound identifiers (ISO-27001, A.5.1) are kept whole and split."""
+    out = []
+    for m in _TOKEN.finditer(text.lower()):
+        tok = m.group(0)
+        out.append(tok)
+        if not tok.isalnum():
+            out.extend(p for p in re.split(r"[-./]", tok) if p)
+    return [t for t in out if t not in _STOPWORDS]
+
+
+def _pack(obj: Any) -> bytes:
+    return zlib.compress(json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+
+
+def _unpack(raw: bytes) -> Any:
+    return json.loads(zlib.decompress(raw))
+
+
+class LexicalIndex:
+    def __init__(self, path: str, k1: float = 1.2, b: float = 0.75, tenant_id: Optional[str] = None):
+        self.k1, self.b = k1, b
+        self._path = path
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._readers: List[sqlite3.Connection] = []
+        self._readers_lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+        if tenant_id is not None:
+            self._claim(path, tenant_id)
+
+    def _claim(self, path: str, tenant_id: str) -> None:
+        row = self._db.execute("SELECT tenant_id FROM owner").fetchone()
+        if row is None:
+            with self._db:
+                self._db.execute("INSERT INTO owner(tenant_id) VALUES (?)", (tenant_id,))
+        elif row[0] != tenant_id:
+            self._db.close()
+            raise TenantMismatch(f"Lexical index {path} belongs to tenant {row[0]!r}, not {tenant_id!r}")
+
+    def _meta(self, key: str) -> int:
+        row = self._db.execute("SELECT value FROM meta WHERE key=?", (key,)).fetchone()
+        return row[0] if row else 0
+
+    def _bump_meta(self, key: str, delta: int) -> None:
+        self._db.execute("INSERT INTO meta(key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value=value+excluded.value", (key, delta))
+
+    def _delete_locked(self, ids: List[str]) -> None:
+        for i in ids:
+            row = self._db.execute("SELECT n, len, terms FROM docs WHERE id=?", (i,)).fetchone()
+            if row is None:
+                continue
+            n, length, terms = row
+            tfs = _unpack(terms)
+            self._db.executemany("DELETE FROM postings WHERE term=? AND doc=?", [(t, n) for t in tfs])
+            self._db.executemany("UPDATE terms SET df=df-1 WHERE term=?", [(t,) for t in tfs])
+            self._db.execute("DELETE FROM docs WHERE n=?", (n,))
+            self._bump_meta("docs", -1)
+            self._bump_meta("tokens", -length)
+
+    def add(self, items: List[Dict[str, Any]]) -> None:
+        """Index chunks (same dicts as upsert_chunks); re-adding an ID replaces it."""
+        with self._lock, self._db:
+            self._delete_locked([i["id"] for i in items])
+            for item in items:
+                toks = tokenize(item.get("text") or "")
+                tfs = Counter(toks)
+                payload = {k: item.get(k) for k in PAYLOAD_FIELDS}
+                cur = self._db.execute("INSERT INTO docs(id, len, terms, payload) VALUES (?, ?, ?, ?)",
+                                       (item["id"], len(toks), _pack(tfs), _pack(payload)))
+                n = cur.lastrowid
+                self._db.executemany("INSERT INTO postings(term, doc, tf) VALUES (?, ?, ?)", [(t, n, c) for t, c in tfs.items()])
+                self._db.executemany("INSERT INTO terms(term, df) VALUES (?, 1) ON CONFLICT(term) DO UPDATE SET df=df+1", [(t,) for t in tfs])
+                self._bump_meta("docs", 1)
+                self._bump_meta("tokens", len(toks))
+
+    def delete(self, ids: List[str]) -> None:
+        with self._lock, self._db:
+            self._delete_locked(ids)
+            self._db.execute("DELETE FROM terms WHERE df <= 0")
+
+    def _reader(self) -> sqlite3.Connection:
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self._path, check_same_thread=False, isolation_level=None)
+            with self._readers_lock:
+                self._readers.append(db)
+            self._local.db = db
+        return db
+
+    def search(self, query: str, top_k: int = 5) -> List[Dict[str, Any]]:
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+        db = self._reader()
+        db.execute("BEGIN")  # one snapshot for totals, dfs and postings
+        try:
+            return self._search(db, terms, top_k)
+        finally:
+            db.execute("COMMIT")
+
+    def _search(self, db: sqlite3.Connection, terms: List[str], top_k: int) -> List[Dict[str, Any]]:
+        meta = dict(db.execute("SELECT key, value FROM meta"))
+        n_docs = meta.get("docs", 0)
+        if not n_docs:
+            return []
+        avgdl = max(meta.get("tokens", 0) / n_docs, 1.0)
+        marks = ",".join("?" * len(terms))
+        dfs = dict(db.execute(f"SELECT term, df FROM terms WHERE term IN ({marks}) AND df > 0", terms))
+        if not dfs:
+            return []
+        max_df = max(MIN_DF_CUTOFF, settings.LEXICAL_MAX_DF_RATIO * n_docs)
+        kept = {t: df for t, df in dfs.items() if df <= max_df}
+        if not kept:
+            return []
+        weights = [(t, math.log(1 + (n_docs - df + 0.5) / (df + 0.5))) for t, df in kept.items()]
+        # idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * len / avgdl))
+        c = (self.k1 + 1, self.k1 * (1 - self.b), self.k1 * self.b / avgdl)
+        rows = db.execute(
+            f"WITH q(term, idf) AS (VALUES {','.join(['(?, ?)'] * len(weights))}) "
+            "SELECT d.id, d.payload, SUM(q.idf * p.tf * ? / (p.tf + ? + ? * d.len)) AS score "
+            "FROM q JOIN postings p ON p.term = q.term JOIN docs d ON d.n = p.doc "
+            "GROUP BY p.doc ORDER BY score DESC LIMIT ?",
+            [x for w in weights for x in w] + [*c, top_k])
+        return [{"id": cid, **_unpack(payload), "score": score} for cid, payload, score in rows]
+
+    def close(self) -> None:
+        with self._readers_lock:
+            for db in self._readers:
+                db.close()
+            self._readers.clear()
+        self._db.close()
+
+
+_indexes: Dict[str, LexicalIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def _index_path(tenant_id: str) -> str:
+    path = os.path.join(settings.LEXICAL_INDEX_DIR, f"{tenant_slug(tenant_id)}.db")
+    legacy = os.path.join(settings.LEXICAL_INDEX_DIR, f"{legacy_slug(tenant_id)}.db")
+    # indexes from before hashed names: adopt one only where the old name was the ID itself
+    if legacy_slug(tenant_id) == tenant_id and not os.path.exists(path) and os.path.isfile(legacy):
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(legacy + suffix):
+                os.rename(legacy + suffix, path + suffix)
+        logger.info(f"Moved lexical index of tenant {tenant_id!r} to {path}")
+    return path
+
+
+def tenant_index(tenant_id: str) -> LexicalIndex:
+    with _indexes_lock:
+        if tenant_id not in _indexes:
+            os.makedirs(settings.LEXICAL_INDEX_DIR, exist_ok=True)
+            _indexes[tenant_id] = LexicalIndex(_index_path(tenant_id), tenant_id=tenant_id)
+        return _indexes[tenant_id]
+
+
+def close_all() -> None:
+    with _indexes_lock:
+        for idx in _indexes.values():
+            idx.close()
+        _indexes.clear()
+
+
+def rrf_fuse(result_lists: List[List[Dict[str, Any]]], top_k: int, k: int = 60) -> List[Dict[str, Any]]:
+    """Reciprocal-rank fusion of ranked hit lists (by ``id``); ``score`` becomes the fused score."""
+    fused: Dict[str, Dict[str, Any]] = {}
+    scores: Dict[str, float] = {}
+    for hits in result_lists:
+        for rank, h in enumerate(hits):
+            fused.setdefault(h["id"], h)
+            scores[h["id"]] = scores.get(h["id"], 0.0) + 1.0 / (k + rank + 1)
+    best = sorted(scores, key=scores.get, reverse=True)[:top_k]
+    return [{**fused[i], "score": scores[i]} for i in best]
+
+
+_ID_LIKE = re.compile(r"(?=.*\d)[\w][\w\-./§]*|[A-Z]{2,}[\w\-./]*")
+
+
+def is_identifier_query(q: str, max_words: int = 3) -> bool:
+    """Queries that are nothing but an identifier (part number, clause ID, acronym), which embeddings handle poorly.
+
+    Every word must look like an ID, and a multi-word query needs a digit somewhere ("ISO 27001", not
+    "WHAT IS GDPR"), so ordinary short questions ("What is GDPR?", "revenue in 2023") still get vector search.
+    """
+    words = [w.strip(",.;:?\"'") for w in q.split()]
+    words = [w for w in words if w]
+    if not 0 < len(words) <= max_words or not all(_ID_LIKE.fullmatch(w) for w in words):
+        return False
+    return len(words) == 1 or any(c.isdigit() for c in "".join(words))
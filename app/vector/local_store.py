@@ -0,0 +1,362 @@
+"""
+In-process vector store: per-tenant float32 matrices in memory-mapped files.
+
+Layout under LOCAL_STORE_DIR/<tenant slug>/ (see vector/naming.py):
+
+- ``vectors.f32``: unit-normalised rows, appended in slot order (the append
+  log). Capacity grows by doubling; rows past the committed count are ignored
+  on open, so a crash between the vector write and the payload commit loses
+  nothing but the unfinished batch.
+- ``chunks.db``: SQLite side store mapping slot -> chunk id, file id and the
+  zlib-compressed JSON payload. Replaced or deleted slots become tombstones
+  and are reclaimed by compaction once they outnumber the live rows.
+
+Search is an exact matrix-vector product with ``argpartition`` top-k. Tenants
+with at least LOCAL_IVF_MIN_ROWS rows (0 = off) use an IVF partitioning: rows
+are clustered with spherical k-means and only the LOCAL_IVF_NPROBE closest
+clusters are scored. With VECTOR_QUANTIZATION set, candidates are shortlisted
+on int8/binary codes held in RAM and only the shortlist is read from the
+float32 file for rescoring, so the page cache need not hold the full matrix.
+"""
+import json, logging, os, sqlite3, threading, zlib
+import asyncio
+from itertools import groupby
+from operator import itemgetter
+from typing import Any, AsyncIterator, Dict, List, Optional, Set
+import numpy as np
+from core.config import settings
+from vector.naming import TenantMismatch, legacy_slug, tenant_slug
+from vector.quantize import Codes
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS chunks (slot INTEGER PRIMARY KEY, id TEXT UNIQUE NOT NULL, file_id TEXT, payload BLOB NOT NULL);
+CREATE INDEX IF NOT EXISTS chunks_file ON chunks(file_id);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS owner (tenant_id TEXT NOT NULL);
+"""
+PAYLOAD_FIELDS = ("text", "source", "file_id", "page", "page_end", "char_start", "char_end", "section")
+_MIN_CAPACITY = 1024
+_ASSIGN_BLOCK = 65536
+
+
+def _unit_rows(m: np.ndarray) -> np.ndarray:
+    n = np.linalg.norm(m, axis=1, keepdims=True)
+    n[n == 0] = 1.0
+    return m / n
+
+
+def _top(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the ``k`` highest scores, best first."""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.zeros(0, dtype=np.int64)
+    best = np.argpartition(-scores, k - 1)[:k]
+    return best[np.argsort(-scores[best])]
+
+
+def kmeans(x: np.ndarray, k: int, iters: int = 10, seed: int = 0) -> np.ndarray:
+    """Spherical k-means on unit rows; returns unit centroids of shape (k, dim)."""
+    rng = np.random.default_rng(seed)
+    cent = x[rng.choice(len(x), size=k, replace=False)].copy()
+    for _ in range(iters):
+        assign = np.argmax(x @ cent.T, axis=1)
+        sums = np.zeros_like(cent)
+        np.add.at(sums, assign, x)
+        empty = ~sums.any(axis=1)
+        sums[empty] = x[rng.choice(len(x), size=int(empty.sum()))]
+        cent = _unit_rows(sums)
+    return cent
+
+
+class TenantStore:
+    def __init__(self, path: str, tenant_id: Optional[str] = None):
+        os.makedirs(path, exist_ok=True)
+        self._lock = threading.Lock()
+        self._vec_path = os.path.join(path, "vectors.f32")
+        self._db = sqlite3.connect(os.path.join(path, "chunks.db"), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+        if tenant_id is not None:
+            self._claim(path, tenant_id)
+        self.dim = self._meta("dim")
+        self.n = self._meta("count")
+        self._mat: Optional[np.memmap] = None
+        self._alive = np.zeros(0, dtype=bool)
+        self._ivf = None  # (centroids, assignment per slot, rows at training time)
+        self._codes: Optional[Codes] = None
+        if self.dim:
+            self._open(max(_MIN_CAPACITY, self.n))
+            self._alive = np.zeros(len(self._mat), dtype=bool)
+            slots = [s for (s,) in self._db.execute("SELECT slot FROM chunks")]
+            self._alive[np.asarray(slots, dtype=np.int64)] = True
+            self._init_codes()
+
+    def _claim(self, path: str, tenant_id: str) -> None:
+        row = self._db.execute("SELECT tenant_id FROM owner").fetchone()
+        if row is None:
+            with self._db:
+                self._db.execute("INSERT INTO owner(tenant_id) VALUES (?)", (tenant_id,))
+        elif row[0] != tenant_id:
+            self._db.close()
+            raise TenantMismatch(f"Local store {path} belongs to tenant {row[0]!r}, not {tenant_id!r}")
+
+    def _init_codes(self) -> None:
+        """Quantized codes live in RAM only and are rebuilt from the full-precision file on open."""
+        if settings.VECTOR_QUANTIZATION == "none":
+            return
+        self._codes = Codes(settings.VECTOR_QUANTIZATION, self.dim)
+        self._codes.resize(len(self._mat))
+        for s in range(0, self.n, _ASSIGN_BLOCK):
+            self._codes.set(s, self._mat[s:min(s + _ASSIGN_BLOCK, self.n)])
+
+    def _meta(self, key: str) -> int:
+        row = self._db.execute("SELECT value FROM meta WHERE key=?", (key,)).fetchone()
+        return row[0] if row else 0
+
+    def _set_meta(self, key: str, value: int) -> None:
+        self._db.execute("INSERT INTO meta(key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value=excluded.value", (key, value))
+
+    def _open(self, capacity: int) -> None:
+        size = capacity * self.dim * 4
+        if not os.path.exists(self._vec_path) or os.path.getsize(self._vec_path) < size:
+            with open(self._vec_path, "ab") as f:
+                f.truncate(size)
+        rows = os.path.getsize(self._vec_path) // (self.dim * 4)
+        self._mat = np.memmap(self._vec_path, dtype=np.float32, mode="r+", shape=(rows, self.dim))
+
+    def _reserve(self, extra: int) -> None:
+        need = self.n + extra
+        if need <= len(self._mat):
+            return
+        cap = max(need, 2 * len(self._mat))
+        self._mat.flush()
+        self._mat = None
+        self._open(cap)
+        alive = np.zeros(len(self._mat), dtype=bool)
+        alive[:len(self._alive)] = self._alive
+        self._alive = alive
+
+    @property
+    def live(self) -> int:
+        return int(self._alive[:self.n].sum())
+
+    def upsert(self, items: List[Dict[str, Any]]) -> None:
+        if not items:
+            return
+        items = list({i["id"]: i for i in items}.values())
+        vecs = _unit_rows(np.asarray([i["vector"] for i in items], dtype=np.float32))
+        with self._lock:
+            if not self.dim:
+                self.dim = vecs.shape[1]
+                with self._db:
+                    self._set_meta("dim", self.dim)
+                self._open(_MIN_CAPACITY)
+                self._alive = np.zeros(len(self._mat), dtype=bool)
+                self._init_codes()
+            if vecs.shape[1] != self.dim:
+                raise ValueError(f"vector dimension {vecs.shape[1]} does not match store dimension {self.dim}")
+            self._reserve(len(items))
+            start = self.n
+            self._mat[start:start + len(items)] = vecs
+            self._mat.flush()
+            if self._codes is not None:
+                self._codes.set(start, vecs)
+            marks = ",".join("?" * len(items))
+            old = [s for (s,) in self._db.execute(f"SELECT slot FROM chunks WHERE id IN ({marks})", [i["id"] for i in items])]
+            with self._db:
+                self._db.execute(f"DELETE FROM chunks WHERE id IN ({marks})", [i["id"] for i in items])
+                self._db.executemany("INSERT INTO chunks(slot, id, file_id, payload) VALUES (?, ?, ?, ?)", [
+                    (start + j, i["id"], i.get("file_id"), _pack({k: i.get(k) for k in PAYLOAD_FIELDS}))
+                    for j, i in enumerate(items)])
+                self._set_meta("count", start + len(items))
+            self._alive[old] = False
+            self._alive[start:start + len(items)] = True
+            self.n = start + len(items)
+            if self._ivf is not None:
+                cent, assign, trained = self._ivf
+                if self.n > 2 * trained:
+                    self._ivf = None
+                else:
+                    assign = np.resize(assign, len(self._mat))
+                    assign[start:self.n] = np.argmax(vecs @ cent.T, axis=1)
+                    self._ivf = (cent, assign, trained)
+
+    def delete(self, ids: List[str]) -> None:
+        if not ids or not self.dim:
+            return
+        marks = ",".join("?" * len(ids))
+        with self._lock:
+            slots = [s for (s,) in self._db.execute(f"SELECT slot FROM chunks WHERE id IN ({marks})", ids)]
+            with self._db:
+                self._db.execute(f"DELETE FROM chunks WHERE id IN ({marks})", ids)
+            self._alive[slots] = False
+            if self.n - self.live > max(_MIN_CAPACITY, self.live):
+                self._compact()
+
+    def _compact(self) -> None:
+        keep = np.flatnonzero(self._alive[:self.n])
+        logger.info(f"Compacting local vector store {self._vec_path}: {self.n} -> {len(keep)} rows")
+        self._mat[:len(keep)] = self._mat[keep]
+        self._mat.flush()
+        if self._codes is not None:
+            self._codes.data[:len(keep)] = self._codes.data[keep]
+            self._codes.scale[:len(keep)] = self._codes.scale[keep]
+        with self._db:
+            self._db.execute("UPDATE chunks SET slot = -1 - slot")
+            self._db.executemany("UPDATE chunks SET slot=? WHERE slot=?", [(new, -1 - int(old)) for new, old in enumerate(keep)])
+            self._set_meta("count", len(keep))
+        self.n = len(keep)
+        self._alive[:] = False
+        self._alive[:self.n] = True
+        self._ivf = None
+
+    def list_ids(self, file_id: str) -> Set[str]:
+        with self._lock:
+            return {i for (i,) in self._db.execute("SELECT id FROM chunks WHERE file_id=?", (file_id,))}
+
+    def iter_payloads(self, batch: int = 500, with_vectors: bool = False):
+        last = -1
+        while True:
+            with self._lock:
+                rows = self._db.execute("SELECT slot, id, payload FROM chunks WHERE slot > ? ORDER BY slot LIMIT ?", (last, batch)).fetchall()
+                vecs = np.asarray(self._mat[[r[0] for r in rows]]) if with_vectors and rows else None
+            if not rows:
+                return
+            last = rows[-1][0]
+            out = [{**_unpack(p), "id": i} for _, i, p in rows]
+            if vecs is not None:
+                for item, v in zip(out, vecs):
+                    item["vector"] = v
+            yield out
+
+    def _train_ivf(self) -> None:
+        live = np.flatnonzero(self._alive[:self.n])
+        nlist = int(np.clip(np.sqrt(len(live)), 16, 4096))
+        rng = np.random.default_rng(0)
+        sample = self._mat[np.sort(rng.choice(live, size=min(len(live), 64 * nlist), replace=False))]
+        cent = kmeans(np.asarray(sample), nlist)
+        assign = np.empty(len(self._mat), dtype=np.int32)
+        for s in range(0, self.n, _ASSIGN_BLOCK):
+            e = min(s + _ASSIGN_BLOCK, self.n)
+            assign[s:e] = np.argmax(self._mat[s:e] @ cent.T, axis=1)
+        self._ivf = (cent, assign, self.n)
+
+    def _candidates(self, q: np.ndarray) -> Optional[np.ndarray]:
+        """Slots to score: the probed IVF clusters, or None for every row."""
+        min_rows = settings.LOCAL_IVF_MIN_ROWS
+        if not min_rows or self.live < min_rows:
+            return None
+        if self._ivf is None:
+            self._train_ivf()
+        cent, assign, _ = self._ivf
+        nprobe = min(settings.LOCAL_IVF_NPROBE, len(cent))
+        probe = np.argpartition(-(cent @ q), nprobe - 1)[:nprobe]
+        return np.flatnonzero(np.isin(assign[:self.n], probe) & self._alive[:self.n])
+
+    def search(self, query_vector: List[float], top_k: int = 5, with_vectors: bool = False) -> List[Dict[str, Any]]:
+        if not self.dim or top_k <= 0:
+            return []
+        q = np.asarray(query_vector, dtype=np.float32)
+        q /= float(np.linalg.norm(q)) or 1.0
+        with self._lock:
+            if not self.n:
+                return []
+            cand = self._candidates(q)
+            if self._codes is not None:
+                if cand is None:
+                    cand = np.flatnonzero(self._alive[:self.n])
+                # shortlist on the quantized codes, rescore the shortlist in full precision
+                approx = self._codes.scores(q, cand)
+                cand = cand[_top(approx, int(top_k * settings.QUANT_OVERSAMPLING))]
+            if cand is None:
+                scores = self._mat[:self.n] @ q
+                scores[~self._alive[:self.n]] = -np.inf
+            else:
+                scores = self._mat[cand] @ q
+            best = _top(scores, top_k)
+            best = best[np.isfinite(scores[best])]
+            slots = best if cand is None else cand[best]
+            marks = ",".join("?" * len(slots))
+            rows = {s: (i, p) for s, i, p in self._db.execute(
+                f"SELECT slot, id, payload FROM chunks WHERE slot IN ({marks})", [int(s) for s in slots])}
+            vecs = np.asarray(self._mat[slots]) if with_vectors else None
+        out = []
+        for j, (s, score) in enumerate(zip(slots, scores[best])):
+            cid, payload = rows[int(s)]
+            out.append({"id": cid, **_unpack(payload), "score": float(score)})
+            if vecs is not None:
+                out[-1]["vector"] = vecs[j]
+        return out
+
+    def close(self) -> None:
+        with self._lock:
+            if self._mat is not None:
+                self._mat.flush()
+                self._mat = None
+            self._db.close()
+
+
+def _pack(obj: Any) -> bytes:
+    return zlib.compress(json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+
+
+def _unpack(raw: bytes) -> Any:
+    return json.loads(zlib.decompress(raw))
+
+
+_stores: Dict[str, TenantStore] = {}
+_stores_lock = threading.Lock()
+
+
+def _store_path(tenant_id: str) -> str:
+    path = os.path.join(settings.LOCAL_STORE_DIR, tenant_slug(tenant_id))
+    legacy = os.path.join(settings.LOCAL_STORE_DIR, legacy_slug(tenant_id))
+    # stores from before hashed names: adopt one only where the old name was the ID itself
+    if legacy_slug(tenant_id) == tenant_id and not os.path.exists(path) and os.path.isdir(legacy):
+        os.rename(legacy, path)
+        logger.info(f"Moved local store of tenant {tenant_id!r} to {path}")
+    return path
+
+
+def tenant_store(tenant_id: str) -> TenantStore:
+    with _stores_lock:
+        if tenant_id not in _stores:
+            _stores[tenant_id] = TenantStore(_store_path(tenant_id), tenant_id)
+        return _stores[tenant_id]
+
+
+def close_all() -> None:
+    with _stores_lock:
+        for s in _stores.values():
+            s.close()
+        _stores.clear()
+
+
+async def ensure_store() -> None:
+    os.makedirs(settings.LOCAL_STORE_DIR, exist_ok=True)
+
+
+async def upsert_chunks(items: list[dict]) -> None:
+    for tenant, group in groupby(sorted(items, key=itemgetter("tenant_id")), key=itemgetter("tenant_id")):
+        await asyncio.to_thread(tenant_store(tenant).upsert, list(group))
+
+
+async def search_chunks(query_vector: list[float], tenant_id: str, top_k: int = 5, with_vectors: bool = False) -> list[dict]:
+    return await asyncio.to_thread(tenant_store(tenant_id).search, query_vector, top_k, with_vectors)
+
+
+async def list_ids(tenant_id: str, file_id: str) -> set[str]:
+    return await asyncio.to_thread(tenant_store(tenant_id).list_ids, file_id)
+
+
+async def delete_ids(tenant_id: str, ids: list[str]) -> None:
+    await asyncio.to_thread(tenant_store(tenant_id).delete, ids)
+
+
+async def iter_tenant_chunks(tenant_id: str, batch: int = 500) -> AsyncIterator[List[Dict[str, Any]]]:
+    it = tenant_store(tenant_id).iter_payloads(batch)
+    while (rows := await asyncio.to_thread(next, it, None)) is not None:
+        yield rows
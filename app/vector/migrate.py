@@ -0,0 +1,142 @@
+"""
+Re-project an existing vector collection to a new embedding dimension.
+
+Stored text-embedding-3 vectors are truncated and re-normalised (see
+vector/quantize.py), so no document is re-embedded. The data is copied into a
+new target (Qdrant collection, Azure Search index or local store directory)
+of the configured backend; the source is left untouched. Switch EMBED_DIM and
+QDRANT_COLLECTION / AZURE_SEARCH_INDEX / LOCAL_STORE_DIR to the target
+afterwards.
+
+Usage (from the app directory):
+    python -m vector.migrate --dim 1024 --target chunks_1024
+    python -m vector.migrate --slim-payloads   # Qdrant: drop vector copies from old payloads
+"""
+import argparse
+import asyncio
+import logging
+import os
+from core.config import settings
+from core.resources import resources
+from vector.factory import get_vector_store_type
+from vector.quantize import reproject
+
+logger = logging.getLogger(__name__)
+
+
+async def migrate_qdrant(target: str, dim: int, batch: int) -> int:
+    from qdrant_client.models import PointStruct
+    from vector import qdrant_client as q
+    qc = q.qdrant()
+    if await q._dedicated_aliases(refresh=True):
+        logger.warning("Tenants in dedicated collections are not migrated; move them to shared storage first")
+    await q.ensure_collection(target, dim)
+    n, offset = 0, None
+    while True:
+        points, offset = await qc.scroll(collection_name=q.COLL, limit=batch, offset=offset,
+                                         with_payload=True, with_vectors=True)
+        if points:
+            vecs = reproject([p.vector for p in points], dim)
+            await qc.upsert(collection_name=target, points=[
+                PointStruct(id=p.id, vector=v.tolist(), payload=q.payload(p.payload)) for p, v in zip(points, vecs)])
+            n += len(points)
+            logger.info(f"Migrated {n} points")
+        if offset is None:
+            return n
+
+
+async def slim_payloads() -> None:
+    from vector import qdrant_client as q
+    try:
+        await q.strip_legacy_payloads()
+    finally:
+        await resources.aclose()
+
+
+async def migrate_azure(target: str, dim: int, batch: int) -> int:
+    from azure.search.documents.aio import SearchClient
+    from vector import azure_search_client as az
+    await az.create_index_if_not_exists(target, dim)
+    dest = SearchClient(endpoint=settings.AZURE_SEARCH_ENDPOINT, index_name=target, credential=az.get_credential())
+    n, docs = 0, []
+
+    async def flush():
+        nonlocal n, docs
+        vecs = reproject([d["text_vector"] for d in docs], dim)
+        for d, v in zip(docs, vecs):
+            d["text_vector"] = v.tolist()
+        await dest.upload_documents(documents=docs)
+        n += len(docs)
+        docs = []
+        logger.info(f"Migrated {n} documents")
+
+    try:
+        # note: Azure Search pages with $skip, which caps a single listing at 100k documents
+        results = await az.get_search_client().search(search_text="*")
+        async for r in results:
+            docs.append({k: v for k, v in r.items() if not k.startswith("@")})
+            if len(docs) >= batch:
+                await flush()
+        if docs:
+            await flush()
+    finally:
+        await dest.close()
+    return n
+
+
+def migrate_local(target: str, dim: int, batch: int) -> int:
+    from vector.local_store import TenantStore
+    n = 0
+    for tenant in sorted(os.listdir(settings.LOCAL_STORE_DIR)):
+        path = os.path.join(settings.LOCAL_STORE_DIR, tenant)
+        if not os.path.isdir(path):
+            continue
+        src, dest = TenantStore(path), TenantStore(os.path.join(target, tenant))
+        try:
+            for items in src.iter_payloads(batch, with_vectors=True):
+                vecs = reproject([i["vector"] for i in items], dim)
+                dest.upsert([{**i, "vector": v} for i, v in zip(items, vecs)])
+                n += len(items)
+            logger.info(f"Migrated tenant '{tenant}' ({n} chunks so far)")
+        finally:
+            src.close()
+            dest.close()
+    return n
+
+
+async def migrate(target: str, dim: int, batch: int = 256) -> int:
+    store = get_vector_store_type()
+    source = {"local": settings.LOCAL_STORE_DIR, "azure_search": settings.AZURE_SEARCH_INDEX}.get(store, settings.QDRANT_COLLECTION)
+    if os.path.normpath(target) == os.path.normpath(source):
+        raise ValueError("the migration target must differ from the current store")
+    if store == "local":
+        return await asyncio.to_thread(migrate_local, target, dim, batch)
+    try:
+        if store == "azure_search":
+            return await migrate_azure(target, dim, batch)
+        return await migrate_qdrant(target, dim, batch)
+    finally:
+        await resources.aclose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--dim", type=int, help="new embedding dimension (<= current)")
+    parser.add_argument("--target", help="new collection / index name, or directory for the local store")
+    parser.add_argument("--batch", type=int, default=256)
+    parser.add_argument("--slim-payloads", action="store_true",
+                        help="Qdrant only: remove the duplicated vector from payloads written by older versions")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    if args.slim_payloads:
+        asyncio.run(slim_payloads())
+        print("Removed legacy payload keys.")
+        return
+    if args.dim is None or args.target is None:
+        parser.error("--dim and --target are required")
+    n = asyncio.run(migrate(args.target, args.dim, args.batch))
+    print(f"Migrated {n} chunks to '{args.target}' at {args.dim} dims. Set EMBED_DIM={args.dim} and point the store at the target.")
+
+
+if __name__ == "__main__":
+    main()
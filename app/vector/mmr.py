@@ -0,0 +1,47 @@
+"""
+Maximal Marginal Relevance over an over-fetched candidate set.
+
+Candidates are re-ranked by ``lam * sim(query, c) - (1 - lam) * max sim(c, selected)``,
+so near-copies of an already selected passage (e.g. overlapping chunks) lose
+out to the next-best distinct one. All similarities come from one matrix
+product over the candidate vectors.
+"""
+from typing import Any, Dict, List, Sequence
+import numpy as np
+
+
+def mmr(query: Sequence[float], cands: np.ndarray, k: int, lam: float = 0.5) -> List[int]:
+    """Indices of ``k`` rows of ``cands`` in MMR selection order."""
+    c = np.asarray(cands, dtype=np.float32)
+    if not len(c) or k <= 0:
+        return []
+    c = c / np.maximum(np.linalg.norm(c, axis=1, keepdims=True), 1e-12)
+    q = np.asarray(query, dtype=np.float32)
+    q = q / max(float(np.linalg.norm(q)), 1e-12)
+    rel = c @ q
+    sim = c @ c.T
+    first = int(np.argmax(rel))
+    picked = [first]
+    max_sim = sim[first].copy()
+    taken = np.zeros(len(c), dtype=bool)
+    taken[first] = True
+    for _ in range(min(k, len(c)) - 1):
+        score = lam * rel - (1 - lam) * max_sim
+        score[taken] = -np.inf
+        j = int(np.argmax(score))
+        picked.append(j)
+        taken[j] = True
+        np.maximum(max_sim, sim[j], out=max_sim)
+    return picked
+
+
+def diversify(query: Sequence[float], hits: List[Dict[str, Any]], k: int, lam: float = 0.5) -> List[Dict[str, Any]]:
+    """MMR-select ``k`` of ``hits`` (which carry a "vector"); the vectors are dropped from the result.
+
+    Hits without a vector cannot be compared and are only used to fill up to ``k``.
+    """
+    with_vec = [h for h in hits if h.get("vector") is not None]
+    order = mmr(query, np.asarray([h["vector"] for h in with_vec], dtype=np.float32), k, lam) if with_vec else []
+    out = [with_vec[i] for i in order]
+    out += [h for h in hits if h.get("vector") is None][:k - len(out)]
+    return [{key: v for key, v in h.items() if key != "vector"} for h in out]
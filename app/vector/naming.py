@@ -0,0 +1,24 @@
+"""
+Storage names derived from tenant IDs (directories, index files, Qdrant aliases).
+
+Tenant IDs are free-form, so a name is a readable sanitised prefix plus a hash
+of the exact ID: "acme corp", "acme_corp" and "acme/corp" never share one.
+Stores also record the tenant ID they were created for and refuse to open
+for another.
+"""
+import hashlib
+import re
+
+
+def tenant_slug(tenant_id: str, allowed: str = "A-Za-z0-9_.-", prefix_chars: int = 32) -> str:
+    readable = re.sub(f"[^{allowed}]", "_", tenant_id)[:prefix_chars]
+    return f"{readable}-{hashlib.sha256(tenant_id.encode('utf-8')).hexdigest()[:16]}"
+
+
+def legacy_slug(tenant_id: str, allowed: str = "A-Za-z0-9_.-") -> str:
+    """The lossy name used before tenant_slug; only unambiguous when it equals the ID itself."""
+    return re.sub(f"[^{allowed}]", "_", tenant_id) or "_"
+
+
+class TenantMismatch(RuntimeError):
+    pass
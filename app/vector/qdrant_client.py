@@ -1,46 +1,307 @@
-from qdrant_client import QdrantClient
-from qdrant_client.models import Distance, VectorParams, PointStruct, Filter, FieldCondition, MatchValue
-
-_client: QdrantClient | None = None
-COLL = "chunks"
-
-def qdrant() -> QdrantClient:
-    global _client
-    if _client is None:
-        _client = QdrantClient(host="qdrant", port=6333)
-        try:
-            _client.get_collection(COLL)
-        except Exception:
-            _client.recreate_collection(COLL, vectors_config=VectorParams(size=1536, distance=Distance.COSINE))
-    return _client
-
-def upsert_chunks(items: list[dict]):
+"""
+Qdrant backend.
+
+Tenants live either in the shared collection (COLL, filtered by an indexed
+``tenant_id``) or in a dedicated collection reached through the alias
+``<COLL>__<tenant slug>`` (vector/naming.py: a hash of the exact tenant ID, so
+no two tenants share an alias). Routing follows the aliases, so moving a tenant
+(``move_tenant``) flips over atomically once its data has been copied.
+New tenants start in QDRANT_TENANT_MODE.
+"""
+import asyncio
+import logging
+import time
+from typing import Optional
+from itertools import groupby
+from operator import itemgetter
+import httpx
+from qdrant_client import AsyncQdrantClient
+from qdrant_client.http.exceptions import ResponseHandlingException, UnexpectedResponse
+from qdrant_client.models import (
+    Distance, VectorParams, PointStruct, PointIdsList, Filter, FieldCondition, MatchValue, PayloadSchemaType,
+    ScalarQuantization, ScalarQuantizationConfig, ScalarType, BinaryQuantization, BinaryQuantizationConfig,
+    SearchParams, QuantizationSearchParams, CreateAlias, CreateAliasOperation, DeleteAlias, DeleteAliasOperation,
+)
+from core.config import settings
+from core.resources import resources
+from llm.scheduler import backoff_s
+from vector.batching import run_limited, size_batches
+from vector.naming import legacy_slug, tenant_slug
+
+logger = logging.getLogger(__name__)
+
+COLL = settings.QDRANT_COLLECTION
+SHARED, DEDICATED = "shared", "dedicated"
+INDEXED_FIELDS = ("tenant_id", "file_id")
+
+def qdrant() -> AsyncQdrantClient:
+    return resources.qdrant()
+
+def quantization_config():
+    mode = settings.VECTOR_QUANTIZATION
+    if mode == "int8":
+        return ScalarQuantization(scalar=ScalarQuantizationConfig(type=ScalarType.INT8, always_ram=True))
+    if mode == "binary":
+        return BinaryQuantization(binary=BinaryQuantizationConfig(always_ram=True))
+    if mode != "none":
+        raise ValueError(f"unsupported VECTOR_QUANTIZATION: {mode}")
+    return None
+
+async def ensure_collection(name: str = COLL, dim: int | None = None) -> None:
+    """Create the collection if missing; never drops an existing one with another dimension."""
+    qc = qdrant()
+    dim = dim or settings.EMBED_DIM
+    try:
+        info = await qc.get_collection(name)
+    except Exception:
+        quant = quantization_config()
+        # with quantized copies in RAM the originals only serve rescoring and can stay on disk
+        await qc.create_collection(name, vectors_config=VectorParams(size=dim, distance=Distance.COSINE, on_disk=quant is not None),
+                                   quantization_config=quant)
+        logger.info(f"Created Qdrant collection '{name}' ({dim} dims, quantization={settings.VECTOR_QUANTIZATION})")
+        await _ensure_indexes(name, set())
+        return
+    have = info.config.params.vectors.size
+    if have != dim:
+        raise RuntimeError(f"Qdrant collection '{name}' has {have} dims but EMBED_DIM={dim}; "
+                           f"run `python -m vector.migrate --dim {dim} --target <new collection>`")
+    await _ensure_indexes(name, set(info.payload_schema or {}))
+
+async def _ensure_indexes(name: str, have: set[str]) -> None:
+    for field in INDEXED_FIELDS:
+        if field not in have:
+            await qdrant().create_payload_index(name, field, field_schema=PayloadSchemaType.KEYWORD)
+            logger.info(f"Created keyword payload index on '{field}' in '{name}'")
+
+_ALIAS_CHARS = "A-Za-z0-9_-"
+
+def tenant_alias(tenant_id: str) -> str:
+    return f"{COLL}__{tenant_slug(tenant_id, _ALIAS_CHARS)}"
+
+def _legacy_alias(tenant_id: str) -> Optional[str]:
+    """Alias from before hashed names; only followed where the old name was the tenant ID itself."""
+    slug = legacy_slug(tenant_id, _ALIAS_CHARS)
+    return f"{COLL}__{slug}" if slug == tenant_id else None
+
+_aliases: set[str] = set()
+_aliases_at = float("-inf")
+_routes_lock = asyncio.Lock()
+
+async def _dedicated_aliases(refresh: bool = False) -> set[str]:
+    """Aliases of dedicated tenants, re-read at most every QDRANT_ROUTE_CACHE_S seconds."""
+    global _aliases, _aliases_at
+    async with _routes_lock:
+        if refresh or time.monotonic() - _aliases_at > settings.QDRANT_ROUTE_CACHE_S:
+            res = await qdrant().get_aliases()
+            _aliases = {a.alias_name for a in res.aliases if a.alias_name.startswith(f"{COLL}__")}
+            _aliases_at = time.monotonic()
+        return _aliases
+
+async def _current_alias(tenant_id: str) -> Optional[str]:
+    aliases = await _dedicated_aliases()
+    for alias in (tenant_alias(tenant_id), _legacy_alias(tenant_id)):
+        if alias in aliases:
+            return alias
+    return None
+
+async def partition_of(tenant_id: str) -> str:
+    return DEDICATED if await _current_alias(tenant_id) else SHARED
+
+async def collection_for(tenant_id: str) -> str:
+    return await _current_alias(tenant_id) or COLL
+
+async def _write_collection(tenant_id: str) -> str:
+    """Like collection_for, but places a brand-new tenant according to QDRANT_TENANT_MODE."""
+    name = await collection_for(tenant_id)
+    if name != COLL or settings.QDRANT_TENANT_MODE != DEDICATED:
+        return name
+    res = await qdrant().count(COLL, count_filter=_tenant_filter(tenant_id), exact=False)
+    if res.count:
+        # existing shared tenant: stays put until moved explicitly
+        return COLL
+    await _create_dedicated(tenant_id)
+    return tenant_alias(tenant_id)
+
+async def _create_dedicated(tenant_id: str) -> str:
+    alias = tenant_alias(tenant_id)
+    physical = f"{alias}__data"
+    await ensure_collection(physical)
+    await qdrant().update_collection_aliases(change_aliases_operations=[
+        CreateAliasOperation(create_alias=CreateAlias(collection_name=physical, alias_name=alias))])
+    await _dedicated_aliases(refresh=True)
+    logger.info(f"Tenant '{tenant_id}' now uses dedicated collection '{physical}'")
+    return physical
+
+def _tenant_filter(tenant_id: str) -> Filter:
+    return Filter(must=[FieldCondition(key="tenant_id", match=MatchValue(value=tenant_id))])
+
+async def _copy(tenant_id: str, src: str, dst: str, batch: int = 256) -> int:
     qc = qdrant()
-    points = [PointStruct(id=i["id"], vector=i["vector"], payload=i) for i in items]
-    qc.upsert(collection_name=COLL, points=points)
+    n, offset = 0, None
+    while True:
+        points, offset = await qc.scroll(collection_name=src, scroll_filter=_tenant_filter(tenant_id), limit=batch,
+                                         offset=offset, with_payload=True, with_vectors=True)
+        if points:
+            await qc.upsert(collection_name=dst, points=[
+                PointStruct(id=p.id, vector=p.vector, payload=payload(p.payload)) for p in points])
+            n += len(points)
+        if offset is None:
+            return n
+
+async def move_tenant(tenant_id: str, mode: str) -> int:
+    """Move a tenant between the shared collection and a dedicated one; returns the points copied.
+
+    Reads switch over when the alias changes; other workers follow within
+    QDRANT_ROUTE_CACHE_S, after which the old copy is removed. Ingesting into
+    the tenant while it moves is not supported.
+    """
+    if mode not in (SHARED, DEDICATED):
+        raise ValueError(f"unknown partition mode: {mode}")
+    if await partition_of(tenant_id) == mode:
+        return 0
+    qc = qdrant()
+    if mode == DEDICATED:
+        alias = tenant_alias(tenant_id)
+        physical = f"{alias}__data"
+        await ensure_collection(physical)
+        n = await _copy(tenant_id, COLL, physical)
+        await qc.update_collection_aliases(change_aliases_operations=[
+            CreateAliasOperation(create_alias=CreateAlias(collection_name=physical, alias_name=alias))])
+        await _dedicated_aliases(refresh=True)
+        await asyncio.sleep(settings.QDRANT_ROUTE_CACHE_S)
+        await qc.delete(collection_name=COLL, points_selector=_tenant_filter(tenant_id))
+    else:
+        alias = await _current_alias(tenant_id)
+        n = await _copy(tenant_id, alias, COLL)
+        await qc.update_collection_aliases(change_aliases_operations=[
+            DeleteAliasOperation(delete_alias=DeleteAlias(alias_name=alias))])
+        await _dedicated_aliases(refresh=True)
+        await asyncio.sleep(settings.QDRANT_ROUTE_CACHE_S)
+        others = Filter(must_not=[FieldCondition(key="tenant_id", match=MatchValue(value=tenant_id))])
+        if (await qc.count(f"{alias}__data", count_filter=others, exact=True)).count:
+            # written under an old, shared alias name: the other tenants' points must not go with it
+            await qc.delete(collection_name=f"{alias}__data", points_selector=_tenant_filter(tenant_id))
+            logger.warning(f"Kept '{alias}__data': it also holds other tenants' points")
+        else:
+            await qc.delete_collection(f"{alias}__data")
+    logger.info(f"Moved tenant '{tenant_id}' to {mode} storage ({n} points)")
+    return n
+
+# what list_ids / search_chunks filter on or return; the vector itself is stored once, as the point vector
+PAYLOAD_FIELDS = ("tenant_id", "file_id", "text", "source", "hash", "page", "page_end", "char_start", "char_end", "section")
+
+def payload(item: dict) -> dict:
+    return {k: item[k] for k in PAYLOAD_FIELDS if item.get(k) is not None}
+
+async def upsert_chunks(items: list[dict]):
+    qc = qdrant()
+    batches = []
+    for tenant, group in groupby(sorted(items, key=itemgetter("tenant_id")), key=itemgetter("tenant_id")):
+        coll = await _write_collection(tenant)
+        batches += [(coll, b) for b in size_batches(list(group), settings.UPSERT_BATCH_MAX_ITEMS, settings.UPSERT_BATCH_MAX_BYTES)]
+
+    async def send(job: tuple[str, list[dict]]) -> None:
+        coll, batch = job
+        points = [PointStruct(id=i["id"], vector=i["vector"], payload=payload(i)) for i in batch]
+        for attempt in range(settings.UPSERT_MAX_RETRIES + 1):
+            try:
+                await qc.upsert(collection_name=coll, points=points)
+                return
+            except Exception as e:
+                if attempt == settings.UPSERT_MAX_RETRIES or not _transient(e):
+                    raise
+                logger.info(f"Retrying upsert of {len(points)} points to '{coll}' (attempt {attempt + 1}): {e}")
+                await asyncio.sleep(backoff_s(attempt + 1, _RETRY_BASE_S, _RETRY_MAX_S))
+
+    await run_limited(batches, send, settings.UPSERT_CONCURRENCY)
+
+# throttling and transient server/connection errors; point IDs are fixed, so re-sending is idempotent
+_RETRY_STATUS = {408, 429, 500, 502, 503, 504}
+_RETRY_BASE_S = 0.5
+_RETRY_MAX_S = 10.0
+
+def _transient(e: Exception) -> bool:
+    if isinstance(e, UnexpectedResponse):
+        return e.status_code in _RETRY_STATUS
+    return isinstance(e, (ResponseHandlingException, httpx.TransportError))
+
+async def strip_legacy_payloads() -> None:
+    """Drop payload keys written by older versions (a second copy of the vector, the id)."""
+    for name in [COLL, *await _dedicated_aliases(refresh=True)]:
+        await qdrant().delete_payload(collection_name=name, keys=["vector", "id"], points=Filter(must=[]))
+
+async def list_ids(tenant_id: str, file_id: str) -> set[str]:
+    qc = qdrant()
+    coll = await collection_for(tenant_id)
+    flt = Filter(must=[
+        FieldCondition(key="tenant_id", match=MatchValue(value=tenant_id)),
+        FieldCondition(key="file_id", match=MatchValue(value=file_id)),
+    ])
+    ids: set[str] = set()
+    offset = None
+    while True:
+        points, offset = await qc.scroll(collection_name=coll, scroll_filter=flt, limit=1000, offset=offset,
+                                         with_payload=False, with_vectors=False)
+        ids.update(str(p.id) for p in points)
+        if offset is None:
+            return ids
+
+async def iter_tenant_chunks(tenant_id: str, batch: int = 500):
+    """Yield the stored chunks of a tenant (payload only) in batches, e.g. to rebuild side indexes."""
+    qc = qdrant()
+    coll = await collection_for(tenant_id)
+    flt = _tenant_filter(tenant_id)
+    offset = None
+    while True:
+        points, offset = await qc.scroll(collection_name=coll, scroll_filter=flt, limit=batch, offset=offset,
+                                         with_payload=True, with_vectors=False)
+        if points:
+            yield [{**p.payload, "id": str(p.id)} for p in points]
+        if offset is None:
+            return
+
+async def delete_ids(tenant_id: str, ids: list[str]) -> None:
+    if ids:
+        await qdrant().delete(collection_name=await collection_for(tenant_id), points_selector=PointIdsList(points=ids))
+
+def _search_params() -> SearchParams | None:
+    if settings.VECTOR_QUANTIZATION == "none":
+        return None
+    return SearchParams(quantization=QuantizationSearchParams(rescore=True, oversampling=settings.QUANT_OVERSAMPLING))
 
-def search(query_vec: list[float], tenant: str, top_k: int = 4):
+async def search(query_vec: list[float], tenant: str, top_k: int = 4, with_vectors: bool = False):
     qc = qdrant()
-    return qc.search(
-        collection_name=COLL,
+    coll = await collection_for(tenant)
+    return await qc.search(
+        collection_name=coll,
         query_vector=query_vec,
         limit=top_k,
-        query_filter=Filter(must=[FieldCondition(key="tenant_id", match=MatchValue(value=tenant))])
+        # kept in dedicated collections too: alias names are sanitised and could be shared
+        query_filter=_tenant_filter(tenant),
+        search_params=_search_params(),
+        with_vectors=with_vectors,
     )
 
-def search_chunks(query_vector: list[float], tenant_id: str, top_k: int = 5) -> list[dict]:
+async def search_chunks(query_vector: list[float], tenant_id: str, top_k: int = 5, with_vectors: bool = False) -> list[dict]:
     """
     Search for similar chunks (compatible with factory interface).
 
-    Returns list of dicts with standardized format.
+    Returns list of dicts with standardized format (plus "vector" if requested).
     """
-    hits = search(query_vector, tenant_id, top_k)
-    return [{
+    hits = await search(query_vector, tenant_id, top_k, with_vectors)
+    out = [{
         "id": str(h.id),
         "text": h.payload.get("text"),
         "source": h.payload.get("source"),
         "file_id": h.payload.get("file_id"),
         "page": h.payload.get("page"),
+        "page_end": h.payload.get("page_end"),
+        "char_start": h.payload.get("char_start"),
+        "char_end": h.payload.get("char_end"),
         "section": h.payload.get("section"),
         "score": h.score
     } for h in hits]
+    if with_vectors:
+        for o, h in zip(out, hits):
+            o["vector"] = h.vector
+    return out
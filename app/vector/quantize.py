@@ -0,0 +1,86 @@
+"""
+Vector re-projection and quantization helpers shared by the backends.
+
+text-embedding-3 models are trained so that a prefix of the embedding,
+re-normalised, is a valid lower-dimensional embedding (this is what the API's
+``dimensions`` parameter returns). ``reproject`` applies the same transform to
+stored vectors, so a collection can move to a smaller EMBED_DIM without
+re-embedding the source documents.
+
+Quantized codes are only used to shortlist candidates; the final ranking is
+always rescored against the full-precision vectors.
+"""
+from typing import Tuple
+import numpy as np
+
+MODES = ("none", "int8", "binary")
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def reproject(m: np.ndarray, dim: int) -> np.ndarray:
+    """Truncate rows of ``m`` to ``dim`` components and L2-normalise them."""
+    m = np.atleast_2d(np.asarray(m, dtype=np.float32))
+    if dim > m.shape[1]:
+        raise ValueError(f"cannot re-project {m.shape[1]}-dim vectors up to {dim} dims")
+    out = m[:, :dim].copy()
+    n = np.linalg.norm(out, axis=1, keepdims=True)
+    n[n == 0] = 1.0
+    return out / n
+
+
+def int8_encode(m: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Symmetric per-row int8 codes and their float32 scales (``m ~= codes * scale``)."""
+    m = np.atleast_2d(np.asarray(m, dtype=np.float32))
+    scale = np.abs(m).max(axis=1) / 127.0
+    scale[scale == 0] = 1.0
+    codes = np.rint(m / scale[:, None]).astype(np.int8)
+    return codes, scale.astype(np.float32)
+
+
+def int8_scores(codes: np.ndarray, scale: np.ndarray, q: np.ndarray) -> np.ndarray:
+    return (codes @ q.astype(np.float32)) * scale
+
+
+def binary_encode(m: np.ndarray) -> np.ndarray:
+    """One sign bit per dimension, packed 8 per byte."""
+    return np.packbits(np.atleast_2d(m) > 0, axis=1)
+
+
+def binary_scores(bits: np.ndarray, q: np.ndarray) -> np.ndarray:
+    """Negated Hamming distance to the sign pattern of ``q`` (higher is closer)."""
+    qb = np.packbits(q > 0)
+    return -_POPCOUNT[np.bitwise_xor(bits, qb)].sum(axis=1, dtype=np.int32)
+
+
+class Codes:
+    """Growable in-memory quantized copy of a vector matrix (``mode`` in MODES, except "none")."""
+
+    def __init__(self, mode: str, dim: int):
+        if mode not in MODES[1:]:
+            raise ValueError(f"unsupported VECTOR_QUANTIZATION: {mode}")
+        self.mode = mode
+        width = dim if mode == "int8" else (dim + 7) // 8
+        self.data = np.zeros((0, width), dtype=np.int8 if mode == "int8" else np.uint8)
+        self.scale = np.zeros(0, dtype=np.float32)
+
+    def resize(self, rows: int) -> None:
+        if rows > len(self.data):
+            rows = max(rows, 2 * len(self.data))
+            data = np.zeros((rows, self.data.shape[1]), dtype=self.data.dtype)
+            data[:len(self.data)] = self.data
+            self.data = data
+            self.scale = np.resize(self.scale, rows)
+
+    def set(self, start: int, m: np.ndarray) -> None:
+        self.resize(start + len(m))
+        if self.mode == "int8":
+            codes, scale = int8_encode(m)
+            self.data[start:start + len(m)] = codes
+            self.scale[start:start + len(m)] = scale
+        else:
+            self.data[start:start + len(m)] = binary_encode(m)
+
+    def scores(self, q: np.ndarray, rows) -> np.ndarray:
+        if self.mode == "int8":
+            return int8_scores(self.data[rows], self.scale[rows], q)
+        return binary_scores(self.data[rows], q).astype(np.float32)